@@ -0,0 +1,52 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Compare two benchmark runs.
+
+    python -m benchmarks.compare before.json after.json
+"""
+
+import json
+import sys
+
+
+KEY = ('transform', 'params', 'data', 'sids', 'length')
+
+
+def load(path):
+    with open(path) as fileobj:
+        results = json.load(fileobj)['results']
+    return dict((tuple(result[key] for key in KEY), result)
+                for result in results)
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    before, after = load(argv[0]), load(argv[1])
+    for key in sorted(set(before) & set(after)):
+        old, new = before[key], after[key]
+        sys.stdout.write('%-60s %10.0f -> %10.0f events/s (%5.2fx) '
+                         'p99 %8.1f -> %8.1fus\n'
+                         % (' '.join(str(part) for part in key),
+                            old['events_per_sec'], new['events_per_sec'],
+                            new['events_per_sec'] / old['events_per_sec'],
+                            old['p99_us'], new['p99_us']))
+
+
+if __name__ == '__main__':
+    main()
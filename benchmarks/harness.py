@@ -0,0 +1,51 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Transforms and zipline events outside of a simulation.
+
+Shared by the benchmarks and the tests, this module never imports from
+`tests`.
+"""
+
+import datetime
+
+from zipline import protocol
+
+
+START = datetime.datetime(2013, 1, 1)
+
+
+def to_events(df):
+    return [row.to_dict() for _date, row in df.iterrows()]
+
+
+def events(frames, start=START):
+    """zipline Events of the bars of each sid in `frames`, a day apart."""
+    found = {}
+    for sid, df in frames.items():
+        found[sid] = []
+        for bar, event in enumerate(to_events(df)):
+            event.update({'sid': sid,
+                          'dt': start + datetime.timedelta(days=bar)})
+            found[sid].append(protocol.Event(event))
+    return found
+
+
+def create(cls, incremental=True, **params):
+    """Build the transform `cls` outside of a simulation."""
+    # NOTE(jkoelker) Skip TransformMeta, it wraps the transform in a
+    #                StatefulTransform meant to be driven by a simulation
+    return type.__call__(cls, incremental=incremental, **params)
@@ -0,0 +1,105 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Import time of the modules signal workers load.
+
+Each module is imported in a fresh interpreter that already imported
+NumPy, so only the time the module itself adds is counted. Run with
+
+    python -m benchmarks.imports --max-ms 50
+
+to fail when a module got slower than the budget or pulled in one of
+the HEAVY packages.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+# NOTE(jkoelker) Modules meant to load with nothing but NumPy
+MODULES = (
+    'zl.indicators',
+    'zl.indicators.core.countdown',
+    'zl.indicators.core.flip',
+    'zl.indicators.core.metrics',
+    'zl.indicators.core.sequential',
+    'zl.indicators.core.setup',
+    'zl.indicators.core.snapshot',
+    'zl.indicators.plot',
+    'zl.indicators.runner',
+    'zl.indicators.store',
+    'zl.indicators.synthetic',
+    'zl.indicators.universe',
+)
+
+HEAVY = ('matplotlib', 'pandas', 'pkg_resources', 'pylab', 'zipline')
+
+PROBE = """
+import json
+import sys
+import timeit
+
+import numpy
+
+start = timeit.default_timer()
+__import__(sys.argv[1])
+seconds = timeit.default_timer() - start
+json.dump({'seconds': seconds,
+           'loaded': [name for name in sys.argv[2:] if name in sys.modules]},
+          sys.stdout)
+"""
+
+
+def measure(module, repeat=3):
+    """Fastest of `repeat` imports of `module` and the HEAVY it loaded."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    runs = [json.loads(subprocess.check_output(
+        [sys.executable, '-c', PROBE, module] + list(HEAVY), env=env))
+        for _i in xrange(repeat)]
+    return {'module': module,
+            'ms': min(run['seconds'] for run in runs) * 1e3,
+            'loaded': runs[0]['loaded']}
+
+
+def parse(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--modules', default=','.join(MODULES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help='fail when a module takes longer to import')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse(argv)
+    results = [measure(module, args.repeat)
+               for module in args.modules.split(',')]
+    json.dump(results, sys.stdout, indent=2, sort_keys=True)
+    sys.stdout.write('\n')
+
+    failed = [result['module'] for result in results
+              if result['loaded'] or (args.max_ms is not None and
+                                      result['ms'] > args.max_ms)]
+    if failed:
+        sys.stderr.write('Too slow or too heavy: %s\n' % ', '.join(failed))
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,225 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Per bar latency and throughput of the transforms.
+
+Every transform is fed the same bars for every sid, bar by bar, and the
+time each `update` takes is recorded. Run with
+
+    python -m benchmarks.run --output results.json
+
+and compare the JSON of two runs to spot regressions.
+"""
+
+import argparse
+import collections
+import datetime
+import itertools
+import json
+import platform
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+from zipline.finance import trading
+from zipline import protocol
+
+from benchmarks import harness
+
+from zl.indicators import countdown
+from zl.indicators import flip
+from zl.indicators import sequential
+from zl.indicators import setup
+from zl.indicators import synthetic
+
+
+TRANSFORMS = {
+    'flip': flip.Flip,
+    'setup': setup.Setup,
+    'countdown': countdown.Countdown,
+    'sequential': sequential.Sequential,
+}
+
+# NOTE(jkoelker) Parameter sets per transform, `legacy` runs the original
+#                EventWindow rescans
+PARAMS = {
+    'flip': {
+        'legacy': {'incremental': False},
+        'incremental': {'incremental': True},
+        'long': {'incremental': True, 'period': 8},
+    },
+    'setup': {
+        'legacy': {'incremental': False},
+        'incremental': {'incremental': True},
+        'long': {'incremental': True, 'period': 13, 'lookback': 6},
+    },
+    'countdown': {
+        'legacy': {'incremental': False},
+        'incremental': {'incremental': True},
+        'bounded': {'incremental': True, 'max_length': 50},
+        'long': {'incremental': True, 'period': 21, 'lookback': 4},
+    },
+    'sequential': {
+        'legacy': {'incremental': False},
+        'incremental': {'incremental': True},
+        'bounded': {'incremental': True, 'countdown_max_length': 50},
+        'long': {'incremental': True, 'setup_period': 13,
+                 'setup_lookback': 6, 'countdown_period': 21},
+    },
+}
+
+Day = collections.namedtuple('Day', ['date', 'returns'])
+
+
+def walk(length, sids, seed):
+    """Random walks, every stage signals now and then."""
+    return synthetic.walk(length, sids, seed)
+
+
+def planted(length, sids, seed):
+    """Quiet walks with a buy and a sell countdown every 60 bars."""
+    bars = synthetic.walk(length, sids, seed, volatility=0.002)
+    for direction, first in ((synthetic.BUY, 25), (synthetic.SELL, 55)):
+        positions = range(first, length, 60)
+        if positions:
+            synthetic.plant(bars, synthetic.COUNTDOWN, positions, direction,
+                            sid=slice(None))
+    return bars
+
+
+def flat(length, sids, seed):
+    """Closes that never leave the range two bars earlier.
+
+    Setups still happen but no countdown ever completes, countdowns stay
+    open for the whole run unless a max_length expires them.
+    """
+    random = np.random.RandomState(seed)
+    close = 100 + random.uniform(-0.01, 0.01, (length, sids))
+    return {'close': close, 'high': close + 1, 'low': close - 1}
+
+
+DATA = {'walk': walk, 'flat': flat, 'planted': planted}
+
+
+def environment(length):
+    """A TradingEnvironment over synthetic trading days.
+
+    The legacy windows count trading days, this keeps zipline from
+    fetching market data to find them.
+    """
+    days = pd.bdate_range(datetime.datetime(2000, 1, 3), periods=length,
+                          tz='UTC')
+
+    def load(_symbol):
+        return [Day(day, 0.0) for day in days], {}
+
+    return trading.TradingEnvironment(load=load)
+
+
+def bench(transform, data, days):
+    length, sids = data['close'].shape
+    latencies = np.empty(length * sids)
+    timer = timeit.default_timer
+    position = 0
+
+    for bar in xrange(length):
+        rows = dict((field, values[bar].tolist())
+                    for field, values in data.items())
+        events = [protocol.Event({'sid': sid, 'dt': days[bar],
+                                  'close': rows['close'][sid],
+                                  'price': rows['close'][sid],
+                                  'high': rows['high'][sid],
+                                  'low': rows['low'][sid]})
+                  for sid in xrange(sids)]
+
+        for event in events:
+            start = timer()
+            transform.update(event)
+            latencies[position] = timer() - start
+            position = position + 1
+
+    seconds = latencies.sum()
+    return {'events': position,
+            'seconds': seconds,
+            'events_per_sec': position / seconds,
+            'p50_us': np.percentile(latencies, 50) * 1e6,
+            'p99_us': np.percentile(latencies, 99) * 1e6,
+            'max_us': latencies.max() * 1e6}
+
+
+def parse(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--transforms', default=','.join(sorted(TRANSFORMS)))
+    parser.add_argument('--params', default=None,
+                        help='parameter sets to run, all by default')
+    parser.add_argument('--data', default=','.join(sorted(DATA)))
+    parser.add_argument('--sids', default='1,100,5000')
+    parser.add_argument('--lengths', default='250,1000',
+                        help='bars per sid')
+    parser.add_argument('--seed', type=int, default=20)
+    parser.add_argument('--output', default=None,
+                        help='JSON file to write, stdout by default')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse(argv)
+    lengths = [int(length) for length in args.lengths.split(',')]
+    sids = [int(count) for count in args.sids.split(',')]
+    results = []
+
+    with environment(max(lengths)) as env:
+        days = env.trading_days
+
+        for name, data_name, count, length in itertools.product(
+                args.transforms.split(','), args.data.split(','), sids,
+                lengths):
+            data = DATA[data_name](length, count, args.seed)
+            params = PARAMS[name]
+            names = sorted(params)
+            if args.params:
+                names = [n for n in args.params.split(',') if n in params]
+
+            for param_name in names:
+                transform = harness.create(TRANSFORMS[name],
+                                           **params[param_name])
+                result = bench(transform, data, days)
+                result.update(transform=name, params=param_name,
+                              data=data_name, sids=count, length=length)
+                results.append(result)
+
+                sys.stderr.write('%(transform)s %(params)s %(data)s '
+                                 'sids=%(sids)s length=%(length)s: '
+                                 '%(events_per_sec).0f events/s '
+                                 'p50=%(p50_us).1fus p99=%(p99_us).1fus\n'
+                                 % result)
+
+    report = {'python': platform.python_version(),
+              'numpy': np.__version__,
+              'date': datetime.datetime.utcnow().isoformat(),
+              'results': results}
+
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        return
+
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
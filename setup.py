@@ -30,5 +30,5 @@ setuptools.setup(name='zl.indicators',
                  author='Jason Koelker',
                  author_email='jason@koelker.net',
                  install_requires=requires,
-                 packages=['zl', 'zl.indicators'],
+                 packages=['zl', 'zl.indicators', 'zl.indicators.core'],
                  namespace_packages=['zl'])
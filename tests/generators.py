@@ -21,9 +21,12 @@ import random
 import numpy as np
 import pandas as pd
 
+from benchmarks import harness
 
-def to_events(df):
-    return [row.to_dict() for _date, row in df.iterrows()]
+from zl.indicators import synthetic
+
+
+to_events = harness.to_events
 
 
 def higher(value, factor=2, odds_same=5):
@@ -58,9 +61,7 @@ def random_day(seed=20):
 
 
 def random_days(length=6, seed=20):
-    df = random_day(seed)
-    for _i in xrange(length - 1):
-        df = df.append(random_day(seed))
+    df = pd.concat([random_day(seed) for _i in xrange(length)])
     return df.reset_index()
 
 
@@ -79,20 +80,28 @@ def flip(seed, functions):
     return days(closes)
 
 
+# NOTE(jkoelker) The outer closes must differ from the seed or the flip
+#                comparisons can tie
+def _strictly(func):
+    return functools.partial(func, odds_same=0)
+
+
 def bear_flip(seed=20, period=4):
     middle = [near] * (period - 2)
-    functions = [lower, higher] + middle + [higher, lower]
+    functions = ([_strictly(lower), _strictly(higher)] + middle +
+                 [_strictly(higher), _strictly(lower)])
     return flip(seed, functions)
 
 
 def bull_flip(seed=20, period=4):
     middle = [near] * (period - 2)
-    functions = [higher, lower] + middle + [lower, higher]
+    functions = ([_strictly(higher), _strictly(lower)] + middle +
+                 [_strictly(lower), _strictly(higher)])
     return flip(seed, functions)
 
 
 def setup(seed, lookback, functions):
-    closes = [random_day(seed)['close']]
+    closes = [random_day(seed)['close'][0]]
     for i, func in enumerate(functions):
         closes.append(func(closes[i]))
     return days(closes)
@@ -108,3 +117,26 @@ def buy_setup(seed=20, period=9, lookback=4):
     functions = [functools.partial(lower, odds_same=0)
                  for _i in xrange(period + lookback)]
     return setup(seed, lookback, functions)
+
+
+def random_walk(length, seed=100, drift=0.0):
+    closes = [seed]
+    for _i in xrange(length - 1):
+        closes.append(max(closes[-1] + drift + random.gauss(0, 1), 1))
+    return days(closes)
+
+
+def waves(length, seed=100, amplitude=10, wavelength=40, noise=0.5):
+    closes = [seed + amplitude * np.sin(2 * np.pi * i / wavelength) +
+              random.gauss(0, noise) for i in xrange(length)]
+    return days(closes)
+
+
+def planted_walks(length, sids=1, seed=20):
+    """Seeded walks with a countdown planted every 50 bars per sid."""
+    bars = synthetic.walk(length, sids, seed, volatility=0.005)
+    for direction, first in ((synthetic.BUY, 30), (synthetic.SELL, 56)):
+        synthetic.plant(bars, synthetic.COUNTDOWN,
+                        range(first, length, 50), direction,
+                        sid=slice(None))
+    return synthetic.frames(bars)
@@ -0,0 +1,164 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+import tests
+from tests import generators
+
+from zl.indicators import cache
+from zl.indicators import runner
+
+
+class TestSignalCache(tests.Base):
+    def setUp(self):
+        super(TestSignalCache, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.history = generators.planted_walks(600, sids=2)
+
+    def expected(self, sid, df, **params):
+        found = runner.run({sid: df}, processes=1, **params)
+        return found.values.tolist()
+
+    def check(self, found, sid, df, **params):
+        rows = np.array(found.tolist(), dtype=float).reshape(len(found), -1)
+        self.assertEqual(rows.tolist(), self.expected(sid, df, **params))
+
+    def test_miss_then_hit(self):
+        signals = cache.SignalCache(self.path)
+        df = self.history[0]
+
+        first = signals.signals(0, df)
+        self.check(first, 0, df)
+        self.assertTrue(len(first))
+        self.assertEqual((signals.hits, signals.misses), (0, 1))
+
+        again = cache.SignalCache(self.path).signals(0, df)
+        self.assertEqual(again.tolist(), first.tolist())
+
+        signals.signals(0, df)
+        self.assertEqual((signals.hits, signals.misses), (1, 1))
+
+    def test_keyed_by_sid_and_params(self):
+        signals = cache.SignalCache(self.path)
+        df = self.history[0]
+
+        signals.signals(0, df)
+        signals.signals(1, df)
+        bounded = signals.signals(0, df, countdown_max_length=30)
+        self.assertEqual(signals.misses, 3)
+        self.check(bounded, 0, df, countdown_max_length=30)
+
+    def test_appended_tail(self):
+        signals = cache.SignalCache(self.path)
+        df = self.history[1]
+
+        for length in (150, 151, 400, 600):
+            found = signals.signals(1, df[:length])
+            self.check(found, 1, df[:length])
+
+        self.assertEqual((signals.misses, signals.extended), (1, 3))
+
+    def test_changed_history(self):
+        signals = cache.SignalCache(self.path)
+        df = self.history[0]
+        signals.signals(0, df[:300])
+
+        changed = df.copy()
+        changed['close'].values[100] = changed['close'].values[100] * 1.01
+        found = signals.signals(0, changed)
+
+        self.check(found, 0, changed)
+        self.assertEqual(signals.misses, 2)
+
+    def test_prunes_superseded(self):
+        signals = cache.SignalCache(self.path)
+        df = self.history[1]
+
+        signals.signals(0, df)
+        for length in (150, 400, 600):
+            signals.signals(1, df[:length])
+
+        names = os.listdir(self.path)
+        self.assertEqual(len(names), 2)
+        self.assertEqual([name.split('-')[1] for name in names],
+                         ['v%s' % cache.VERSION] * 2)
+
+    def test_version(self):
+        df = self.history[0]
+        cache.SignalCache(self.path).signals(0, df)
+        name, = os.listdir(self.path)
+        cache.SignalCache(self.path).signals(1, df)
+
+        # NOTE(jkoelker) The same entry named as before the version was
+        #                part of it
+        key, _version, count, digest = name[:-len(cache.EXT)].split('-')
+        legacy = '%s-%s-%s%s' % (key, count, digest, cache.EXT)
+        shutil.copy(os.path.join(self.path, name),
+                    os.path.join(self.path, legacy))
+
+        self.patch(cache, 'VERSION', cache.VERSION + 1)
+        signals = cache.SignalCache(self.path)
+        found = signals.signals(0, df)
+        self.check(found, 0, df)
+        self.assertEqual(signals.misses, 1)
+
+        names = os.listdir(self.path)
+        self.assertEqual(len(names), 2)
+        self.assertNotIn(name, names)
+        self.assertNotIn(legacy, names)
+        self.assertIn('%s-v%s-%s-%s%s' % (key, cache.VERSION, count, digest,
+                                          cache.EXT), names)
+
+    def test_evicts_least_recently_used(self):
+        signals = cache.SignalCache(self.path)
+        df = self.history[0]
+
+        for sid in (0, 1, 2):
+            signals.signals(sid, df)
+
+        names = sorted(os.listdir(self.path))
+        paths = [os.path.join(self.path, name) for name in names]
+        for age, path in enumerate(paths):
+            os.utime(path, (1000 + age, 1000 + age))
+
+        # NOTE(jkoelker) A hit makes the oldest entry the newest
+        signals.signals(0, df)
+        self.assertEqual(signals.hits, 1)
+        touched = max(paths, key=os.path.getmtime)
+        oldest = min(paths, key=os.path.getmtime)
+
+        signals.max_bytes = sum(os.path.getsize(path) for path in paths) - 1
+        signals.evict()
+
+        left = [os.path.join(self.path, name)
+                for name in os.listdir(self.path)]
+        self.assertEqual(len(left), 2)
+        self.assertIn(touched, left)
+        self.assertNotIn(oldest, left)
+
+    def test_run(self):
+        signals = cache.SignalCache(self.path)
+        expected = runner.run(self.history, processes=1)
+        for _i in xrange(2):
+            found = signals.run(self.history)
+            self.assertTrue(np.array_equal(found.values, expected.values))
+            self.assertTrue(np.array_equal(found.index, expected.index))
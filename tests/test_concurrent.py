@@ -0,0 +1,131 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import sys
+import threading
+
+import tests
+from tests import generators
+
+from benchmarks import harness
+
+from zl.indicators import countdown
+from zl.indicators import flip
+from zl.indicators import sequential
+from zl.indicators import setup as setup_
+
+
+SIDS = 12
+THREADS = 4
+
+
+def summary(signal):
+    if signal is None:
+        return
+    return (signal['direction'], signal.get('high'), signal.get('low'),
+            [bar['close'] for bar in signal['bars']])
+
+
+def feed(transform, events, sids):
+    """Update `transform` with the bars of `sids`, bar by bar."""
+    found = dict((sid, []) for sid in sids)
+    for bar in xrange(len(events[sids[0]])):
+        for sid in sids:
+            found[sid].append(summary(transform.update(events[sid][bar])))
+    return found
+
+
+def threaded(transform, events):
+    """Feed `transform` the sids of `events` from THREADS threads.
+
+    Returns the signals of every sid and whatever the threads raised.
+    """
+    shards = [sorted(events)[i::THREADS] for i in xrange(THREADS)]
+    found = {}
+    errors = []
+
+    def work(position):
+        try:
+            found.update(feed(transform, events, shards[position]))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(position,))
+               for position in xrange(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return found, errors
+
+
+class TestConcurrent(tests.Base):
+    def setUp(self):
+        super(TestConcurrent, self).setUp()
+        self.events = harness.events(
+            generators.planted_walks(300, sids=SIDS))
+
+        # NOTE(jkoelker) Switch threads as often as possible so the
+        #                updates interleave as much as they can
+        self.addCleanup(sys.setcheckinterval, sys.getcheckinterval())
+        sys.setcheckinterval(1)
+
+    def _check(self, cls, **params):
+        expected = feed(harness.create(cls, **params), self.events,
+                        sorted(self.events))
+
+        # NOTE(jkoelker) Fewer stripes than threads so sids fed from
+        #                different threads share locks
+        transform = harness.create(cls, stripes=3, **params)
+        found, errors = threaded(transform, self.events)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(found, expected)
+        self.assertTrue(any(any(signals) for signals in expected.values()))
+
+    def test_flip(self):
+        self._check(flip.Flip)
+
+    def test_setup(self):
+        self._check(setup_.Setup)
+
+    def test_countdown(self):
+        self._check(countdown.Countdown)
+
+    def test_sequential(self):
+        self._check(sequential.Sequential)
+
+    def test_sequential_bounded(self):
+        self._check(sequential.Sequential, countdown_max_length=30,
+                    max_sids=SIDS)
+
+    def test_sequential_evicting(self):
+        # NOTE(jkoelker) Which windows get evicted depends on how the
+        #                threads interleave, only the bookkeeping can be
+        #                checked against a single threaded run
+        transform = harness.create(sequential.Sequential, stripes=3,
+                                   max_sids=SIDS // 3)
+        _found, errors = threaded(transform, self.events)
+
+        windows = transform.sid_windows
+        self.assertEqual(errors, [])
+        self.assertEqual(len(windows), SIDS // 3)
+        self.assertEqual(sorted(windows.last_seen), sorted(windows))
+
+    def test_no_metrics(self):
+        transform = harness.create(sequential.Sequential, stripes=3)
+        self.assertRaises(ValueError, transform.enable_metrics)
@@ -0,0 +1,130 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import tests
+from tests import generators
+
+from zl.indicators import countdown
+from zl.indicators import sequential
+# NOTE(jkoelker) nose likes to run things named setup ;)
+from zl.indicators import setup as setup_
+
+
+def rescan(direction, events, period=13, lookback=2, field='close'):
+    for i in xrange(1, len(events) + 1):
+        signal = countdown.countdown(direction, events[:i], period,
+                                     lookback, field)
+        if signal is not None:
+            return signal
+
+
+def incremental(direction, events, period=13, lookback=2, field='close'):
+    state = countdown.CountdownState(direction, period, lookback, field)
+    for event in events:
+        signal = state.update(event)
+        if signal is not None:
+            return signal
+
+
+class TestCountdownState(tests.Base):
+    def _check(self, direction, df):
+        events = generators.to_events(df)
+        expected = rescan(direction, events)
+        signal = incremental(direction, events)
+
+        self.assertIsNotNone(expected)
+        self.assertEqual(signal, expected)
+        self.assertEqual(signal['signals'], expected['signals'])
+        self.assertEqual(signal['bars'], expected['bars'])
+        self.assertEqual(signal.risk_level, expected.risk_level)
+
+    def test_buy_countdown(self):
+        self._check(countdown.BUY, generators.random_walk(80, drift=-0.5))
+
+    def test_sell_countdown(self):
+        self._check(countdown.SELL, generators.random_walk(80, drift=0.5))
+
+    def test_no_countdown(self):
+        events = generators.to_events(generators.random_walk(10))
+        self.assertIsNone(incremental(countdown.BUY, events))
+        self.assertIsNone(rescan(countdown.BUY, events))
+
+
+class TestCountdownArray(tests.Base):
+    def test_matches_countdown_state(self):
+        df = generators.waves(600)
+        events = generators.to_events(df)
+        setups = setup_.SetupState(9, 4, 'close', 4, 'close')
+
+        states = []
+        starts = []
+        expected = {}
+        for i, event in enumerate(events):
+            for start, state in states:
+                signal = state.update(event)
+                if signal is not None:
+                    expected[start] = (i, signal['high'], signal['low'])
+
+            signal = setups.update(event)
+            if signal is not None:
+                starts.append((i, signal['direction']))
+                states.append((i, countdown.CountdownState(
+                    signal['direction'], 13, 2, 'close', signal)))
+
+        directions = [countdown.DIRECTIONS[d] for _i, d in starts]
+        result = countdown.countdown_array(df['close'].values,
+                                           df['high'].values,
+                                           df['low'].values,
+                                           [i for i, _d in starts],
+                                           directions, chunk=8)
+
+        self.assertGreater(len(expected), 0)
+        for row in result:
+            if row['index'] < 0:
+                self.assertNotIn(row['start'], expected)
+                continue
+            self.assertEqual((row['index'], row['high'], row['low']),
+                             expected[row['start']])
+
+
+class TestBoundedCountdown(tests.Base):
+    def test_expires(self):
+        events = generators.to_events(generators.waves(200))
+        state = countdown.CountdownState(countdown.BUY, 13, 2, 'close',
+                                         max_length=5)
+
+        for event in events[:7]:
+            self.assertIsNone(state.update(event))
+
+        self.assertTrue(state.expired)
+        self.assertEqual(len(state.ring.pins), 0)
+        self.assertIsNone(state.update(events[7]))
+
+    def test_legacy_rejects_max_length(self):
+        self.assertRaises(ValueError, countdown.CountdownWindow, 13, 2,
+                          'close', max_length=5)
+        self.assertRaises(ValueError, type.__call__, countdown.Countdown,
+                          max_length=5)
+        self.assertRaises(ValueError, type.__call__, sequential.Sequential,
+                          countdown_max_length=5)
+
+    def test_sequential_ring_stays_bounded(self):
+        sequence = sequential.SequentialState(4, 'close', 9, 4, 'close',
+                                              True, 13, 2, 'close', 16)
+        for event in generators.to_events(generators.random_walk(2000)):
+            sequence.update(event)
+
+        self.assertLessEqual(sequence.ring.capacity, 32)
@@ -0,0 +1,201 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import datetime
+import functools
+import Queue
+import threading
+import time
+
+import tests
+from tests import generators
+
+from benchmarks import harness
+
+from zl.indicators import feed
+from zl.indicators import utils
+from zl.indicators.core import sequential
+
+
+FACTORY = functools.partial(sequential.SequentialState, 4, 'close', 9, 4,
+                            'close', True, 13, 2, 'close')
+
+
+def fake_feed(frames, delay=0):
+    """Bars of every sid interleaved, as a socket feed would hand them."""
+    events = dict((sid, generators.to_events(df))
+                  for sid, df in frames.items())
+    for i in xrange(max(len(e) for e in events.values())):
+        for sid in sorted(events):
+            if delay:
+                time.sleep(delay)
+            yield sid, events[sid][i]
+
+
+def gapped(frames):
+    """Bars of every sid interleaved, each sid pausing for a while.
+
+    The pauses are long enough for `max_idle` to evict the sid.
+    """
+    events = harness.events(frames)
+    for i in xrange(max(len(e) for e in events.values())):
+        for sid in sorted(events):
+            if not 100 + 20 * sid <= i < 130 + 20 * sid:
+                yield sid, vars(events[sid][i])
+
+
+def by_sid(found):
+    signals = {}
+    for sid, signal in found:
+        signals.setdefault(sid, []).append(
+            (signal['direction'], signal['high'], signal['low']))
+    return signals
+
+
+def summary(found):
+    return [(sid, signal['direction'], signal['high'], signal['low'])
+            for sid, signal in found]
+
+
+class Broken(object):
+    def update(self, bar):
+        raise ValueError("broken")
+
+
+class TestFeed(tests.Base):
+    def setUp(self):
+        super(TestFeed, self).setUp()
+        self.frames = generators.planted_walks(400, sids=3)
+        self.expected = summary(utils.stream(fake_feed(self.frames),
+                                             FACTORY))
+
+    def test_matches_stream(self):
+        live = feed.Feed(FACTORY, maxsize=16).start()
+        everything = live.subscribe(maxsize=len(self.expected))
+        one = live.subscribe(maxsize=len(self.expected), sids=[1])
+
+        live.consume(fake_feed(self.frames))
+        live.close()
+
+        self.assertTrue(self.expected)
+        self.assertEqual(summary(everything), self.expected)
+        self.assertEqual(summary(one), [found for found in self.expected
+                                        if found[0] == 1])
+        self.assertEqual(live.received, 1200)
+        self.assertEqual(live.emitted, len(self.expected))
+
+    def test_slow_subscriber(self):
+        live = feed.Feed(FACTORY).start()
+        slow = live.subscribe(maxsize=2)
+        fast = live.subscribe(maxsize=len(self.expected))
+
+        live.consume(fake_feed(self.frames))
+        live.close(timeout=10)
+
+        self.assertFalse(live.workers[0].is_alive())
+        self.assertEqual(summary(fast), self.expected)
+        self.assertEqual(slow.dropped, len(self.expected) - 2)
+        self.assertEqual(summary(slow), self.expected[-2:])
+
+    def test_backpressure(self):
+        live = feed.Feed(FACTORY, maxsize=4)
+        bars = fake_feed(self.frames)
+        for _i in xrange(4):
+            live.put(next(bars))
+        self.assertRaises(Queue.Full, live.put, next(bars), timeout=0.01)
+
+        live.start()
+        live.put(next(bars), timeout=1)
+        live.close()
+        self.assertEqual(live.received, 5)
+
+    def test_concurrent_subscriber(self):
+        live = feed.Feed(FACTORY, maxsize=8).start()
+        subscription = live.subscribe(maxsize=4)
+        found = []
+
+        def consume():
+            for item in subscription:
+                found.append(item)
+
+        consumer = threading.Thread(target=consume)
+        consumer.start()
+        live.consume(fake_feed(self.frames))
+        live.close()
+        consumer.join(10)
+
+        self.assertFalse(consumer.is_alive())
+        self.assertEqual(len(found) + subscription.dropped,
+                         len(self.expected))
+        self.assertEqual(summary(found[-1:]), self.expected[-1:])
+
+    def test_close_unstarted(self):
+        live = feed.Feed(FACTORY, maxsize=4)
+        subscription = live.subscribe()
+        live.put(next(fake_feed(self.frames)))
+        live.close()
+
+        self.assertIsNone(subscription.get(timeout=1))
+        self.assertEqual(list(subscription), [])
+        self.assertEqual(live.received, 0)
+
+    def test_error(self):
+        live = feed.Feed(Broken, maxsize=1).start()
+        subscription = live.subscribe()
+        live.put((1, {'close': 1.0}))
+
+        self.assertRaises(ValueError, live.close)
+        self.assertIsNone(subscription.get(timeout=1))
+
+    def test_workers(self):
+        frames = generators.planted_walks(400, sids=6)
+        expected = by_sid(utils.stream(fake_feed(frames), FACTORY))
+
+        live = feed.Feed(FACTORY, maxsize=8, workers=3).start()
+        subscription = live.subscribe(maxsize=len(self.expected) * 3)
+        live.consume(fake_feed(frames))
+        live.close(timeout=10)
+
+        self.assertEqual(len(set(live.shard(sid) for sid in frames)), 3)
+        self.assertEqual(live.received, 2400)
+        self.assertEqual(by_sid(subscription), expected)
+
+    def test_workers_evict_per_shard(self):
+        frames = generators.planted_walks(400, sids=6)
+        max_idle = datetime.timedelta(days=10)
+
+        live = feed.Feed(FACTORY, max_idle=max_idle, workers=3).start()
+        subscription = live.subscribe(maxsize=1000)
+        live.consume(gapped(frames))
+        live.close(timeout=10)
+
+        # NOTE(jkoelker) Each shard evicts on its own bars alone, the same
+        #                as a single worker fed only that shard's bars
+        expected = {}
+        for position in xrange(3):
+            states = utils.SidWindows(FACTORY, max_idle=max_idle)
+            for sid, bar in gapped(frames):
+                if live.shard(sid) != position:
+                    continue
+                signal = states.touch(sid, bar['dt']).update(bar)
+                if signal is not None:
+                    expected.setdefault(sid, []).append(
+                        (signal['direction'], signal['high'],
+                         signal['low']))
+
+        self.assertEqual(by_sid(subscription), expected)
+        self.assertNotEqual(expected,
+                            by_sid(utils.stream(gapped(frames), FACTORY)))
@@ -53,3 +53,40 @@ class TestFlip(tests.Base):
         signal = flip.flip(events, 'close')
 
         self.assertIsNone(signal)
+
+
+class TestFlipState(tests.Base):
+    def test_matches_flip(self):
+        events = generators.to_events(generators.waves(200))
+        state = flip.FlipState(4, 'close')
+
+        found = 0
+        for i, event in enumerate(events):
+            signal = state.update(event)
+            expected = None
+            if i >= 5:
+                expected = flip.flip(events[i - 5:i + 1], 'close')
+
+            self.assertEqual(signal, expected)
+            found = found + (signal is not None)
+
+        self.assertGreater(found, 0)
+
+
+class TestFlipArray(tests.Base):
+    def test_matches_flip_state(self):
+        df = generators.waves(300)
+        state = flip.FlipState(4, 'close')
+
+        expected = []
+        for i, event in enumerate(generators.to_events(df)):
+            signal = state.update(event)
+            if signal is not None:
+                expected.append((i, flip.DIRECTIONS[signal['direction']]))
+
+        result = flip.flip_array(df['close'].values, 4)
+        self.assertEqual(zip(result['index'], result['direction']),
+                         expected)
+
+    def test_short_history(self):
+        self.assertEqual(len(flip.flip_array([1, 2, 3], 4)), 0)
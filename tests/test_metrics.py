@@ -0,0 +1,105 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import tests
+from tests import generators
+
+from benchmarks import harness
+
+from zl.indicators import countdown
+from zl.indicators import flip
+from zl.indicators import sequential
+from zl.indicators import setup as setup_
+
+
+def events(length=300, sids=3):
+    """The Events of every sid, one bar of all of them at a time."""
+    frames = dict((sid, generators.random_walk(length, drift=0.1))
+                  for sid in xrange(sids))
+    found = harness.events(frames)
+    for bar in xrange(length):
+        for sid in sorted(found):
+            yield found[sid][bar]
+
+
+class TestMetrics(tests.Base):
+    def _run(self, cls, **params):
+        plain = harness.create(cls, **params)
+        measured = harness.create(cls, **params)
+        snapshots = []
+        metrics = measured.enable_metrics(snapshots.append, interval=100)
+
+        for event in events():
+            self.assertEqual(measured.update(event), plain.update(event))
+
+        snapshot = metrics.flush()
+        self.assertEqual(snapshot['events'], 900)
+        self.assertEqual(snapshot['sids'], 3)
+        self.assertEqual(len(snapshots), 10)
+        self.assertEqual([s['events'] for s in snapshots[:9]],
+                         range(100, 1000, 100))
+        self.assertEqual(snapshot['histograms'].keys(),
+                         snapshot['seconds'].keys())
+        self.assertEqual(sum(snapshot['histograms']['update']), 900)
+        self.assertTrue(snapshot['window_length']['max'] > 0)
+        return measured, snapshot
+
+    def test_flip(self):
+        _transform, snapshot = self._run(flip.Flip)
+        self.assertEqual(sum(snapshot['histograms']['flip']), 900)
+        self.assertEqual(sum(snapshot['signals'].values()),
+                         snapshot['emitted'])
+        self.assertTrue(snapshot['emitted'] > 0)
+
+    def test_setup(self):
+        _transform, snapshot = self._run(setup_.Setup)
+        self.assertEqual(sum(snapshot['histograms']['setup']), 900)
+        self.assertEqual(sum(snapshot['histograms']['flip']), 900)
+        self.assertEqual(snapshot['emitted'],
+                         snapshot['signals'].get('setup.Buy', 0) +
+                         snapshot['signals'].get('setup.Sell', 0))
+
+    def test_countdown(self):
+        _transform, snapshot = self._run(countdown.Countdown, max_length=40)
+        # NOTE(jkoelker) Both directions see every bar, restarts replay
+        #                the last lookback bars on top
+        self.assertTrue(sum(snapshot['histograms']['countdown']) >= 1800)
+        self.assertEqual(sum(snapshot['signals'].values()),
+                         snapshot['emitted'])
+
+    def test_sequential(self):
+        transform, snapshot = self._run(sequential.Sequential)
+        self.assertEqual(sum(snapshot['histograms']['setup']), 900)
+        for stage in ('flip', 'countdown', 'perfection'):
+            self.assertIn(stage, snapshot['seconds'])
+        self.assertEqual(snapshot['emitted'],
+                         snapshot['signals'].get('countdown.Buy', 0) +
+                         snapshot['signals'].get('countdown.Sell', 0))
+
+        transform.disable_metrics()
+        self.assertIsNone(transform.metrics)
+        for _sid, window in transform.sid_windows.items():
+            self.assertIsNone(window.metrics)
+            self.assertNotIn('update', window.state.setup.__dict__)
+            self.assertNotIn('update', window.state.setup.flip.__dict__)
+
+    def test_disabled(self):
+        transform = harness.create(sequential.Sequential)
+        self.assertIsNone(transform.metrics)
+        for event in events(50):
+            transform.update(event)
+        for _sid, window in transform.sid_windows.items():
+            self.assertNotIn('update', window.state.setup.__dict__)
@@ -0,0 +1,94 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+import os
+import shutil
+import tempfile
+
+import tests
+from tests import generators
+
+from zl.indicators import plot
+from zl.indicators.core import sequential
+
+
+def countdowns(length=200):
+    df = generators.planted_walks(length)[0]
+    state = sequential.SequentialState(4, 'close', 9, 4, 'close', True,
+                                       13, 2, 'close')
+    signals = []
+    for dt, row in df.iterrows():
+        event = row.to_dict()
+        event['dt'] = dt
+        signal = state.update(event)
+        if signal is not None:
+            signals.append(signal)
+    return signals
+
+
+class TestPlot(tests.Base):
+    def setUp(self):
+        super(TestPlot, self).setUp()
+        try:
+            import matplotlib  # noqa
+        except ImportError:
+            self.skipTest('matplotlib is not installed')
+
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.signals = countdowns()
+
+    def test_chart(self):
+        signal = self.signals[0]
+        setup, layer = plot.chart(signal)
+
+        columns, marks = setup
+        bars = signal['setup']['flip']['bars'] + signal['setup']['bars']
+        self.assertEqual(columns['close'].tolist(),
+                         [bar['close'] for bar in bars])
+        self.assertEqual(marks[:4], [(0, 'X', True), (1, 'Y', True),
+                                     (4, "X'", True), (5, "Y'", True)])
+        self.assertEqual(marks[4:], [(index, str(count), False)
+                                     for count, index
+                                     in enumerate(xrange(5, len(bars)), 1)])
+
+        columns, marks = layer
+        self.assertEqual(len(columns['dt']), len(signal['bars']))
+        self.assertEqual([index for index, _label, _above in marks],
+                         signal['signals'])
+
+        self.assertEqual(len(plot.chart(signal['setup'])), 1)
+
+    def test_render_all(self):
+        names = ['a%s' % i for i in xrange(len(self.signals))]
+        paths = plot.render_all(self.signals, self.path, names=names,
+                                processes=1)
+        self.assertEqual(paths, [os.path.join(self.path, '%s.png' % name)
+                                 for name in names])
+        for path in paths:
+            with open(path, 'rb') as image:
+                self.assertEqual(image.read(8), '\x89PNG\r\n\x1a\n')
+
+    def test_render_all_pool(self):
+        # NOTE(jkoelker) Render in this process first so the workers are
+        #                forked with fonts already open
+        plot.render_all(self.signals[:1], self.path, names=['parent'],
+                        format='svg', processes=1)
+
+        paths = plot.render_all(self.signals[:4], self.path, format='svg',
+                                processes=2)
+        self.assertEqual(sorted(os.listdir(self.path)),
+                         ['0.svg', '1.svg', '2.svg', '3.svg', 'parent.svg'])
+        self.assertEqual(len(paths), 4)
@@ -0,0 +1,220 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import datetime
+
+import numpy as np
+
+import tests
+from tests import generators
+
+from benchmarks import harness
+
+from zl.indicators import sequential as sequential_
+from zl.indicators.core import countdown
+from zl.indicators.core import flip
+from zl.indicators.core import sequential
+from zl.indicators.core import setup as setup_
+
+
+def summary(signal):
+    if signal is None:
+        return
+    values = [signal['direction']]
+    for key in ('high', 'low', 'perfection', 'signals'):
+        if key in signal:
+            values.append(signal[key])
+    values.append(getattr(signal, 'risk_level', None))
+    values.append(signal.column('close').tolist())
+    if signal.get('setup') is not None:
+        values.append(summary(signal['setup']))
+        values.append(signal['setup'].is_perfect)
+    return values
+
+
+class TestPrime(tests.Base):
+    def _check(self, factory, splits=(0, 1, 5, 17, 60, 133, 281, 399)):
+        df = generators.planted_walks(600)[0]
+        events = generators.to_events(df)
+        columns = dict((field, df[field].values) for field in df)
+        found = 0
+
+        for split in splits:
+            replayed = factory()
+            for event in events[:split]:
+                replayed.update(event)
+
+            primed = factory()
+            primed.prime(dict((field, values[:split])
+                              for field, values in columns.items()))
+
+            for event in events[split:]:
+                expected = summary(replayed.update(event))
+                self.assertEqual(summary(primed.update(event)), expected)
+                found = found + (expected is not None)
+
+        self.assertTrue(found)
+
+    def test_flip(self):
+        self._check(lambda: flip.FlipState(4, 'close'))
+
+    def test_setup(self):
+        self._check(lambda: setup_.SetupState(9, 4, 'close', 4, 'close'))
+
+    def test_setup_state(self):
+        df = generators.random_walk(500)
+        columns = dict((field, df[field].values) for field in df)
+
+        for split in xrange(0, 500, 7):
+            replayed = setup_.SetupState(9, 4, 'close', 4, 'close')
+            for event in generators.to_events(df[:split]):
+                replayed.update(event)
+
+            primed = setup_.SetupState(9, 4, 'close', 4, 'close')
+            primed.prime(dict((field, values[:split])
+                              for field, values in columns.items()))
+
+            for name in ('counter', 'below', 'above'):
+                self.assertEqual(getattr(primed, name),
+                                 getattr(replayed, name))
+            self.assertEqual(primed.flip.start, replayed.flip.start)
+            self.assertEqual(summary(primed.flip_signal),
+                             summary(replayed.flip_signal))
+
+    def test_countdown(self):
+        self._check(lambda: countdown.StandaloneState(13, 2, 'close'))
+
+    def test_countdown_bounded(self):
+        self._check(lambda: countdown.StandaloneState(13, 2, 'close',
+                                                      max_length=40))
+
+    def _following(self, max_length=None):
+        """A factory of countdowns following the first setup found."""
+        df = generators.planted_walks(600)[0]
+        state = setup_.SetupState(9, 4, 'close', 4, 'close')
+        for event in generators.to_events(df):
+            signal = state.update(event)
+            if signal is not None:
+                break
+        bars = [dict(bar) for bar in signal['bars']]
+
+        def factory():
+            setup_signal = setup_.Signal(signal['direction'], signal['high'],
+                                         signal['low'], list(bars),
+                                         signal['perfection'],
+                                         signal['flip'])
+            return countdown.CountdownState(signal['direction'], 13, 2,
+                                            'close', setup_signal,
+                                            max_length=max_length)
+        return factory
+
+    def test_countdown_following_setup(self):
+        self._check(self._following())
+
+    def test_countdown_following_setup_expires(self):
+        factory = self._following(max_length=12)
+        df = generators.planted_walks(600)[0]
+        columns = dict((field, df[field].values) for field in df)
+
+        for split in xrange(0, 40, 3):
+            replayed = factory()
+            for event in generators.to_events(df[:split]):
+                self.assertIsNone(replayed.update(event))
+
+            primed = factory()
+            primed.prime(dict((field, values[:split])
+                              for field, values in columns.items()))
+
+            for name in ('expired', 'start', 'signals', 'qualifier', 'high',
+                         'low', 'high_range', 'low_range'):
+                self.assertEqual(getattr(primed, name),
+                                 getattr(replayed, name))
+            self.assertEqual(primed.ring.count, replayed.ring.count)
+            self.assertEqual(dict(primed.ring.pins),
+                             dict(replayed.ring.pins))
+            self.assertEqual(primed.setup_signal._perfect,
+                             replayed.setup_signal._perfect)
+
+        self.assertTrue(primed.expired)
+
+    def test_sequential(self):
+        self._check(lambda: sequential.SequentialState(4, 'close', 9, 4,
+                                                       'close', True, 13, 2,
+                                                       'close'))
+
+    def test_sequential_bounded(self):
+        self._check(lambda: sequential.SequentialState(4, 'close', 9, 4,
+                                                       'close', True, 13, 2,
+                                                       'close', 30))
+
+    def test_sequential_countdown(self):
+        df = generators.random_walk(600, drift=0.1)
+        columns = dict((field, df[field].values) for field in df)
+
+        for split in xrange(100, 600, 11):
+            replayed = sequential.SequentialState(4, 'close', 9, 4, 'close',
+                                                  True, 13, 2, 'close')
+            for event in generators.to_events(df[:split]):
+                replayed.update(event)
+
+            primed = sequential.SequentialState(4, 'close', 9, 4, 'close',
+                                                True, 13, 2, 'close')
+            primed.prime(dict((field, values[:split])
+                              for field, values in columns.items()))
+
+            if replayed.countdown is None:
+                self.assertIsNone(primed.countdown)
+                continue
+
+            for name in ('start', 'signals', 'qualifier', 'high', 'low'):
+                self.assertEqual(getattr(primed.countdown, name),
+                                 getattr(replayed.countdown, name))
+            self.assertEqual(summary(primed.setup_signal),
+                             summary(replayed.setup_signal))
+            self.assertEqual(primed.setup_signal._perfect,
+                             replayed.setup_signal._perfect)
+            self.assertTrue(np.all(primed.ring.pins == replayed.ring.pins))
+
+
+class TestPrimeEviction(tests.Base):
+    def setUp(self):
+        super(TestPrimeEviction, self).setUp()
+        self.frames = generators.planted_walks(100, sids=4)
+        self.events = harness.events(self.frames)
+
+    def _primed(self, **params):
+        transform = harness.create(sequential_.Sequential, **params)
+        for sid, df in self.frames.items():
+            transform.prime_from_frame(sid, df[:60])
+        return transform
+
+    def test_max_idle(self):
+        transform = self._primed(max_idle=datetime.timedelta(days=5))
+        self.assertEqual(sorted(transform.sid_windows), [0, 1, 2, 3])
+
+        for bar in xrange(60, 100):
+            for sid in (2, 3):
+                transform.update(self.events[sid][bar])
+
+        self.assertEqual(sorted(transform.sid_windows), [2, 3])
+        self.assertEqual(sorted(transform.sid_windows.last_seen), [2, 3])
+
+    def test_max_sids(self):
+        transform = self._primed(max_sids=2)
+        self.assertEqual(sorted(transform.sid_windows), [2, 3])
+
+        transform.update(self.events[0][60])
+        self.assertEqual(sorted(transform.sid_windows), [0, 3])
@@ -0,0 +1,182 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import tests
+from tests import generators
+
+from zl.indicators import flip
+from zl.indicators import ring
+from zl.indicators import sequential
+from zl.indicators import setup as setup_
+
+
+def bars(count):
+    return [{'close': float(i), 'high': i + 1.0, 'low': i - 1.0}
+            for i in xrange(count)]
+
+
+class TestBarRing(tests.Base):
+    def test_wraps(self):
+        buf = ring.BarRing(['close'], capacity=4)
+        events = bars(10)
+        for event in events:
+            buf.append(event)
+
+        self.assertEqual(buf.capacity, 4)
+        self.assertEqual(buf.oldest, 6)
+        self.assertEqual(buf.value('close', 9), 9.0)
+        self.assertEqual(buf.slice(6, 10), events[6:])
+        self.assertRaises(AssertionError, buf.slice, 5, 10)
+
+    def test_pin_grows(self):
+        buf = ring.BarRing(['close'], capacity=4)
+        events = bars(10)
+        for event in events[:3]:
+            buf.append(event)
+
+        buf.pin(1)
+        for event in events[3:]:
+            buf.append(event)
+
+        self.assertEqual(buf.slice(1, 10), events[1:])
+
+        buf.unpin(1)
+        self.assertEqual(len(buf.pins), 0)
+
+    def test_shrinks_after_unpin(self):
+        buf = ring.BarRing(['close'], capacity=4)
+        events = bars(11)
+        for event in events[:3]:
+            buf.append(event)
+
+        buf.pin(1)
+        for event in events[3:10]:
+            buf.append(event)
+        self.assertEqual(buf.capacity, 16)
+
+        buf.unpin(1)
+        buf.append(events[10])
+        self.assertEqual(buf.capacity, 4)
+        self.assertEqual(buf.slice(7, 11), events[7:])
+
+    def test_reserve(self):
+        buf = ring.BarRing(['close'], capacity=2)
+        events = bars(3)
+        for event in events:
+            buf.append(event)
+
+        buf.reserve(5)
+        self.assertEqual(buf.capacity, 5)
+        self.assertEqual(buf.slice(1, 3), events[1:])
+
+
+class TestSequentialState(tests.Base):
+    def test_shared_ring(self):
+        state = sequential.SequentialState(4, 'close', 9, 4, 'close', True,
+                                           13, 2, 'close')
+        events = generators.to_events(generators.waves(400))
+
+        for event in events:
+            state.update(event)
+
+        self.assertIs(state.setup.ring, state.ring)
+        self.assertIs(state.setup.flip.ring, state.ring)
+        self.assertEqual(state.ring.count, len(events))
+        self.assertLess(state.ring.capacity, len(events))
+
+
+class TestRingSignals(tests.Base):
+    def test_detached_before_overwrite(self):
+        buf = ring.BarRing(['close'], capacity=4)
+        events = bars(10)
+        for event in events[:4]:
+            buf.append(event)
+
+        signal = flip.Signal(flip.BEAR, ring=buf, start=1, end=4)
+        self.assertIsNone(signal._bars)
+        self.assertEqual(signal['bars'], events[1:4])
+
+        for event in events[4:]:
+            buf.append(event)
+
+        self.assertIsNone(signal.ring)
+        self.assertEqual(signal['bars'], events[1:4])
+        self.assertEqual(signal, {'direction': flip.BEAR,
+                                  'bars': events[1:4]})
+
+    def test_copied_on_shrink(self):
+        buf = ring.BarRing(['close'], capacity=4)
+        events = bars(11)
+        for event in events[:3]:
+            buf.append(event)
+
+        buf.pin(1)
+        for event in events[3:10]:
+            buf.append(event)
+
+        held = flip.Signal(flip.BEAR, ring=buf, start=2, end=6)
+        flip.Signal(flip.BULL, ring=buf, start=3, end=7)
+        kept = flip.Signal(flip.BULL, ring=buf, start=7, end=10)
+
+        buf.unpin(1)
+        buf.append(events[10])
+        self.assertEqual(buf.capacity, 4)
+        self.assertEqual(len(buf.tracked), 1)
+
+        self.assertIsNone(held.ring)
+        self.assertEqual(held['bars'], events[2:6])
+        self.assertIs(kept.ring, buf)
+        self.assertIsNone(kept._bars)
+
+    def test_held_signals_copied(self):
+        state = sequential.SequentialState(4, 'close', 9, 4, 'close', True,
+                                           13, 2, 'close')
+        held = []
+        grown = 0
+        for event in generators.to_events(generators.planted_walks(1000)[0]):
+            signal = state.update(event)
+            grown = max(grown, state.ring.capacity)
+            if signal is not None and 'setup' in signal:
+                held.append(signal)
+
+        self.assertEqual(len(held), 39)
+        self.assertGreater(grown, state.ring.reserved)
+        self.assertEqual(state.ring.capacity, state.ring.reserved)
+
+        # NOTE(jkoelker) Every countdown held past the ring owns a copy of
+        #                its bars, and so do the setup and flip in it
+        for signal in held:
+            self.assertIsNone(signal.ring)
+            self.assertIsNotNone(signal._bars)
+            self.assertIsNotNone(signal['setup']._bars)
+            self.assertIsNotNone(signal['setup']['flip']._bars)
+
+    def test_compact(self):
+        state = setup_.SetupState(9, 4, 'close', 4, 'close')
+        signals = []
+        for event in generators.to_events(generators.waves(200)):
+            signal = state.update(event)
+            if signal is not None:
+                signals.append(signal)
+
+        self.assertGreater(len(signals), 0)
+        for signal in signals:
+            self.assertFalse(hasattr(signal, '__dict__'))
+            self.assertEqual(len(signal['bars']), 8)
+            self.assertIsNotNone(signal.risk_level)
+            self.assertEqual(set(signal.keys()),
+                             set(['direction', 'high', 'low', 'bars',
+                                  'flip', 'perfection']))
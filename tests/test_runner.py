@@ -0,0 +1,63 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import pandas as pd
+
+import tests
+from tests import generators
+
+from zl.indicators import countdown
+from zl.indicators import runner
+from zl.indicators import sequential
+
+
+def history(sids=5, length=500):
+    index = pd.date_range('2013-01-01', periods=length)
+    frames = {}
+    for sid in xrange(sids):
+        frame = generators.random_walk(length)
+        frame.index = index
+        frames[sid] = frame
+    return frames
+
+
+class TestRunner(tests.Base):
+    def test_matches_sequential(self):
+        frames = history()
+
+        expected = []
+        for sid, frame in frames.items():
+            state = sequential.SequentialState(4, 'close', 9, 4, 'close',
+                                               True, 13, 2, 'close')
+            for i, event in enumerate(generators.to_events(frame)):
+                signal = state.update(event)
+                if signal is not None:
+                    expected.append((frame.index[i], sid,
+                                     countdown.DIRECTIONS[signal.direction],
+                                     signal.high, signal.low))
+        expected.sort()
+
+        for processes in (1, 2):
+            result = runner.run(frames, processes=processes, chunksize=2)
+            found = [(pd.Timestamp(dt), row['sid'], row['direction'],
+                      row['high'], row['low'])
+                     for dt, row in result.iterrows()]
+            self.assertTrue(expected)
+            self.assertEqual(found, expected)
+
+    def test_empty(self):
+        result = runner.run(history(sids=2, length=5), processes=1)
+        self.assertEqual(len(result), 0)
@@ -42,3 +42,76 @@ class TestSetup(tests.Base):
 
         self.assertIsNotNone(signal)
         self.assertEqual(signal['direction'], module.BUY)
+
+
+def rescan(events, period=9, lookback=4, flip_period=4, field='close'):
+    window_length = period + lookback - 1
+    flip_events = []
+    flip_signal = None
+    counter = 0
+
+    for i, event in enumerate(events):
+        flip_events.append(event)
+        signal = None
+        if len(flip_events) >= flip_period + 2:
+            signal = flip.flip(flip_events[-(flip_period + 2):], field)
+
+        counter = counter + 1
+        if signal:
+            flip_signal = signal
+            counter = 1
+
+        ticks = events[max(0, i + 1 - window_length):i + 1]
+        if len(ticks) < window_length or not flip_signal:
+            yield None
+            continue
+
+        if counter == period:
+            yield module.setup(ticks, field, period, lookback, flip_signal)
+            flip_events = []
+            flip_signal = None
+            counter = 0
+            continue
+
+        yield None
+
+
+class TestSetupState(tests.Base):
+    def test_matches_setup(self):
+        events = generators.to_events(generators.waves(400))
+        state = module.SetupState(9, 4, 'close', 4, 'close')
+
+        found = 0
+        for event, expected in zip(events, rescan(events)):
+            signal = state.update(event)
+            self.assertEqual(signal, expected)
+            found = found + (signal is not None)
+
+            if signal is not None:
+                self.assertEqual(signal.risk_level, expected.risk_level)
+                self.assertEqual(signal.is_perfect, expected.is_perfect)
+                self.assertEqual(signal._perfect, expected._perfect)
+
+        self.assertGreater(found, 0)
+
+
+class TestSetupArray(tests.Base):
+    def test_matches_setup_state(self):
+        df = generators.waves(600)
+        state = module.SetupState(9, 4, 'close', 4, 'close')
+
+        expected = []
+        for i, event in enumerate(generators.to_events(df)):
+            signal = state.update(event)
+            if signal is not None:
+                expected.append((i, module.DIRECTIONS[signal['direction']],
+                                 signal['high'], signal['low'],
+                                 signal['perfection']))
+
+        result = module.setup_array(df['close'].values, df['high'].values,
+                                    df['low'].values, 9, 4)
+        rows = zip(result['index'], result['direction'], result['high'],
+                   result['low'], result['perfection'])
+
+        self.assertGreater(len(expected), 0)
+        self.assertEqual(rows, expected)
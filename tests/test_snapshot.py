@@ -0,0 +1,153 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import datetime
+import io
+
+import numpy as np
+
+import tests
+from tests import generators
+
+from benchmarks import harness
+
+from zl.indicators import sequential as sequential_
+from zl.indicators.core import countdown
+from zl.indicators.core import flip
+from zl.indicators.core import sequential
+from zl.indicators.core import setup as setup_
+from zl.indicators.core import snapshot
+
+
+def summary(signal):
+    if signal is None:
+        return
+    values = [signal['direction']]
+    for key in ('high', 'low', 'perfection', 'signals'):
+        if key in signal:
+            values.append(signal[key])
+    values.append(getattr(signal, 'risk_level', None))
+    values.append(signal.column('close').tolist())
+    if 'high' in signal:
+        values.append(signal.column('high').tolist())
+    if 'setup' in signal:
+        values.append(summary(signal['setup']))
+    return values
+
+
+class TestSnapshot(tests.Base):
+    def _check(self, factory, splits=(1, 7, 40, 113, 250, 391)):
+        frames = generators.planted_walks(500, sids=3)
+        events = dict((sid, generators.to_events(df))
+                      for sid, df in frames.items())
+        found = 0
+
+        for split in splits:
+            states = dict((sid, factory()) for sid in frames)
+            for sid, state in states.items():
+                for event in events[sid][:split]:
+                    state.update(event)
+
+            fileobj = io.BytesIO()
+            snapshot.dump(sorted(states.items()), fileobj)
+            fileobj.seek(0)
+
+            restored = {}
+            for sid, data in snapshot.load(fileobj):
+                restored[sid] = factory()
+                restored[sid].load(data)
+            self.assertEqual(sorted(restored), sorted(states))
+
+            for sid in frames:
+                for event in events[sid][split:]:
+                    expected = summary(states[sid].update(event))
+                    self.assertEqual(summary(restored[sid].update(event)),
+                                     expected)
+                    found = found + (expected is not None)
+
+        self.assertTrue(found)
+
+    def test_flip(self):
+        self._check(lambda: flip.FlipState(4, 'close'))
+
+    def test_setup(self):
+        self._check(lambda: setup_.SetupState(9, 4, 'close', 4, 'close'))
+
+    def test_countdown(self):
+        self._check(lambda: countdown.StandaloneState(13, 2, 'close',
+                                                      max_length=40))
+
+    def test_sequential(self):
+        self._check(lambda: sequential.SequentialState(4, 'close', 9, 4,
+                                                       'close', True, 13, 2,
+                                                       'close'))
+
+    def test_sequential_bounded(self):
+        self._check(lambda: sequential.SequentialState(4, 'close', 9, 4,
+                                                       'close', True, 13, 2,
+                                                       'close', 30))
+
+    def test_version(self):
+        fileobj = io.BytesIO()
+        np.savez(fileobj, version=np.array([snapshot.VERSION + 1]))
+        fileobj.seek(0)
+        self.assertRaises(ValueError, list, snapshot.load(fileobj))
+
+    def test_legacy(self):
+        self.assertRaises(ValueError, snapshot.dump, [(1, None)],
+                          io.BytesIO())
+
+
+class TestTransformSnapshot(tests.Base):
+    def setUp(self):
+        super(TestTransformSnapshot, self).setUp()
+        self.frames = generators.planted_walks(100, sids=4)
+        self.events = harness.events(self.frames)
+
+        self.fileobj = io.BytesIO()
+        transform = harness.create(sequential_.Sequential)
+        for sid in self.frames:
+            for event in self.events[sid][:60]:
+                transform.update(event)
+        transform.dump_state(self.fileobj)
+        self.fileobj.seek(0)
+
+    def _restored(self, **params):
+        transform = harness.create(sequential_.Sequential, **params)
+        transform.load_state(self.fileobj)
+        return transform
+
+    def test_max_idle(self):
+        transform = self._restored(max_idle=datetime.timedelta(days=5))
+        self.assertEqual(sorted(transform.sid_windows), [0, 1, 2, 3])
+
+        for bar in xrange(60, 100):
+            for sid in (2, 3):
+                transform.update(self.events[sid][bar])
+
+        self.assertEqual(sorted(transform.sid_windows), [2, 3])
+        self.assertEqual(sorted(transform.sid_windows.last_seen), [2, 3])
+
+    def test_max_sids(self):
+        transform = self._restored(max_sids=2)
+        self.assertEqual(sorted(transform.sid_windows), [2, 3])
+
+    def test_legacy(self):
+        transform = harness.create(sequential_.Sequential,
+                                   incremental=False)
+        self.assertRaises(ValueError, transform.load_state, self.fileobj)
+        self.assertRaises(ValueError, transform.dump_state, io.BytesIO())
+        self.assertEqual(len(transform.sid_windows), 0)
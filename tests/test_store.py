@@ -0,0 +1,94 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import random
+import shutil
+import tempfile
+
+import numpy as np
+
+import tests
+from tests import generators
+
+from zl.indicators import store
+from zl.indicators import universe
+
+
+def key(row, values):
+    # NOTE(jkoelker) NaN never equals itself, compare None instead
+    return (row,) + tuple(None if v != v else v for v in values)
+
+
+class TestBarStore(tests.Base):
+    def setUp(self):
+        super(TestBarStore, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+
+        self.length = 400
+        self.sids = [3, 7, 11, 20]
+        self.frames = dict((sid, generators.waves(self.length,
+                                                  wavelength=30 + sid))
+                           for sid in self.sids)
+
+        bars = store.BarStore.create(self.path, self.sids, self.length)
+        for sid, df in self.frames.items():
+            columns = dict((field, df[field].values)
+                           for field in store.FIELDS)
+            # NOTE(jkoelker) Drop some bars so not every sid trades
+            #                every bar
+            missing = [random.random() < 0.1 for _i in xrange(self.length)]
+            for field in store.FIELDS:
+                columns[field][np.array(missing)] = np.nan
+            bars.write(sid, columns)
+        bars.flush()
+
+    def test_roundtrip(self):
+        bars = store.BarStore(self.path)
+        self.assertEqual(bars.fields, sorted(store.FIELDS))
+        self.assertEqual(len(bars), self.length)
+        self.assertEqual(bars.sids.tolist(), self.sids)
+        self.assertIsInstance(bars.columns['close'], np.memmap)
+
+    def test_chunks(self):
+        bars = store.BarStore(self.path)
+        chunks = list(bars.chunks(64, ['close']))
+        self.assertEqual([start for start, _c in chunks],
+                         range(0, self.length, 64))
+        closes = np.concatenate([c['close'] for _s, c in chunks])
+        self.assertTrue(np.array_equal(np.isnan(closes),
+                                       np.isnan(bars.columns['close'])))
+
+    def test_scan_matches_universe(self):
+        bars = store.BarStore(self.path)
+        engine = universe.Universe(countdown_max_length=30)
+        expected = []
+
+        for row in xrange(self.length):
+            closes = bars.columns['close'][row]
+            trading = ~np.isnan(closes)
+            sids = bars.sids[trading]
+            found = engine.step(sids, dict(
+                (field, bars.columns[field][row, trading])
+                for field in engine.fields))
+            expected.extend(key(row, s) for s in found.tolist())
+
+        self.assertTrue(expected)
+        for chunk in (37, self.length):
+            result = []
+            for found in store.scan(bars, chunk, countdown_max_length=30):
+                result.extend(key(r[-1], r[:-1]) for r in found.tolist())
+            self.assertEqual(result, expected)
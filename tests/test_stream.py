@@ -0,0 +1,98 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import subprocess
+import sys
+
+import tests
+from tests import generators
+
+from zl.indicators.core import countdown
+from zl.indicators.core import flip
+from zl.indicators.core import sequential
+from zl.indicators.core import setup as setup_
+
+
+def interleave(frames):
+    events = dict((sid, generators.to_events(df))
+                  for sid, df in frames.items())
+    for i in xrange(max(len(e) for e in events.values())):
+        for sid in sorted(events):
+            yield sid, events[sid][i]
+
+
+def per_sid(frames, factory):
+    expected = []
+    for sid, df in frames.items():
+        state = factory()
+        for i, event in enumerate(generators.to_events(df)):
+            signal = state.update(event)
+            if signal is not None:
+                expected.append((i, sid, signal))
+    return [(sid, found) for _i, sid, found in sorted(expected)]
+
+
+class TestStream(tests.Base):
+    def setUp(self):
+        super(TestStream, self).setUp()
+        self.frames = dict((sid, generators.random_walk(300))
+                           for sid in xrange(3))
+
+    def _check(self, found, factory):
+        expected = per_sid(self.frames, factory)
+        self.assertTrue(expected)
+        self.assertEqual(list(found), expected)
+
+    def test_flip(self):
+        self._check(flip.stream(interleave(self.frames)),
+                    lambda: flip.FlipState(4, 'close'))
+
+    def test_setup(self):
+        self._check(setup_.stream(interleave(self.frames)),
+                    lambda: setup_.SetupState(9, 4, 'close', 4, 'close'))
+
+    def test_countdown(self):
+        self._check(countdown.stream(interleave(self.frames)),
+                    lambda: countdown.StandaloneState(13, 2, 'close'))
+
+    def test_sequential(self):
+        self._check(sequential.stream(interleave(self.frames)),
+                    lambda: sequential.SequentialState(4, 'close', 9, 4,
+                                                       'close', True, 13, 2,
+                                                       'close'))
+
+    def test_mappings(self):
+        events = []
+        for sid, event in interleave(self.frames):
+            event['sid'] = sid
+            events.append(event)
+
+        found = [(sid, s['direction']) for sid, s in flip.stream(events)]
+        expected = [(sid, s['direction'])
+                    for sid, s in flip.stream(interleave(self.frames))]
+        self.assertEqual(found, expected)
+
+    def test_lazy(self):
+        found = flip.stream(iter([{'close': 1}]))
+        self.assertEqual(list(found), [])
+
+    def test_no_zipline(self):
+        code = ('import sys; import zl.indicators.core.sequential; '
+                'sys.exit("zipline" in sys.modules)')
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        self.assertEqual(subprocess.call([sys.executable, '-c', code],
+                                         env=env), 0)
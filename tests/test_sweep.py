@@ -0,0 +1,91 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import tests
+from tests import generators
+
+from zl.indicators import sweep
+from zl.indicators.core import countdown
+from zl.indicators.core import sequential
+from zl.indicators.core import setup as setup_
+
+
+CODES = dict((value, key) for key, value in countdown.DIRECTIONS.items())
+
+
+def replay(df, params):
+    values = dict(sweep.DEFAULTS, **params)
+    state = sequential.SequentialState(values['flip_period'], 'close',
+                                       values['setup_period'],
+                                       values['setup_lookback'], 'close',
+                                       values['setup_reverse_cancel'],
+                                       values['countdown_period'],
+                                       values['countdown_lookback'], 'close',
+                                       values['countdown_max_length'])
+    found = []
+    for index, event in enumerate(generators.to_events(df)):
+        signal = state.update(event)
+        if signal is not None:
+            found.append((index, signal['direction'], signal['high'],
+                          signal['low']))
+    return found
+
+
+class TestSweep(tests.Base):
+    def setUp(self):
+        super(TestSweep, self).setUp()
+        self.df = generators.planted_walks(600)[0]
+        self.columns = dict((field, self.df[field].values)
+                            for field in self.df)
+
+    def test_grid(self):
+        configs = sweep.grid(setup_period=[8, 9], countdown_period=[13])
+        self.assertEqual(configs, [{'countdown_period': 13,
+                                    'setup_period': 8},
+                                   {'countdown_period': 13,
+                                    'setup_period': 9}])
+
+    def test_unknown(self):
+        engine = sweep.Sweep(self.columns)
+        self.assertRaises(TypeError, engine.run, period=9)
+
+    def test_setups(self):
+        engine = sweep.Sweep(self.columns)
+        for period, lookback in ((9, 4), (8, 3), (9, 2)):
+            expected = setup_.setup_array(self.columns['close'],
+                                          self.columns['high'],
+                                          self.columns['low'], period,
+                                          lookback, 4)
+            result = engine.run(setup_period=period, setup_lookback=lookback)
+            self.assertEqual(result.setups.tolist(), expected.tolist())
+
+    def test_countdowns(self):
+        configs = sweep.grid(setup_period=[8, 9],
+                             setup_reverse_cancel=[True, False],
+                             countdown_period=[11, 13],
+                             countdown_max_length=[None, 30])
+        results = sweep.sweep(self.columns, configs)
+        self.assertEqual(len(results), len(configs))
+
+        found = 0
+        for result in results:
+            expected = replay(self.df, result.params)
+            emitted = [(row['index'], CODES[row['direction']], row['high'],
+                        row['low']) for row in result.countdowns]
+            self.assertEqual(emitted, expected)
+            found = found + len(expected)
+
+        self.assertTrue(found)
@@ -0,0 +1,145 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+import numpy as np
+
+import tests
+
+from zl.indicators import synthetic
+from zl.indicators.core import flip
+from zl.indicators.core import sequential
+from zl.indicators.core import setup as setup_
+
+
+def found(bars, sid=0):
+    flips = flip.FlipState(4, 'close')
+    setups = setup_.SetupState(9, 4, 'close', 4, 'close')
+    countdowns = sequential.SequentialState(4, 'close', 9, 4, 'close', True,
+                                            13, 2, 'close')
+    signals = []
+
+    for row in xrange(len(bars['close'])):
+        event = dict((field, bars[field][row, sid])
+                     for field in synthetic.FIELDS)
+        signal = flips.update(event)
+        if signal is not None:
+            signals.append((row, synthetic.FLIP, signal['direction']))
+
+        signal = setups.update(event)
+        if signal is not None:
+            pattern = synthetic.SETUP
+            if signal.is_perfect:
+                pattern = synthetic.PERFECT_SETUP
+            signals.append((row, pattern, signal['direction']))
+
+        signal = countdowns.update(event)
+        if signal is not None:
+            signals.append((row, synthetic.COUNTDOWN, signal['direction']))
+
+    return signals
+
+
+class TestWalk(tests.Base):
+    def test_shape(self):
+        bars = synthetic.walk(50, sids=3)
+        self.assertEqual(sorted(bars), sorted(synthetic.FIELDS))
+        for values in bars.values():
+            self.assertEqual(values.shape, (50, 3))
+
+        self.assertTrue(np.all(bars['high'] >= bars['open']))
+        self.assertTrue(np.all(bars['high'] >= bars['close']))
+        self.assertTrue(np.all(bars['low'] <= bars['open']))
+        self.assertTrue(np.all(bars['low'] <= bars['close']))
+        self.assertTrue(np.all(bars['low'] > 0))
+
+    def test_seeded(self):
+        first = synthetic.walk(100, sids=2, seed=7)
+        second = synthetic.walk(100, sids=2, seed=7)
+        other = synthetic.walk(100, sids=2, seed=8)
+        for field in synthetic.FIELDS:
+            self.assertTrue(np.array_equal(first[field], second[field]))
+            self.assertFalse(np.array_equal(first[field], other[field]))
+
+    def test_frames(self):
+        bars = synthetic.walk(30, sids=2)
+        frames = synthetic.frames(bars)
+        self.assertEqual(sorted(frames), [0, 1])
+        self.assertEqual(len(frames[1]), 30)
+        self.assertEqual(frames[1]['close'].tolist(),
+                         bars['close'][:, 1].tolist())
+
+
+class TestPlant(tests.Base):
+    def test_quiet(self):
+        self.assertEqual(found(synthetic.walk(100, volatility=0)), [])
+
+    def test_patterns(self):
+        bars = synthetic.walk(300, sids=2, volatility=0)
+        synthetic.plant(bars, synthetic.FLIP, 20, sid=slice(None))
+        synthetic.plant(bars, synthetic.SETUP, 60, synthetic.SELL,
+                        sid=slice(None))
+        synthetic.plant(bars, synthetic.PERFECT_SETUP, 100,
+                        sid=slice(None))
+        synthetic.plant(bars, synthetic.COUNTDOWN, [160, 280],
+                        synthetic.SELL, sid=slice(None))
+        synthetic.plant(bars, synthetic.COUNTDOWN, 220, sid=slice(None))
+
+        expected = [
+            (20, synthetic.FLIP, flip.BEAR),
+            (52, synthetic.FLIP, flip.BULL),
+            (60, synthetic.SETUP, setup_.SELL),
+            (92, synthetic.FLIP, flip.BEAR),
+            (100, synthetic.PERFECT_SETUP, setup_.BUY),
+            (140, synthetic.FLIP, flip.BULL),
+            (148, synthetic.PERFECT_SETUP, setup_.SELL),
+            (160, synthetic.COUNTDOWN, setup_.SELL),
+            (200, synthetic.FLIP, flip.BEAR),
+            (208, synthetic.PERFECT_SETUP, setup_.BUY),
+            (220, synthetic.COUNTDOWN, setup_.BUY),
+            (260, synthetic.FLIP, flip.BULL),
+            (268, synthetic.PERFECT_SETUP, setup_.SELL),
+            (280, synthetic.COUNTDOWN, setup_.SELL),
+        ]
+        self.assertEqual(found(bars, 0), expected)
+        self.assertEqual(found(bars, 1), expected)
+
+    def test_noisy(self):
+        bars = synthetic.walk(400, sids=4, seed=3)
+        synthetic.plant(bars, synthetic.COUNTDOWN, range(40, 400, 60),
+                        sid=slice(None))
+        for sid in xrange(4):
+            signals = found(bars, sid)
+            # NOTE(jkoelker) Setups and countdowns already running in
+            #                the noise can swallow the planted ones, only
+            #                the flips always land
+            for position in xrange(40, 400, 60):
+                self.assertIn((position - 20, synthetic.FLIP, flip.BEAR),
+                              signals)
+
+    def test_single_sid(self):
+        bars = synthetic.walk(60, sids=2, volatility=0)
+        synthetic.plant(bars, synthetic.PERFECT_SETUP, 30, sid=1)
+        self.assertEqual(found(bars, 0), [])
+        self.assertEqual(found(bars, 1)[-1],
+                         (30, synthetic.PERFECT_SETUP, setup_.BUY))
+
+    def test_overlap(self):
+        bars = synthetic.walk(100)
+        self.assertRaises(ValueError, synthetic.plant, bars,
+                          synthetic.COUNTDOWN, [30, 40])
+        self.assertRaises(ValueError, synthetic.plant, bars,
+                          synthetic.COUNTDOWN, 10)
+        self.assertRaises(ValueError, synthetic.plant, bars,
+                          synthetic.FLIP, 100)
@@ -0,0 +1,177 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import datetime
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pytz
+
+import tests
+from tests import generators
+
+from benchmarks import harness
+
+from zl.indicators import countdown
+from zl.indicators import flip
+from zl.indicators import sequential
+from zl.indicators import setup as setup_
+from zl.indicators import table
+from zl.indicators import universe
+
+
+def row(sid, dt, kind, signal):
+    """What the table should hold for `signal`."""
+    codes = {universe.FLIP: flip.DIRECTIONS,
+             universe.SETUP: setup_.DIRECTIONS,
+             universe.COUNTDOWN: countdown.DIRECTIONS}[kind]
+    perfection = signal.get('perfection', np.nan)
+    if kind == universe.COUNTDOWN:
+        perfection = signal['setup']['perfection']
+    return (sid, table.nanos(dt), universe.KINDS[kind],
+            codes[signal['direction']], signal.start, signal.end,
+            signal.get('high', np.nan), signal.get('low', np.nan),
+            perfection, getattr(signal, 'risk_level', np.nan))
+
+
+def ordered(rows):
+    return rows[np.lexsort((rows['kind'], rows['end'], rows['sid']))]
+
+
+def assert_rows(found, expected, names=table.TABLE_DTYPE.names):
+    """Compare structured rows field by field, NaNs matching NaNs."""
+    assert len(found) == len(expected), (len(found), len(expected))
+    for name in names:
+        np.testing.assert_array_equal(found[name], expected[name],
+                                      err_msg=name)
+
+
+class TestNanos(tests.Base):
+    def test_naive(self):
+        self.assertEqual(table.nanos(datetime.datetime(1970, 1, 2)),
+                         86400 * 10 ** 9)
+
+    def test_aware(self):
+        dt = datetime.datetime(1970, 1, 1, 1, tzinfo=pytz.utc)
+        self.assertEqual(table.nanos(dt), 3600 * 10 ** 9)
+        dt = pytz.timezone('US/Eastern').localize(
+            datetime.datetime(1969, 12, 31, 20))
+        self.assertEqual(table.nanos(dt), 3600 * 10 ** 9)
+
+    def test_none(self):
+        self.assertEqual(table.nanos(None), table.NAT)
+
+
+class TestSignalTable(tests.Base):
+    def setUp(self):
+        super(TestSignalTable, self).setUp()
+        self.events = harness.events(
+            generators.planted_walks(300, sids=4))
+
+    def _check(self, cls, kind, **params):
+        signals = table.SignalTable(capacity=1)
+        transform = harness.create(cls, table=signals, **params)
+
+        expected = []
+        for bar in xrange(len(self.events[0])):
+            for sid in sorted(self.events):
+                event = self.events[sid][bar]
+                signal = transform.update(event)
+                if signal is not None:
+                    expected.append(row(sid, event.dt, kind, signal))
+
+        self.assertTrue(expected)
+        self.assertEqual(len(signals), len(expected))
+        assert_rows(signals.array, np.array(expected,
+                                            dtype=table.TABLE_DTYPE))
+
+    def test_flip(self):
+        self._check(flip.Flip, universe.FLIP)
+
+    def test_setup(self):
+        self._check(setup_.Setup, universe.SETUP)
+
+    def test_sequential(self):
+        self._check(sequential.Sequential, universe.COUNTDOWN)
+
+    def test_universe(self):
+        expected = table.SignalTable()
+        transforms = [harness.create(flip.Flip, table=expected),
+                      harness.create(setup_.Setup, table=expected),
+                      harness.create(sequential.Sequential, table=expected)]
+
+        signals = table.SignalTable()
+        engine = universe.Universe(table=signals)
+        sids = sorted(self.events)
+
+        for bar in xrange(len(self.events[0])):
+            bars = [self.events[sid][bar] for sid in sids]
+            for transform in transforms:
+                for event in bars:
+                    transform.update(event)
+
+            engine.step(sids, dict((field, [e[field] for e in bars])
+                                   for field in engine.fields),
+                        bars[0].dt)
+
+        # NOTE(jkoelker) The Universe counts a countdown from the bar
+        #                completing its setup and leaves the risk levels
+        #                out, compare the rest
+        found = ordered(signals.array)
+        rows = ordered(expected.array)
+        assert_rows(found, rows, ('sid', 'dt', 'kind', 'direction', 'end',
+                                  'high', 'low', 'perfection'))
+        self.assertTrue(np.isnan(found['risk_level']).all())
+
+        countdowns = rows['kind'] == universe.KINDS[universe.COUNTDOWN]
+        self.assertTrue(countdowns.any())
+        np.testing.assert_array_equal(found['start'][~countdowns],
+                                      rows['start'][~countdowns])
+
+    def test_extend_times(self):
+        rows = np.zeros(2, dtype=universe.SIGNAL_DTYPE)
+        rows['index'] = [3, 7]
+        times = np.array(['2013-01-02', '2013-01-03'], dtype='M8[ns]')
+
+        signals = table.SignalTable()
+        signals.extend(rows, times)
+        signals.extend(rows[:0], times[:0])
+
+        self.assertEqual(signals.array['dt'].view('M8[ns]').tolist(),
+                         times.tolist())
+        self.assertEqual(signals.array['end'].tolist(), [4, 8])
+
+    def test_save(self):
+        signals = table.SignalTable(capacity=1)
+        transform = harness.create(setup_.Setup, table=signals)
+        for event in self.events[0]:
+            transform.update(event)
+
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        signals.save(os.path.join(path, 'signals.npy'))
+
+        loaded = np.load(os.path.join(path, 'signals.npy'))
+        assert_rows(loaded, signals.array)
+
+        view = memoryview(signals.array)
+        self.assertEqual(len(view), len(signals))
+        self.assertEqual(view.tobytes(), signals.array.tobytes())
+
+        signals.clear()
+        self.assertEqual(len(signals), 0)
@@ -0,0 +1,164 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import numpy as np
+import pandas as pd
+
+import tests
+from tests import generators
+
+from zl.indicators import td
+from zl.indicators.core import countdown
+from zl.indicators.core import flip
+from zl.indicators.core import sequential
+from zl.indicators.core import setup as setup_
+
+
+def replay(df, state):
+    found = {}
+    for index, event in enumerate(generators.to_events(df)):
+        signal = state.update(event)
+        if signal is not None:
+            found[index] = signal
+    return found
+
+
+def nonzero(column):
+    return np.flatnonzero(column.values).tolist()
+
+
+def running(df, state):
+    """The setup and countdown counts of `state` after every bar."""
+    setups = []
+    countdowns = []
+    for event in generators.to_events(df):
+        before = state.countdown
+        state.update(event)
+        setups.append(state.setup.count)
+
+        # NOTE(jkoelker) A countdown finishing on a bar is cleared right
+        #                away, a new one has already counted its setup's
+        #                last bar
+        counted = state.countdown or before
+        countdowns.append(len(counted.signals) if counted else 0)
+    return setups, countdowns
+
+
+class TestTD(tests.Base):
+    def setUp(self):
+        super(TestTD, self).setUp()
+        self.frames = generators.planted_walks(500, sids=3)
+        self.df = self.frames[0]
+
+    def test_registered(self):
+        self.assertIsInstance(self.df.td, td.TD)
+
+    def test_flip(self):
+        found = self.df.td.flip()
+        expected = replay(self.df, flip.FlipState(4, 'close'))
+
+        self.assertTrue(found.index.equals(self.df.index))
+        self.assertEqual(nonzero(found['flip']), sorted(expected))
+        for index, signal in expected.items():
+            self.assertEqual(found['flip'][index],
+                             flip.DIRECTIONS[signal['direction']])
+
+    def test_setup(self):
+        found = self.df.td.setup()
+        expected = replay(self.df, setup_.SetupState(9, 4, 'close', 4,
+                                                     'close'))
+
+        self.assertTrue(expected)
+        self.assertEqual(nonzero(found['setup']), sorted(expected))
+        for index, signal in expected.items():
+            self.assertEqual(found['setup'][index],
+                             setup_.DIRECTIONS[signal['direction']])
+            self.assertEqual(found['setup_perfection'][index],
+                             signal['perfection'])
+            self.assertEqual(found['setup_risk_level'][index],
+                             signal.risk_level)
+            self.assertEqual(found['setup_perfect'][index],
+                             signal.is_perfect)
+            self.assertEqual(found['setup_count'][index - 8:index + 1]
+                             .tolist(), range(1, 10))
+            self.assertEqual(signal['flip'].end - 1, index - 8)
+
+        self.assertTrue(np.isnan(found['setup_perfection'].values).sum() ==
+                        len(self.df) - len(expected))
+
+    def test_sequential(self):
+        found = self.df.td.sequential(countdown_max_length=40)
+        expected = replay(self.df, sequential.SequentialState(
+            4, 'close', 9, 4, 'close', True, 13, 2, 'close', 40))
+
+        self.assertTrue(expected)
+        self.assertEqual(nonzero(found['countdown']), sorted(expected))
+        for index, signal in expected.items():
+            self.assertEqual(found['countdown'][index],
+                             countdown.DIRECTIONS[signal['direction']])
+            self.assertEqual(found['countdown_risk_level'][index],
+                             signal.risk_level)
+
+            counts = found['countdown_count'].values
+            start = index - len(signal['bars']) + 1
+            self.assertEqual(counts[index], len(signal['signals']))
+            self.assertEqual(counts[start - 1:start].tolist(), [0])
+            self.assertEqual(np.flatnonzero(np.diff(counts[start:index + 1]))
+                             .tolist(),
+                             [position - 1 for position in signal['signals']
+                              if position > 0])
+
+    def test_running_counts(self):
+        state = sequential.SequentialState(4, 'close', 9, 4, 'close', True,
+                                           13, 2, 'close', 40)
+        setups, countdowns = running(self.df, state)
+
+        # NOTE(jkoelker) End the frames on the last bars of a setup and of
+        #                a countdown still running
+        ends = (max(index for index, count in enumerate(setups)
+                    if 1 < count < 9) + 1,
+                max(index for index, count in enumerate(countdowns)
+                    if 1 < count < 13) + 1)
+
+        for end in ends:
+            found = self.df[:end].td.sequential(countdown_max_length=40)
+
+            self.assertTrue(nonzero(found['countdown']))
+            self.assertEqual(found['setup_count'].tolist(), setups[:end])
+            self.assertEqual(found['countdown_count'].tolist(),
+                             countdowns[:end])
+
+    def test_multi_index(self):
+        self.frames = dict((sid, df[:len(df) - 40 * sid])
+                           for sid, df in self.frames.items())
+        stacked = pd.concat(dict((sid, df) for sid, df
+                                 in self.frames.items()), names=['sid'])
+        stacked = stacked.swaplevel(0, 1).sortlevel(0)
+        stacked.index.names = ['dt', 'sid']
+
+        found = stacked.td.sequential()
+        self.assertTrue(found.index.equals(stacked.index))
+
+        for sid, df in self.frames.items():
+            single = df.td.sequential()
+            rows = found.xs(sid, level='sid')
+            for name in single:
+                left = rows[name].values
+                right = single[name].values
+                same = left == right
+                if left.dtype.kind == 'f':
+                    same = same | (np.isnan(left) & np.isnan(right))
+                self.assertTrue(same.all(), name)
@@ -0,0 +1,139 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import random
+
+import tests
+from tests import generators
+
+from zl.indicators import countdown
+from zl.indicators import flip
+from zl.indicators import sequential
+from zl.indicators import setup as setup_
+from zl.indicators import universe
+
+
+def per_sid(sid, events, max_length=None):
+    flips = flip.FlipState(4, 'close')
+    setups = setup_.SetupState(9, 4, 'close', 4, 'close')
+    sequence = sequential.SequentialState(4, 'close', 9, 4, 'close', True,
+                                          13, 2, 'close', max_length)
+    signals = set()
+
+    for i, event in enumerate(events):
+        signal = flips.update(event)
+        if signal is not None:
+            signals.add((sid, universe.FLIP, i,
+                         flip.DIRECTIONS[signal['direction']]))
+
+        signal = setups.update(event)
+        if signal is not None:
+            signals.add((sid, universe.SETUP, i,
+                         setup_.DIRECTIONS[signal['direction']],
+                         signal['high'], signal['low'],
+                         signal['perfection']))
+
+        signal = sequence.update(event)
+        if signal is not None:
+            signals.add((sid, universe.COUNTDOWN, i,
+                         countdown.DIRECTIONS[signal['direction']],
+                         signal['high'], signal['low'],
+                         signal['setup']['perfection']))
+
+    return signals
+
+
+def as_tuple(row):
+    kinds = dict((v, k) for k, v in universe.KINDS.items())
+    kind = kinds[row['kind']]
+    key = (row['sid'], kind, row['index'], row['direction'])
+
+    if kind == universe.FLIP:
+        return key
+    return key + (row['high'], row['low'], row['perfection'])
+
+
+class TestUniverse(tests.Base):
+    def test_matches_per_sid(self):
+        self._check()
+
+    def test_matches_per_sid_bounded(self):
+        self._check(max_length=30)
+
+    def _check(self, max_length=None):
+        length = 400
+        frames = dict((sid, generators.waves(length, wavelength=30 + sid))
+                      for sid in xrange(6))
+
+        # NOTE(jkoelker) Drop some bars so not every sid trades every bar
+        trades = dict((sid, [random.random() > 0.1 for _i in xrange(length)])
+                      for sid in frames)
+
+        expected = set()
+        for sid, df in frames.items():
+            events = generators.to_events(df)
+            events = [e for e, t in zip(events, trades[sid]) if t]
+            expected.update(per_sid(sid, events, max_length))
+
+        engine = universe.Universe(countdown_max_length=max_length,
+                                   capacity=2)
+        result = set()
+        for i in xrange(length):
+            sids = [sid for sid in frames if trades[sid][i]]
+            bars = dict((field, [frames[sid][field][i] for sid in sids])
+                        for field in ('close', 'high', 'low'))
+            result.update(as_tuple(row) for row in engine.step(sids, bars))
+
+        kinds = set(signal[1] for signal in expected)
+        self.assertEqual(kinds, set(universe.KINDS))
+        self.assertEqual(result, expected)
+
+    def test_evict(self):
+        length = 300
+        frames = dict((sid, generators.waves(length, wavelength=30 + sid))
+                      for sid in xrange(4))
+        events = dict((sid, generators.to_events(df))
+                      for sid, df in frames.items())
+        evicted = 1
+        split = 150
+
+        expected = set()
+        for sid in frames:
+            if sid != evicted:
+                expected.update(per_sid(sid, events[sid]))
+
+        for signal in per_sid(evicted, events[evicted][split:]):
+            expected.add((signal[0], signal[1], signal[2] + split) +
+                         signal[3:])
+
+        engine = universe.Universe(capacity=2)
+        result = set()
+        for i in xrange(length):
+            if i == split:
+                engine.evict(evicted)
+                before = set(r for r in result if r[0] == evicted)
+                result.difference_update(before)
+
+            sids = sorted(frames)
+            bars = dict((field, [frames[sid][field][i] for sid in sids])
+                        for field in ('close', 'high', 'low'))
+            for row in engine.step(sids, bars):
+                key = as_tuple(row)
+                if key[0] == evicted and i >= split:
+                    key = key[:2] + (key[2] + split,) + key[3:]
+                result.add(key)
+
+        self.assertEqual(result, expected)
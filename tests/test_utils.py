@@ -0,0 +1,129 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import datetime
+import threading
+import time
+
+import tests
+
+from zl.indicators import utils
+
+
+def day(n):
+    return datetime.datetime(2013, 1, 1) + datetime.timedelta(days=n)
+
+
+class TestSidWindows(tests.Base):
+    def test_unbounded(self):
+        windows = utils.SidWindows(list)
+        for sid in xrange(10):
+            windows.touch(sid, day(sid)).append(sid)
+
+        self.assertEqual(len(windows), 10)
+        self.assertEqual(windows[3], [3])
+
+    def test_max_sids(self):
+        windows = utils.SidWindows(list, max_sids=2)
+        windows.touch(1, day(0)).append(1)
+        windows.touch(2, day(1)).append(2)
+        windows.touch(1, day(2)).append(1)
+        windows.touch(3, day(3)).append(3)
+
+        self.assertEqual(sorted(windows), [1, 3])
+        self.assertEqual(windows[1], [1, 1])
+
+    def test_max_idle(self):
+        windows = utils.SidWindows(list, max_idle=datetime.timedelta(days=2))
+        windows.touch(1, day(0))
+        windows.touch(2, day(1))
+        windows.touch(2, day(2))
+        self.assertEqual(sorted(windows), [1, 2])
+
+        windows.touch(2, day(3))
+        self.assertEqual(sorted(windows), [2])
+
+    def test_lookup_max_sids(self):
+        windows = utils.SidWindows(list, max_sids=2)
+        for sid in xrange(3):
+            windows[sid].append(sid)
+
+        self.assertEqual(sorted(windows), [1, 2])
+
+    def test_lookup_max_idle(self):
+        windows = utils.SidWindows(list, max_idle=datetime.timedelta(days=2))
+        windows[1]
+        windows[2]
+        windows.touch(2, day(0))
+        windows.touch(2, day(2))
+        self.assertEqual(sorted(windows), [1, 2])
+
+        windows.touch(2, day(3))
+        self.assertEqual(sorted(windows), [2])
+
+    def test_evict(self):
+        windows = utils.SidWindows(list, max_sids=5)
+        windows.touch(1, day(0)).append(1)
+        self.assertEqual(windows.evict(1), [1])
+        self.assertEqual(windows.evict(1), None)
+        self.assertNotIn(1, windows)
+        self.assertEqual(windows.touch(1, day(1)), [])
+
+    def test_locked(self):
+        windows = utils.SidWindows(list)
+        self.assertIs(windows.locked(1), utils.UNLOCKED)
+
+        windows = utils.SidWindows(list, stripes=4)
+        self.assertIs(windows.locked(1), windows.locked(1))
+        self.assertIs(windows.locked(1), windows.locked(5))
+        self.assertIsNot(windows.locked(1), windows.locked(2))
+
+    def _race(self, func, threads=8):
+        errors = []
+
+        def work():
+            try:
+                func()
+            except Exception as e:
+                errors.append(e)
+
+        workers = [threading.Thread(target=work) for _i in xrange(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(errors, [])
+
+    def test_striped_create(self):
+        def slow():
+            time.sleep(0.01)
+            return []
+
+        windows = utils.SidWindows(slow, stripes=4)
+        found = []
+        self._race(lambda: found.append(windows[1]))
+        self.assertEqual(len(set(id(window) for window in found)), 1)
+
+    def test_striped_touch(self):
+        windows = utils.SidWindows(list, max_sids=5, stripes=4)
+
+        def touch():
+            for sid in xrange(200):
+                with windows.locked(sid):
+                    windows.touch(sid % 20, day(sid)).append(sid)
+
+        self._race(touch)
+        self.assertEqual(len(windows), 5)
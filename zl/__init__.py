@@ -14,4 +14,15 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
-__import__('pkg_resources').declare_namespace(__name__)
+import sys
+
+
+# NOTE(jkoelker) Importing pkg_resources alone takes longer than NumPy, so
+#                only declare through it when it is already loaded. When it
+#                is imported later it declares zl itself, from the
+#                namespace_packages metadata setup.py still ships, and
+#                pkgutil covers the other portions until then.
+if 'pkg_resources' in sys.modules:
+    sys.modules['pkg_resources'].declare_namespace(__name__)
+else:
+    __path__ = __import__('pkgutil').extend_path(__path__, __name__)
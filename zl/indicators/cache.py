@@ -0,0 +1,226 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import errno
+import hashlib
+import os
+
+import numpy as np
+
+from zl.indicators import runner
+from zl.indicators import universe
+from zl.indicators.core import sequential
+
+
+EXT = '.npz'
+MAX_BYTES = 256 * 1024 * 1024
+
+# NOTE(jkoelker) Bump when the archive layout or the SequentialState dump
+#                changes, entries of other versions are never read
+VERSION = 1
+
+
+def fingerprint(fields, columns, count):
+    """Digest of the first `count` bars of `fields` in `columns`."""
+    digest = hashlib.sha1()
+    for field in fields:
+        values = np.ascontiguousarray(columns[field][:count],
+                                      dtype=np.float64)
+        digest.update(field)
+        digest.update(values.data)
+    return digest.hexdigest()
+
+
+class SignalCache(object):
+    """On disk cache of the Sequential countdowns of whole histories.
+
+    Entries are kept per sid, parameters and digest of the bars they were
+    computed over, each in its own npz file holding the signals and the
+    SequentialState dump after the last bar. When a history is asked for
+    again with bars appended, the longest cached prefix is picked up and
+    only the bars past it are run through the restored state. Writing an
+    entry removes the others of the sid and parameters, including those
+    of an older VERSION.
+
+    The files are evicted least recently used first once they take more
+    than `max_bytes`, a hit touches the file so the order survives
+    across processes sharing the directory.
+    """
+    def __init__(self, path, max_bytes=MAX_BYTES):
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.extended = 0
+        self.misses = 0
+
+    def _key(self, sid, params):
+        return hashlib.sha1(repr((sid, params))).hexdigest()
+
+    def _entries(self, key):
+        """`(count, digest, name)` of the entries under `key`."""
+        entries = []
+        version = 'v%s' % VERSION
+        for name in os.listdir(self.path):
+            parts = name[:-len(EXT)].split('-')
+            if not name.endswith(EXT) or len(parts) != 4:
+                continue
+            if parts[:2] == [key, version]:
+                entries.append((int(parts[2]), parts[3], name))
+        return sorted(entries, reverse=True)
+
+    def _find(self, key, fields, columns, length):
+        """The longest cached prefix of `columns` as `(count, name)`."""
+        digests = {}
+        for count, digest, name in self._entries(key):
+            if count > length:
+                continue
+            if count not in digests:
+                digests[count] = fingerprint(fields, columns, count)
+            if digests[count] == digest:
+                return count, name
+        return 0, None
+
+    def _read(self, name, state):
+        """The signals of the entry `name`, None if it was removed."""
+        path = os.path.join(self.path, name)
+        try:
+            os.utime(path, None)
+            fileobj = open(path, 'rb')
+        except (IOError, OSError) as e:
+            # NOTE(jkoelker) Another process pruned or evicted it
+            if e.errno != errno.ENOENT:
+                raise
+            return None
+
+        with fileobj:
+            archive = np.load(fileobj)
+            data = dict((key[len('state/'):], archive[key])
+                        for key in archive.files
+                        if key.startswith('state/'))
+            found = archive['signals']
+
+        state.load(data)
+        return found
+
+    def _write(self, key, count, digest, state, found):
+        out = {}
+        state.dump(out)
+        archive = dict(('state/' + name, value)
+                       for name, value in out.items())
+        archive['signals'] = found
+
+        name = '%s-v%s-%s-%s%s' % (key, VERSION, count, digest, EXT)
+        temp = os.path.join(self.path, '.' + name)
+        with open(temp, 'wb') as fileobj:
+            np.savez(fileobj, **archive)
+
+        # NOTE(jkoelker) Rename into place so readers never see a
+        #                partially written entry
+        os.rename(temp, os.path.join(self.path, name))
+        self.prune(key, keep=name)
+        self.evict(keep=name)
+
+    def prune(self, key, keep=None):
+        """Drop the entries under `key` of any version but `keep`."""
+        for name in os.listdir(self.path):
+            if (not name.endswith(EXT) or name == keep or
+                    not name.startswith(key + '-')):
+                continue
+            try:
+                os.remove(os.path.join(self.path, name))
+            except OSError as e:
+                # NOTE(jkoelker) Another process pruned it first
+                if e.errno != errno.ENOENT:
+                    raise
+
+    def evict(self, keep=None):
+        """Drop the least recently used entries past `max_bytes`."""
+        entries = []
+        total = 0
+        for name in os.listdir(self.path):
+            if not name.endswith(EXT) or name.startswith('.'):
+                continue
+            stat = os.stat(os.path.join(self.path, name))
+            entries.append((stat.st_mtime, name, stat.st_size))
+            total = total + stat.st_size
+
+        for _mtime, name, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            os.remove(os.path.join(self.path, name))
+            total = total - size
+
+    def signals(self, sid, columns, flip_period=4, flip_field='close',
+                setup_period=9, setup_lookback=4, setup_field=None,
+                setup_reverse_cancel=True, countdown_period=13,
+                countdown_lookback=2, countdown_field=None,
+                countdown_max_length=None):
+        """SIGNAL_DTYPE rows of the countdowns over the bars in `columns`.
+
+        `columns` maps the fields to arrays of bars, a DataFrame works as
+        well. The rows match what `runner.run` returns for the sid.
+        """
+        params, fields = runner.sequential_args(
+            flip_period, flip_field, setup_period, setup_lookback,
+            setup_field, setup_reverse_cancel, countdown_period,
+            countdown_lookback, countdown_field, countdown_max_length)
+        columns = dict((field, np.asarray(columns[field], dtype=float))
+                       for field in fields)
+        length = len(columns[fields[0]])
+
+        key = self._key(sid, params)
+        state = sequential.SequentialState(*params)
+        count, name = self._find(key, fields, columns, length)
+
+        found = None
+        if name is not None:
+            found = self._read(name, state)
+
+        if found is None:
+            count, name = 0, None
+            found = np.zeros(0, dtype=universe.SIGNAL_DTYPE)
+
+        if count == length and name is not None:
+            self.hits = self.hits + 1
+            return found
+
+        if name is None:
+            self.misses = self.misses + 1
+        else:
+            self.extended = self.extended + 1
+
+        tail = runner.replay(state, sid, fields,
+                             [columns[field][count:] for field in fields],
+                             count)
+        found = np.concatenate([found, tail])
+        self._write(key, length, fingerprint(fields, columns, length),
+                    state, found)
+        return found
+
+    def run(self, history, **params):
+        """Cached equivalent of `runner.run` in this process."""
+        indexes = {}
+        results = []
+        for sid, frame in history.iteritems():
+            indexes[sid] = frame.index
+            results.append((sid, self.signals(sid, frame, **params)))
+
+        return runner.frame(results, indexes)
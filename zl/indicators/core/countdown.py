@@ -0,0 +1,580 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import functools
+import itertools
+import operator
+
+import numpy as np
+from zl.indicators import ring as ring_
+from zl.indicators import signals as signals_
+from zl.indicators import utils
+from zl.indicators.core import metrics as metrics_
+from zl.indicators.core import setup
+
+
+BUY = 'Buy'
+SELL = 'Sell'
+
+# NOTE(jkoelker) Direction codes used by the array functions
+DIRECTIONS = {BUY: -1, SELL: 1}
+
+COUNTDOWN_DTYPE = np.dtype([('index', np.int64), ('direction', np.int8),
+                            ('high', np.float64), ('low', np.float64),
+                            ('start', np.int64), ('qualifier', np.int64)])
+
+
+def countdown(direction, events, period, lookback, field,
+              setup_signal=None):
+    events = list(events)
+    event_iter = itertools.izip(events[lookback:], events[:-lookback])
+    signals = []
+    compare_field = 'low'
+    compare_op = operator.le
+
+    if direction == SELL:
+        compare_field = 'high'
+        compare_op = operator.ge
+
+    for position, (event, prior) in enumerate(event_iter):
+        if compare_op(event[field], prior[compare_field]):
+            signals.append(position)
+
+    if len(signals) >= period:
+        bars = [bar for bar in events[lookback:]]
+
+        # TODO(jkoelker) Figure out if bar "8" should be determined by
+        #                the period length
+        qualifier = bars[signals[7]]
+        ending = bars[signals[-1]]
+
+        if compare_op(ending[compare_field], qualifier[field]):
+            lowes = [bar['low'] for bar in bars]
+            highs = [bar['high'] for bar in bars]
+
+            high = np.max(highs)
+            low = np.max(lowes)
+            return Signal(direction, high, low, bars, signals,
+                          setup_signal)
+
+
+def countdown_array(close, high, low, starts, directions, period=13,
+                    lookback=2, chunk=64, max_length=None):
+    """Run a countdown from each of `starts` over a whole history.
+
+    `starts` are the bars the countdowns start on, the last bar of a
+    setup when following one, and `directions` their direction codes.
+    Returns a structured array with one row per start, `index` is the bar
+    the countdown completes on or -1 if it never does. The rows match
+    what a CountdownState primed the same way would return.
+
+    Each countdown is scanned forward in chunks that double in size, so
+    countdowns that complete quickly do not pay for the whole history.
+    With `max_length` a countdown expires after that many bars.
+    """
+    close = np.asarray(close, dtype=float)
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    starts = np.asarray(starts, dtype=np.int64)
+    directions = np.asarray(directions, dtype=np.int8)
+
+    length = len(close)
+    needed = max(period, 8)
+
+    result = np.zeros(len(starts), dtype=COUNTDOWN_DTYPE)
+    result['start'] = starts
+    result['direction'] = directions
+    result['index'] = -1
+    result['qualifier'] = -1
+    result['high'] = np.nan
+    result['low'] = np.nan
+
+    for row, (start, direction) in enumerate(zip(starts, directions)):
+        assert start >= lookback, "Countdown needs lookback bars to start"
+
+        if direction == DIRECTIONS[BUY]:
+            compare = low
+            compare_op = np.less_equal
+        else:
+            compare = high
+            compare_op = np.greater_equal
+
+        count = 0
+        qualifier = -1
+        begin = start
+        size = chunk
+        stop = length
+
+        if max_length is not None:
+            stop = min(start + max_length, length)
+
+        while begin < stop:
+            end = min(begin + size, stop)
+            qualified = compare_op(close[begin:end],
+                                   compare[begin - lookback:end - lookback])
+            counts = count + np.cumsum(qualified)
+
+            if qualifier < 0 and counts[-1] >= 8:
+                qualifier = begin + np.searchsorted(counts, 8)
+
+            if qualifier >= 0:
+                hits = (qualified & (counts >= needed) &
+                        compare_op(compare[begin:end], close[qualifier]))
+                found = np.flatnonzero(hits)
+
+                if len(found):
+                    index = begin + found[0]
+                    result[row] = (index, direction,
+                                   np.max(high[start:index + 1]),
+                                   np.max(low[start:index + 1]),
+                                   start, qualifier)
+                    break
+
+            count = counts[-1]
+            begin = end
+            size = size * 2
+
+    return result
+
+
+class CountdownState(object):
+    """Incremental equivalent of `countdown`.
+
+    Feeding the bars one at a time returns the same Signal that calling
+    `countdown` over every bar seen so far would, but each bar only costs
+    a comparison against the bar `lookback` bars earlier instead of a
+    rescan of the whole countdown.
+
+    When given a ring shared with the setup, the countdown starts on the
+    newest bar in the ring, which is expected to be the last bar of the
+    setup signal.
+
+    With `max_length` the countdown expires once it has run that many
+    bars without completing, releasing its bars in the ring.
+    """
+    STAGE = 'countdown'
+    CHILDREN = ()
+    metrics = None
+
+    def __init__(self, direction, period, lookback, field,
+                 setup_signal=None, ring=None, max_length=None):
+        self.direction = direction
+        self.period = period
+        self.lookback = lookback
+        self.field = field
+        self.setup_signal = setup_signal
+        self.max_length = max_length
+        self.expired = False
+        self.owner = ring is None
+
+        self.compare_field = 'low'
+        self.compare_op = operator.le
+
+        if direction == SELL:
+            self.compare_field = 'high'
+            self.compare_op = operator.ge
+
+        if ring is None:
+            ring = ring_.BarRing([field, 'high', 'low'])
+
+        ring.reserve(lookback + 1)
+        self.ring = ring
+        self.origin = ring.count
+        self.start = None
+        self.signals = []
+        self.qualifier = None
+        self.high = None
+        self.low = None
+        self.high_range = None
+        self.low_range = None
+        self.signal = None
+
+        if self.setup_signal is None:
+            return
+
+        # NOTE(jkoelker) Prime with the last event + lookback from the
+        #                setup_signal, same as the CountdownWindow does
+        if self.owner:
+            for bar in self.setup_signal['bars'][-(lookback + 1):]:
+                self.update(bar)
+            return
+
+        self.setup_signal.check_perfection(ring.event(ring.count - 1))
+        self._begin(ring.count - 1)
+        self._advance(ring.count - 1)
+        self._expire(ring.count - 1)
+
+    def resume(self, columns, start):
+        """Pick up a countdown begun on bar `start` of `columns`.
+
+        `columns` hold the same bars as the ring, the progress up to the
+        last of them is worked out in one go.
+        """
+        value = np.asarray(columns[self.field], dtype=float)[start:]
+        compare = np.asarray(columns[self.compare_field], dtype=float)
+        prior = compare[start - self.lookback:len(compare) - self.lookback]
+
+        self._begin(start)
+        self.signals = np.flatnonzero(self.compare_op(value, prior)).tolist()
+        self._extremes(np.asarray(columns['high'], dtype=float)[start:],
+                       np.asarray(columns['low'], dtype=float)[start:])
+
+        if len(self.signals) >= 8:
+            self.qualifier = value[self.signals[7]]
+
+    def prime(self, columns):
+        """Fast forward the countdown over whole arrays of bars.
+
+        `columns` are the bars following the ones already seen, every one
+        of which has to still be in the ring. `countdown_array` finds
+        where the countdown completes or expires, the bars after that are
+        dropped just as `update` would ignore them.
+        """
+        ring = self.ring
+        assert self.owner and ring.oldest == 0, \
+            "Priming needs every bar seen in the ring"
+
+        if self.done:
+            return
+
+        count = ring.count
+        columns = dict((field, np.asarray(values))
+                       for field, values in columns.items())
+        bars = dict((field, np.concatenate([ring.array(field, 0, count),
+                                            np.asarray(columns[field],
+                                                       dtype=float)]))
+                    for field in ring.fields)
+        length = len(bars[self.field])
+
+        start = self.start
+        if start is None:
+            start = self.origin + self.lookback
+
+        if start >= length:
+            ring.extend(columns)
+            return
+
+        found = countdown_array(bars[self.field], bars['high'], bars['low'],
+                                [start], [DIRECTIONS[self.direction]],
+                                self.period, self.lookback,
+                                max_length=self.max_length)[0]
+
+        end = length
+        if found['index'] >= 0:
+            end = found['index'] + 1
+        elif self.max_length is not None:
+            end = min(start + self.max_length, length)
+
+        # NOTE(jkoelker) resume pins the start again once the bars are
+        #                in, room is made for them up front instead
+        if self.start is not None:
+            ring.unpin(self.start)
+        ring.grow(end - start + self.lookback)
+        ring.extend(dict((field, values[:end - count])
+                         for field, values in columns.items()))
+        self.resume(dict((field, values[:end])
+                         for field, values in bars.items()), start)
+
+        if self.setup_signal is not None:
+            self.setup_signal.check_perfection(ring.event(end - 1))
+
+        if found['index'] >= 0:
+            self._complete(end - 1)
+        elif end - start == self.max_length:
+            self.cancel()
+            self.expired = True
+
+    def _extremes(self, highs, lowes):
+        """Set the extremes and their bars' ranges from whole arrays."""
+        bar = np.argmax(highs)
+        self.high = highs[bar]
+        self.high_range = highs[bar] - lowes[bar]
+
+        bar = np.argmax(lowes)
+        self.low = lowes[bar]
+        self.low_range = highs[bar] - lowes[bar]
+
+    def _begin(self, offset):
+        self.start = offset
+        self.ring.pin(offset)
+
+    def cancel(self):
+        if self.start is not None and self.signal is None:
+            self.ring.unpin(self.start)
+        self.start = None
+
+    def _expire(self, offset):
+        if self.max_length is None or self.signal is not None:
+            return
+
+        if offset - self.start + 1 >= self.max_length:
+            self.cancel()
+            self.expired = True
+
+    def dump(self, out, prefix=''):
+        if self.owner:
+            self.ring.dump(out, prefix + 'ring.')
+
+        start = -1 if self.start is None else self.start
+        levels = [np.nan if value is None else value
+                  for value in (self.qualifier, self.high, self.low)]
+
+        out[prefix + 'direction'] = np.array([DIRECTIONS[self.direction]])
+        out[prefix + 'offsets'] = np.array([self.origin, start, self.done])
+        out[prefix + 'levels'] = np.array(levels)
+        out[prefix + 'signals'] = np.array(self.signals, dtype=np.int64)
+
+        if self.setup_signal is not None:
+            self.setup_signal.dump(out, prefix + 'setup_signal.',
+                                   self.ring.fields)
+
+    def load(self, data, prefix=''):
+        if self.owner:
+            self.ring.load(data, prefix + 'ring.')
+
+        origin, start, done = data[prefix + 'offsets'].tolist()
+        levels = [None if np.isnan(value) else value
+                  for value in data[prefix + 'levels'].tolist()]
+
+        self.origin = origin
+        self.start = None if start < 0 else start
+        self.qualifier, self.high, self.low = levels
+        self.signals = data[prefix + 'signals'].tolist()
+        self.signal = None
+
+        # NOTE(jkoelker) A completed countdown has already handed out its
+        #                signal and released its start, it comes back as
+        #                expired so it stays done
+        self.expired = bool(done)
+        if self.expired:
+            self.start = None
+
+        self.setup_signal = None
+        if signals_.present(data, prefix + 'setup_signal.'):
+            self.setup_signal = setup.Signal.load(
+                data, prefix + 'setup_signal.', self.ring.fields)
+
+        # NOTE(jkoelker) The running countdown's bars are pinned in the
+        #                ring, the ranges at its extremes come from them
+        if self.start is not None and self.high is not None:
+            self._extremes(self.ring.array('high', self.start,
+                                           self.ring.count),
+                           self.ring.array('low', self.start,
+                                           self.ring.count))
+
+    @property
+    def length(self):
+        return len(self.ring)
+
+    @property
+    def done(self):
+        return self.expired or self.signal is not None
+
+    def update(self, event):
+        if self.done:
+            return
+
+        setup_signal = self.setup_signal
+        if setup_signal is not None:
+            if self.metrics is None:
+                setup_signal.check_perfection(event)
+            else:
+                self.metrics.time('perfection', setup_signal.check_perfection,
+                                  event)
+
+        ring = self.ring
+        if self.owner:
+            ring.append(event)
+
+        offset = ring.count - 1
+        if self.start is None:
+            if offset - self.origin < self.lookback:
+                return
+            self._begin(offset)
+
+        signal = self._advance(offset)
+        self._expire(offset)
+        return signal
+
+    def _advance(self, offset):
+        ring = self.ring
+        value = ring.value(self.field, offset)
+        prior = ring.value(self.compare_field, offset - self.lookback)
+        high = ring.value('high', offset)
+        low = ring.value('low', offset)
+
+        # NOTE(jkoelker) `countdown` takes the max of the lows as well,
+        #                keep the two in lock step
+        # NOTE(jkoelker) Keep the range of the first bar at each extreme
+        #                for the risk level
+        if self.high is None or high > self.high:
+            self.high = high
+            self.high_range = high - low
+        if self.low is None or low > self.low:
+            self.low = low
+            self.low_range = high - low
+
+        if not self.compare_op(value, prior):
+            return
+
+        self.signals.append(offset - self.start)
+
+        if len(self.signals) == 8:
+            self.qualifier = value
+
+        if len(self.signals) < self.period or self.qualifier is None:
+            return
+
+        if self.compare_op(ring.value(self.compare_field, offset),
+                           self.qualifier):
+            return self._complete(offset)
+
+    def _complete(self, offset):
+        if self.direction == BUY:
+            risk_level = self.low - self.low_range
+        else:
+            risk_level = self.high + self.high_range
+
+        self.signal = Signal(self.direction, self.high, self.low, None,
+                             list(self.signals), self.setup_signal,
+                             self.ring, self.start, offset + 1, risk_level)
+        self.ring.unpin(self.start)
+        return self.signal
+
+
+class Signal(signals_.Signal):
+    __slots__ = ('high', 'low', 'signals', 'setup', 'risk_level')
+
+    KEYS = ('direction', 'high', 'low', 'bars', 'signals', 'setup')
+
+    def __init__(self, direction, high, low, bars, signals, setup_signal,
+                 ring=None, start=None, end=None, risk_level=None):
+        signals_.Signal.__init__(self, direction, bars, ring, start, end)
+        self.high = high
+        self.low = low
+        self.signals = signals
+        self.setup = setup_signal
+
+        if risk_level is None:
+            risk_level = self._risk_level(high, low)
+        self.risk_level = risk_level
+
+
+class StandaloneState(object):
+    """Countdown in both directions without a setup to start it.
+
+    A BUY and a SELL CountdownState run side by side, once either
+    completes or both expire they start over, carrying the last
+    `lookback` bars into the new countdowns.
+    """
+    STAGE = None
+    CHILDREN = ('states',)
+    metrics = None
+
+    def __init__(self, period, lookback, field, max_length=None):
+        self.period = period
+        self.lookback = lookback
+        self.field = field
+        self.max_length = max_length
+        self.states = None
+        self._reset()
+
+    @property
+    def length(self):
+        return max(state.length for state in self.states)
+
+    def _reset(self, primer=None):
+        self.states = [metrics_.watch(self, CountdownState(
+            direction, self.period, self.lookback, self.field,
+            max_length=self.max_length)) for direction in (BUY, SELL)]
+
+        # NOTE(jkoelker) Carry the last lookback bars over so a fresh
+        #                countdown can start comparing on the next bar
+        if primer:
+            for state in self.states:
+                for bar in primer[-self.lookback:]:
+                    state.update(bar)
+
+    def prime(self, columns):
+        """Fast forward fresh countdowns over whole arrays of bars.
+
+        Each pair of countdowns is run with `countdown_array` to find
+        where the next pair starts, only the bars from the last start on
+        go into the rings.
+        """
+        assert self.states[0].ring.count == 0, \
+            "Only fresh states can be primed"
+
+        value = np.asarray(columns[self.field], dtype=float)
+        high = np.asarray(columns['high'], dtype=float)
+        low = np.asarray(columns['low'], dtype=float)
+        length = len(value)
+        codes = [DIRECTIONS[state.direction] for state in self.states]
+
+        origin = 0
+        while origin + self.lookback < length:
+            start = origin + self.lookback
+            found = countdown_array(value, high, low, [start] * len(codes),
+                                    codes, self.period, self.lookback,
+                                    max_length=self.max_length)
+
+            ends = [index for index in found['index'] if index >= 0]
+            if self.max_length is not None:
+                ends.append(start + self.max_length - 1)
+
+            if not ends or min(ends) >= length:
+                break
+
+            origin = min(ends) - self.lookback + 1
+
+        columns = dict((field, np.asarray(values)[origin:])
+                       for field, values in columns.items())
+        for state in self.states:
+            state.ring.grow(length - origin)
+            state.ring.extend(columns)
+
+            if self.lookback < length - origin:
+                state.resume(columns, self.lookback)
+
+    def dump(self, out, prefix=''):
+        for position, state in enumerate(self.states):
+            state.dump(out, '%sstates.%s.' % (prefix, position))
+
+    def load(self, data, prefix=''):
+        for position, state in enumerate(self.states):
+            state.load(data, '%sstates.%s.' % (prefix, position))
+
+    def update(self, event):
+        signal = None
+        for state in self.states:
+            signal = state.update(event)
+            if signal is not None:
+                break
+
+        if signal is not None:
+            self._reset(signal['bars'])
+        elif all(state.expired for state in self.states):
+            ring = self.states[0].ring
+            self._reset(ring.slice(ring.count - self.lookback, ring.count))
+
+        return signal
+
+
+def stream(bars, period=13, lookback=2, field='close', max_length=None):
+    """Lazily yield `(sid, signal)` for every countdown in `bars`."""
+    return utils.stream(bars, functools.partial(StandaloneState, period,
+                                                lookback, field,
+                                                max_length))
@@ -0,0 +1,168 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import functools
+
+import numpy as np
+from zl.indicators import ring as ring_
+from zl.indicators import signals
+from zl.indicators import utils
+
+
+BULL = 'Bull'
+BEAR = 'Bear'
+
+# NOTE(jkoelker) Direction codes used by the array functions
+DIRECTIONS = {BEAR: -1, BULL: 1}
+
+FLIP_DTYPE = np.dtype([('index', np.int64), ('direction', np.int8)])
+
+
+def flip(events, field):
+    events = list(events)
+    Yp = events[-1][field]
+    Xp = events[-2][field]
+    X = events[0][field]
+    Y = events[1][field]
+
+    if (Xp > X) and (Yp < Y):
+        return Signal(BEAR, events)
+    if (Xp < X) and (Yp > Y):
+        return Signal(BULL, events)
+
+
+def flip_array(close, period, begins=None):
+    """Find every flip over a whole history at once.
+
+    Returns a structured array with the `index` of the bar each flip is
+    signaled on and its `direction` code, matching what a FlipWindow fed
+    the same bars one at a time would return.
+
+    Several histories can be laid end to end with `begins` holding the
+    first bar of the history each bar belongs to, flips reaching back
+    past it are dropped.
+    """
+    close = np.asarray(close, dtype=float)
+    length = len(close) - period - 1
+
+    if length <= 0:
+        return np.zeros(0, dtype=FLIP_DTYPE)
+
+    X = close[:length]
+    Y = close[1:length + 1]
+    Xp = close[period:period + length]
+    Yp = close[period + 1:]
+
+    bear = (Xp > X) & (Yp < Y)
+    bull = (Xp < X) & (Yp > Y)
+    mask = bear | bull
+
+    result = np.zeros(np.count_nonzero(mask), dtype=FLIP_DTYPE)
+    result['index'] = np.flatnonzero(mask) + period + 1
+    result['direction'] = np.where(bear[mask], DIRECTIONS[BEAR],
+                                   DIRECTIONS[BULL])
+
+    if begins is not None:
+        index = result['index']
+        result = result[index - period - 1 >= begins[index]]
+    return result
+
+
+class Signal(signals.Signal):
+    __slots__ = ()
+
+    def __init__(self, direction, bars=None, ring=None, start=None,
+                 end=None):
+        signals.Signal.__init__(self, direction, bars, ring, start, end)
+
+    def dump(self, out, prefix, fields):
+        signals.Signal.dump(self, out, prefix, fields, DIRECTIONS)
+
+    @classmethod
+    def load(cls, data, prefix, fields):
+        return cls(signals.load_direction(data, prefix, DIRECTIONS),
+                   signals.load_bars(data, prefix, fields))
+
+
+class FlipState(object):
+    """Incremental equivalent of `flip` over a sliding window.
+
+    The four values `flip` looks at are read straight out of a BarRing,
+    the Signal references its bars by offset into the ring. When given a
+    ring shared with other states, whoever owns the ring appends the
+    bars and the FlipState only looks at the bars added after it was
+    created.
+    """
+    STAGE = 'flip'
+    CHILDREN = ()
+    metrics = None
+
+    def __init__(self, period, field, ring=None):
+        self.period = period
+        self.field = field
+        self.owner = ring is None
+
+        if ring is None:
+            ring = ring_.BarRing([field])
+
+        ring.reserve(period + 2)
+        self.ring = ring
+        self.start = ring.count
+
+    @property
+    def length(self):
+        return len(self.ring)
+
+    def prime(self, columns):
+        """Catch up on whole arrays of bars, same as updating with each."""
+        if self.owner:
+            self.ring.extend(columns)
+
+    def dump(self, out, prefix=''):
+        if self.owner:
+            self.ring.dump(out, prefix + 'ring.')
+        out[prefix + 'start'] = np.array([self.start])
+
+    def load(self, data, prefix=''):
+        if self.owner:
+            self.ring.load(data, prefix + 'ring.')
+        self.start = int(data[prefix + 'start'][0])
+
+    def update(self, event):
+        ring = self.ring
+        if self.owner:
+            ring.append(event)
+
+        end = ring.count
+        begin = end - self.period - 2
+        if begin < self.start:
+            return
+
+        field = self.field
+        Yp = ring.value(field, end - 1)
+        Xp = ring.value(field, end - 2)
+        X = ring.value(field, begin)
+        Y = ring.value(field, begin + 1)
+
+        if (Xp > X) and (Yp < Y):
+            return Signal(BEAR, ring=ring, start=begin, end=end)
+        if (Xp < X) and (Yp > Y):
+            return Signal(BULL, ring=ring, start=begin, end=end)
+
+
+def stream(bars, period=4, field='close'):
+    """Lazily yield `(sid, signal)` for every flip in `bars`."""
+    return utils.stream(bars, functools.partial(FlipState, period, field))
@@ -0,0 +1,181 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import bisect
+import collections
+import functools
+import timeit
+
+
+# NOTE(jkoelker) Upper edges of the timing histograms in seconds, from
+#                100ns to 50ms, slower calls land in one last bucket
+BUCKETS = tuple(scale * 10.0 ** exponent
+                for exponent in xrange(-7, -1) for scale in (1, 2, 5))
+
+clock = timeit.default_timer
+
+
+def watch(owner, state):
+    """Instrument `state` when the `owner` creating it is instrumented."""
+    if owner.metrics is not None:
+        owner.metrics.instrument(state)
+    return state
+
+
+class Metrics(object):
+    """Counters and per stage timings of a transform.
+
+    Nothing is measured until a transform's `enable_metrics` hands its
+    updates to `update`. The incremental states are then timed stage by
+    stage, each stage excluding the stages it calls, while legacy
+    windows are only timed as a whole under `update`.
+
+    Every `interval` events, and on `flush`, the `snapshot` is handed to
+    `sink`.
+
+    The timings nest through shared state, so windows updated from
+    several threads cannot be measured.
+    """
+    def __init__(self, name, windows=None, sink=None, interval=None,
+                 buckets=BUCKETS):
+        if getattr(windows, 'stripes', None) is not None:
+            raise ValueError("Metrics need single threaded windows")
+
+        self.name = name
+        self.windows = windows
+        self.sink = sink
+        self.interval = interval
+        self.buckets = tuple(buckets)
+        self.events = 0
+        self.emitted = 0
+        self.signals = collections.defaultdict(int)
+        self.seconds = collections.defaultdict(float)
+        self.histograms = {}
+        self._inner = 0.0
+
+    def record(self, stage, seconds):
+        self.seconds[stage] = self.seconds[stage] + seconds
+
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = [0] * (len(self.buckets) + 1)
+            self.histograms[stage] = histogram
+        histogram[bisect.bisect(self.buckets, seconds)] += 1
+
+    def time(self, stage, func, *args):
+        """Call `func` recording the time spent in it under `stage`."""
+        inner = self._inner
+        self._inner = 0.0
+        start = clock()
+        try:
+            return func(*args)
+        finally:
+            elapsed = clock() - start
+            self.record(stage, elapsed - self._inner)
+            self._inner = inner + elapsed
+
+    def _stage(self, stage, update, event):
+        signal = self.time(stage, update, event)
+        if signal is not None:
+            key = '%s.%s' % (stage, signal['direction'])
+            self.signals[key] = self.signals[key] + 1
+        return signal
+
+    def instrument(self, state):
+        """Time the updates of `state` and the states it holds.
+
+        The bound `update` is shadowed by an instance attribute so the
+        states never check for metrics on their own hot path.
+        """
+        state.metrics = self
+        if state.STAGE is not None:
+            update = type(state).update.__get__(state, type(state))
+            state.update = functools.partial(self._stage, state.STAGE,
+                                             update)
+
+        for child in _children(state):
+            self.instrument(child)
+
+    def release(self, state):
+        state.metrics = None
+        state.__dict__.pop('update', None)
+
+        for child in _children(state):
+            self.release(child)
+
+    def close(self):
+        """Stop timing every window seen so far."""
+        for _sid, window in self.windows.items():
+            if getattr(window, 'metrics', None) is not self:
+                continue
+            window.metrics = None
+            if window.state is not None:
+                self.release(window.state)
+
+    @staticmethod
+    def _call(window, event):
+        window.update(event)
+        return window()
+
+    def update(self, window, event):
+        if getattr(window, 'metrics', None) is not self:
+            window.metrics = self
+            if window.state is not None:
+                self.instrument(window.state)
+
+        signal = self.time('update', self._call, window, event)
+
+        self.events = self.events + 1
+        if signal is not None:
+            self.emitted = self.emitted + 1
+
+        if self.interval and self.events % self.interval == 0:
+            self.flush()
+        return signal
+
+    def snapshot(self):
+        lengths = []
+        if self.windows is not None:
+            lengths = [len(window) for _sid, window in self.windows.items()]
+
+        return {'name': self.name,
+                'events': self.events,
+                'emitted': self.emitted,
+                'signals': dict(self.signals),
+                'seconds': dict(self.seconds),
+                'histograms': dict((stage, list(histogram))
+                                   for stage, histogram
+                                   in self.histograms.items()),
+                'buckets': list(self.buckets),
+                'sids': len(lengths),
+                'window_length': {'max': max(lengths or [0]),
+                                  'total': sum(lengths)}}
+
+    def flush(self):
+        snapshot = self.snapshot()
+        if self.sink is not None:
+            self.sink(snapshot)
+        return snapshot
+
+
+def _children(state):
+    for name in state.CHILDREN:
+        children = getattr(state, name)
+        if not isinstance(children, list):
+            children = [children]
+        for child in children:
+            if child is not None:
+                yield child
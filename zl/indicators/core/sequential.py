@@ -0,0 +1,211 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import functools
+
+import numpy as np
+from zl.indicators import ring
+from zl.indicators import signals
+from zl.indicators import utils
+from zl.indicators.core import countdown
+from zl.indicators.core import metrics as metrics_
+from zl.indicators.core import setup
+
+
+BUY = 'Buy'
+SELL = 'Sell'
+
+
+class SequentialState(object):
+    """Incremental flip -> setup -> countdown pipeline for a single sid.
+
+    A setup starts a countdown when none is running. Setups completing
+    while a countdown is running are ignored, unless `setup_reverse_cancel`
+    is set and the setup is in the opposite direction, which cancels the
+    countdown and starts a new one. Once the countdown completes, or
+    expires after `countdown_max_length` bars, the next setup starts a
+    new one.
+
+    Every stage reads the bars out of a single BarRing which is the only
+    place a bar is stored.
+    """
+    STAGE = None
+    CHILDREN = ('setup', 'countdown')
+    metrics = None
+
+    def __init__(self, flip_period, flip_field,
+                 setup_period, setup_lookback,
+                 setup_field, setup_reverse_cancel,
+                 countdown_period, countdown_lookback,
+                 countdown_field, countdown_max_length=None):
+        self.setup_reverse_cancel = setup_reverse_cancel
+
+        self.countdown_period = countdown_period
+        self.countdown_lookback = countdown_lookback
+        self.countdown_field = countdown_field
+        self.countdown_max_length = countdown_max_length
+
+        self.ring = ring.BarRing([flip_field, setup_field, countdown_field,
+                                  'high', 'low'])
+        self.setup = setup.SetupState(setup_period,
+                                      setup_lookback,
+                                      setup_field,
+                                      flip_period,
+                                      flip_field,
+                                      self.ring)
+        self.countdown = None
+        self.setup_signal = None
+
+    @property
+    def length(self):
+        return len(self.ring)
+
+    def _reversed(self, setup_signal):
+        return (self.setup_reverse_cancel and setup_signal is not None and
+                setup_signal['direction'] != self.countdown.direction)
+
+    def _clear(self):
+        self.countdown.cancel()
+        self.countdown = None
+        self.setup_signal = None
+
+    def prime(self, columns):
+        """Fast forward a fresh state over whole arrays of bars.
+
+        The setups come from `setup_array` and the countdown each of them
+        would start from `countdown_array`, leaving only the walk over the
+        setups deciding which ones start a countdown.
+        """
+        assert self.ring.count == 0, "Only fresh states can be primed"
+
+        state = self.setup
+        high = np.asarray(columns['high'], dtype=float)
+        low = np.asarray(columns['low'], dtype=float)
+        length = len(high)
+
+        setups = setup.setup_array(columns[state.field], high, low,
+                                   state.period, state.lookback,
+                                   state.flip_period,
+                                   columns[state.flip_field])
+        ends = countdown.countdown_array(columns[self.countdown_field],
+                                         high, low, setups['index'],
+                                         setups['direction'],
+                                         self.countdown_period,
+                                         self.countdown_lookback,
+                                         max_length=self.countdown_max_length)
+
+        running = None
+        end = -1
+        for position, row in enumerate(setups):
+            if running is not None and row['index'] <= end:
+                reversed_ = row['direction'] != setups['direction'][running]
+                if not (self.setup_reverse_cancel and reversed_):
+                    continue
+
+            running = position
+            end = ends['index'][position]
+            if end < 0 and self.countdown_max_length is None:
+                end = length
+            elif end < 0:
+                end = row['index'] + self.countdown_max_length - 1
+
+        if running is not None and end >= length:
+            self.ring.grow(length - setups['index'][running])
+        else:
+            running = None
+
+        self.ring.extend(columns)
+        state.prime(columns)
+
+        if running is None:
+            return
+
+        row = setups[running]
+        setup_signal = setup.from_row(row, columns, state.window_length,
+                                      state.lookback, state.flip_period)
+        setup_signal.check_perfection(self.ring.event(length - 1))
+
+        self.setup_signal = setup_signal
+        self.countdown = metrics_.watch(self, countdown.CountdownState(
+            setup_signal['direction'], self.countdown_period,
+            self.countdown_lookback, self.countdown_field, ring=self.ring,
+            max_length=self.countdown_max_length))
+        self.countdown.setup_signal = setup_signal
+        self.countdown.resume(columns, int(row['index']))
+
+    def dump(self, out, prefix=''):
+        self.ring.dump(out, prefix + 'ring.')
+        self.setup.dump(out, prefix + 'setup.')
+
+        if self.countdown is not None:
+            self.countdown.dump(out, prefix + 'countdown.')
+
+    def load(self, data, prefix=''):
+        self.ring.load(data, prefix + 'ring.')
+        self.setup.load(data, prefix + 'setup.')
+        self.countdown = None
+        self.setup_signal = None
+
+        if not signals.present(data, prefix + 'countdown.'):
+            return
+
+        direction = signals.load_direction(data, prefix + 'countdown.',
+                                           countdown.DIRECTIONS)
+        self.countdown = metrics_.watch(self, countdown.CountdownState(
+            direction, self.countdown_period, self.countdown_lookback,
+            self.countdown_field, ring=self.ring,
+            max_length=self.countdown_max_length))
+        self.countdown.load(data, prefix + 'countdown.')
+        self.setup_signal = self.countdown.setup_signal
+
+    def update(self, event):
+        self.ring.append(event)
+        setup_signal = self.setup.update(event)
+
+        if self.countdown is not None and self._reversed(setup_signal):
+            self._clear()
+
+        if self.countdown is not None:
+            signal = self.countdown.update(event)
+            if self.countdown.done:
+                self._clear()
+            return signal
+
+        if setup_signal is not None:
+            self.setup_signal = setup_signal
+            self.countdown = metrics_.watch(self, countdown.CountdownState(
+                setup_signal['direction'], self.countdown_period,
+                self.countdown_lookback, self.countdown_field,
+                setup_signal, self.ring, self.countdown_max_length))
+
+
+def stream(bars, flip_period=4, flip_field='close',
+           setup_period=9, setup_lookback=4, setup_field=None,
+           setup_reverse_cancel=True, countdown_period=13,
+           countdown_lookback=2, countdown_field=None,
+           countdown_max_length=None):
+    """Lazily yield `(sid, signal)` for every countdown in `bars`."""
+    if setup_field is None:
+        setup_field = flip_field
+
+    if countdown_field is None:
+        countdown_field = setup_field
+
+    return utils.stream(bars, functools.partial(
+        SequentialState, flip_period, flip_field, setup_period,
+        setup_lookback, setup_field, setup_reverse_cancel,
+        countdown_period, countdown_lookback, countdown_field,
+        countdown_max_length))
@@ -0,0 +1,576 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import functools
+import itertools
+import operator
+
+import numpy as np
+from zl.indicators import ring as ring_
+from zl.indicators import signals
+from zl.indicators import utils
+from zl.indicators.core import flip
+from zl.indicators.core import metrics as metrics_
+
+
+BUY = 'Buy'
+SELL = 'Sell'
+
+# NOTE(jkoelker) Direction codes used by the array functions
+DIRECTIONS = {BUY: -1, SELL: 1}
+
+SETUP_DTYPE = np.dtype([('index', np.int64), ('direction', np.int8),
+                        ('high', np.float64), ('low', np.float64),
+                        ('perfection', np.float64), ('flip', np.int64)])
+
+
+def setup(events, field, period, lookback, flip_signal):
+    events = list(events)
+    values = [e[field] for e in events]
+
+    direction = None
+    flip_dir = flip_signal['direction']
+
+    if flip_dir == flip.BEAR and all(itertools.imap(operator.lt,
+                                                    values[lookback:],
+                                                    values[:period])):
+        direction = BUY
+
+    elif flip_dir == flip.BULL and all(itertools.imap(operator.gt,
+                                                      values[lookback:],
+                                                      values[:period])):
+        direction = SELL
+
+    if not direction:
+        return
+
+    return _signal(direction, events[lookback:], flip_signal)
+
+
+def _levels(direction, highs, lowes):
+    high = np.max(highs)
+    low = np.max(lowes)
+
+    if direction == BUY:
+        perfection = np.min(lowes[-4:-2])
+    else:
+        perfection = np.max(highs[-4:-2])
+
+    return high, low, perfection
+
+
+def from_row(row, columns, window_length, lookback, flip_period):
+    """Build the Signal for a SETUP_DTYPE row from the bars in `columns`."""
+    direction = signals.from_code(DIRECTIONS, row['direction'])
+    flip_direction = flip.BEAR if direction == BUY else flip.BULL
+    flip_end = row['flip'] + 1
+    flip_signal = flip.Signal(flip_direction,
+                              signals.rows(columns,
+                                           flip_end - flip_period - 2,
+                                           flip_end))
+
+    end = row['index'] + 1
+    begin = end - window_length + lookback
+    return Signal(direction, row['high'], row['low'],
+                  signals.rows(columns, begin, end), row['perfection'],
+                  flip_signal)
+
+
+def _signal(direction, bars, flip_signal):
+    lowes = [bar['low'] for bar in bars]
+    highs = [bar['high'] for bar in bars]
+
+    high, low, perfection = _levels(direction, highs, lowes)
+    return Signal(direction, high, low, bars, perfection, flip_signal)
+
+
+def runs(close, lookback, begins=None):
+    """Closes in a row below and above the close `lookback` bars back."""
+    below = np.zeros(len(close), dtype=bool)
+    above = np.zeros(len(close), dtype=bool)
+    below[lookback:] = close[lookback:] < close[:-lookback]
+    above[lookback:] = close[lookback:] > close[:-lookback]
+
+    if begins is not None:
+        early = np.arange(len(close)) - lookback < begins
+        below[early] = False
+        above[early] = False
+    return utils.runs(below), utils.runs(above)
+
+
+def scan(close, flip_close, period, lookback, flip_period, flips=None,
+         counts=None, begins=None):
+    """Walk the flips over a whole history the way a SetupState would.
+
+    Returns the flips, the bars the flip window was reset on after its
+    counter reached `period` and the setups as `(complete, direction,
+    flip)` tuples. The `flip_array` and `runs` of the bars can be handed
+    in when already known, taken over the same `begins` as `flip_array`
+    when several histories are laid end to end.
+    """
+    length = len(close)
+    window_length = period + lookback - 1
+
+    if counts is None:
+        counts = runs(close, lookback, begins)
+    below, above = counts
+
+    if flips is None:
+        flips = flip.flip_array(flip_close, flip_period, begins)
+    # NOTE(jkoelker) searchsorted copies a strided field view on every
+    #                call, keep a contiguous copy around instead
+    index = np.ascontiguousarray(flips['index'])
+    completes = index + period - 1
+
+    first = 0
+    last = np.empty(len(index), dtype=np.int64)
+    last.fill(length)
+    if begins is not None:
+        first = begins[index]
+        last = utils.ends(begins)[index]
+
+    # NOTE(jkoelker) A flip completes its setup when the next flip comes
+    #                after the counter reaches period. Once a setup
+    #                completes the flip window starts over, so flips
+    #                before it fills again are never seen.
+    following = np.append(index[1:], length + period)
+    candidate = ((following > completes) & (completes < last) &
+                 (completes - first >= window_length - 1))
+
+    positions = np.where(candidate, np.arange(len(index)), len(index))
+    candidates = np.minimum.accumulate(positions[::-1])[::-1]
+
+    rows = []
+    resets = []
+    position = 0
+    while position < len(index):
+        position = candidates[position]
+        if position == len(index):
+            break
+
+        complete = completes[position]
+        direction = flips['direction'][position]
+
+        resets.append(complete)
+
+        if direction == flip.DIRECTIONS[flip.BEAR]:
+            if below[complete] >= period - 1:
+                rows.append((complete, DIRECTIONS[BUY], index[position]))
+        elif above[complete] >= period - 1:
+            rows.append((complete, DIRECTIONS[SELL], index[position]))
+
+        position = np.searchsorted(index, min(complete + flip_period + 2,
+                                              last[position]))
+
+    return flips, resets, rows
+
+
+def counters(length, flips, resets, flip_period, begins=None):
+    """The `SetupState.count` of every bar, from what `scan` returns.
+
+    The flips the flip window sees after each reset restart the count,
+    the bars from a reset to the next of them count 0.
+    """
+    index = flips['index']
+    resets = np.asarray(resets, dtype=np.int64)
+
+    first = np.zeros(len(index), dtype=np.int64)
+    if begins is not None:
+        first = begins[index]
+
+    prior = np.searchsorted(resets, index) - 1
+    starts = np.where(prior >= 0, resets[np.maximum(prior, 0)] + 1, 0)
+    starts = np.maximum(starts, first)
+    visible = index[index >= starts + flip_period + 1]
+
+    bars = np.arange(length)
+    last_flip = np.empty(length, dtype=np.int64)
+    last_flip.fill(-1)
+    last_flip[visible] = visible
+    last_flip = np.maximum.accumulate(last_flip)
+
+    last_reset = np.empty(length + 1, dtype=np.int64)
+    last_reset.fill(-1)
+    last_reset[resets + 1] = resets
+    last_reset = np.maximum.accumulate(last_reset)[:-1]
+
+    if begins is None:
+        begins = 0
+    running = (last_flip >= begins) & (last_flip > last_reset)
+    return np.where(running, bars - last_flip + 1, 0)
+
+
+def setup_array(close, high, low, period, lookback, flip_period=None,
+                flip_close=None, begins=None):
+    """Find every setup over a whole history at once.
+
+    Returns a structured array with one row per setup signal, `index` is
+    the bar the setup completes on and `flip` the bar its flip was
+    signaled on. The rows match the signals a SetupWindow fed the same
+    bars one at a time would return. `begins` lays several histories end
+    to end as for `flip_array`.
+    """
+    if flip_period is None:
+        flip_period = lookback
+
+    close = np.asarray(close, dtype=float)
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+
+    if flip_close is None:
+        flip_close = close
+
+    _flips, _resets, rows = scan(close, flip_close, period, lookback,
+                                 flip_period, begins=begins)
+    return scan_array(rows, high, low, period, lookback)
+
+
+def scan_array(rows, high, low, period, lookback):
+    """SETUP_DTYPE array of the setups `scan` found."""
+    window_length = period + lookback - 1
+    result = np.zeros(len(rows), dtype=SETUP_DTYPE)
+    for row, (complete, direction, flip_index) in enumerate(rows):
+        start = complete - window_length + lookback + 1
+        highs = high[start:complete + 1]
+        lowes = low[start:complete + 1]
+
+        if direction == DIRECTIONS[BUY]:
+            perfection = np.min(lowes[-4:-2])
+        else:
+            perfection = np.max(highs[-4:-2])
+
+        result[row] = (complete, direction, np.max(highs), np.max(lowes),
+                       perfection, flip_index)
+
+    return result
+
+
+class SetupState(object):
+    """Incremental equivalent of the SetupWindow.
+
+    Rather than comparing the whole window against itself when the
+    counter reaches `period`, the number of consecutive closes below and
+    above the close `lookback` bars earlier is kept as the bars arrive.
+    The bars live in a BarRing shared with the FlipState.
+    """
+    STAGE = 'setup'
+    CHILDREN = ('flip',)
+    metrics = None
+
+    def __init__(self, period, lookback, field, flip_period, flip_field,
+                 ring=None):
+        self.period = period
+        self.lookback = lookback
+        self.field = field
+        self.flip_period = flip_period
+        self.flip_field = flip_field
+        self.window_length = period + lookback - 1
+        self.owner = ring is None
+
+        if ring is None:
+            ring = ring_.BarRing([field, flip_field, 'high', 'low'])
+
+        ring.reserve(self.window_length)
+        self.ring = ring
+        self.start = ring.count
+        self.below = 0
+        self.above = 0
+        self.flip_signal = None
+        self.flip = None
+        self.counter = 0
+        self.high = None
+        self.high_bar = None
+        self.low = None
+        self.low_bar = None
+        self._reset_flip()
+
+    @property
+    def length(self):
+        return len(self.ring)
+
+    @property
+    def count(self):
+        """Bars of the running setup so far, from its flip bar on.
+
+        The bar a setup completes or gives up on counts as `period`, 0
+        while waiting for a flip.
+        """
+        if self.flip_signal is not None:
+            return self.counter
+        if self.flip.start == self.ring.count > self.start:
+            return self.period
+        return 0
+
+    def _track(self):
+        """Work out the extremes `update` keeps from the bars in the ring.
+
+        A setup is made of the bars after its flip, so only the maxes of
+        the bars since the flip and the first bar at each are needed.
+        """
+        self.high = None
+        self.low = None
+        if self.flip_signal is None or not 1 < self.counter <= self.period:
+            return
+
+        ring = self.ring
+        start = ring.count - self.counter + 1
+        highs = ring.array('high', start, ring.count)
+        lowes = ring.array('low', start, ring.count)
+
+        self.high_bar = start + int(np.argmax(highs))
+        self.high = highs[self.high_bar - start]
+        self.low_bar = start + int(np.argmax(lowes))
+        self.low = lowes[self.low_bar - start]
+
+    def _reset_flip(self):
+        self.counter = 0
+        self.flip_signal = None
+        self.flip = metrics_.watch(self, flip.FlipState(self.flip_period,
+                                                        self.flip_field,
+                                                        self.ring))
+
+    def prime(self, columns):
+        """Fast forward a fresh state over whole arrays of bars.
+
+        Leaves the state where updating with every bar would. The flips
+        and the bars the flip window restarted on come from the same scan
+        `setup_array` uses, the runs from `utils.runs`.
+        """
+        if self.owner:
+            assert self.ring.count == 0, "Only fresh states can be primed"
+            self.ring.extend(columns)
+
+        value = np.asarray(columns[self.field], dtype=float)
+        flips, resets, _rows = scan(value,
+                                    np.asarray(columns[self.flip_field],
+                                               dtype=float),
+                                    self.period, self.lookback,
+                                    self.flip_period)
+
+        length = len(value)
+        lookback = self.lookback
+        self.below = 0
+        self.above = 0
+
+        if length > lookback:
+            self.below = int(utils.runs(value[lookback:] <
+                                        value[:-lookback])[-1])
+            self.above = int(utils.runs(value[lookback:] >
+                                        value[:-lookback])[-1])
+
+        self._reset_flip()
+        self.flip.start = self.start
+        self.counter = length
+
+        if resets:
+            self.flip.start = int(resets[-1]) + 1
+            self.counter = length - self.flip.start
+
+        index = flips['index']
+        visible = flips[index >= self.flip.start + self.flip_period + 1]
+        if len(visible):
+            end = int(visible['index'][-1]) + 1
+            self.counter = length - end + 1
+            self.flip_signal = flip.Signal(
+                signals.from_code(flip.DIRECTIONS, visible['direction'][-1]),
+                signals.rows(columns, end - self.flip_period - 2, end))
+
+        self._track()
+
+    def dump(self, out, prefix=''):
+        if self.owner:
+            self.ring.dump(out, prefix + 'ring.')
+
+        self.flip.dump(out, prefix + 'flip.')
+        out[prefix + 'counts'] = np.array([self.start, self.below,
+                                           self.above, self.counter])
+
+        if self.flip_signal is not None:
+            self.flip_signal.dump(out, prefix + 'flip_signal.',
+                                  self.ring.fields)
+
+    def load(self, data, prefix=''):
+        if self.owner:
+            self.ring.load(data, prefix + 'ring.')
+
+        self.flip.load(data, prefix + 'flip.')
+        (self.start, self.below,
+         self.above, self.counter) = data[prefix + 'counts'].tolist()
+
+        self.flip_signal = None
+        if signals.present(data, prefix + 'flip_signal.'):
+            self.flip_signal = flip.Signal.load(data, prefix + 'flip_signal.',
+                                                self.ring.fields)
+
+        self._track()
+
+    def update(self, event):
+        ring = self.ring
+        if self.owner:
+            ring.append(event)
+
+        flip_signal = self.flip.update(event)
+
+        end = ring.count
+        seen = end - self.start
+
+        if seen > self.lookback:
+            value = ring.value(self.field, end - 1)
+            prior = ring.value(self.field, end - 1 - self.lookback)
+            self.below = self.below + 1 if value < prior else 0
+            self.above = self.above + 1 if value > prior else 0
+
+        self.counter = self.counter + 1
+
+        if flip_signal:
+            self.flip_signal = flip_signal
+            self.counter = 1
+            self.high = None
+            self.low = None
+
+        # NOTE(jkoelker) Keep the first bar at the max high and low since
+        #                the flip, they make up the setup's levels
+        elif self.flip_signal is not None and self.counter <= self.period:
+            high = event['high']
+            low = event['low']
+            if self.high is None or high > self.high:
+                self.high = high
+                self.high_bar = end - 1
+            if self.low is None or low > self.low:
+                self.low = low
+                self.low_bar = end - 1
+
+        if seen < self.window_length:
+            return
+
+        if not self.flip_signal or self.counter != self.period:
+            return
+
+        # NOTE(jkoelker) `setup` compares the last period - 1 closes to
+        #                the close lookback bars before them
+        direction = None
+        flip_signal = self.flip_signal
+        flip_dir = flip_signal['direction']
+
+        if flip_dir == flip.BEAR and self.below >= self.period - 1:
+            direction = BUY
+        elif flip_dir == flip.BULL and self.above >= self.period - 1:
+            direction = SELL
+
+        self._reset_flip()
+
+        if not direction:
+            return
+
+        # NOTE(jkoelker) The extremes were tracked as the bars arrived,
+        #                only the bars perfection looks at are read back
+        begin = end - self.window_length + self.lookback
+        high = self.high
+        low = self.low
+        near = max(begin, end - 4)
+        tail = max(begin, end - 2)
+
+        if direction == BUY:
+            perfection = np.min(ring.array('low', near, end - 2))
+            last = ring.array('low', tail, end) <= perfection
+            bar = self.low_bar
+            risk_level = low - (ring.value('high', bar) -
+                                ring.value('low', bar))
+        else:
+            perfection = np.max(ring.array('high', near, end - 2))
+            last = ring.array('high', tail, end) >= perfection
+            bar = self.high_bar
+            risk_level = high + (ring.value('high', bar) -
+                                 ring.value('low', bar))
+
+        return Signal(direction, high, low, None, perfection, flip_signal,
+                      ring, begin, end, risk_level, last.tolist())
+
+
+class Signal(signals.Signal):
+    __slots__ = ('high', 'low', 'flip', 'perfection', 'risk_level',
+                 '_perfect', '_last')
+
+    KEYS = ('direction', 'high', 'low', 'bars', 'flip', 'perfection')
+
+    def __init__(self, direction, high, low, bars, perfection,
+                 flip_signal, ring=None, start=None, end=None,
+                 risk_level=None, last=None):
+        signals.Signal.__init__(self, direction, bars, ring, start, end)
+        self.high = high
+        self.low = low
+        self.flip = flip_signal
+        self.perfection = perfection
+        self._perfect = False
+
+        # NOTE(jkoelker) Whether the last two bars reached perfection,
+        #                worked out from the bars when not handed in
+        self._last = last
+
+        if risk_level is None:
+            risk_level = self._risk_level(high, low)
+        self.risk_level = risk_level
+
+    def dump(self, out, prefix, fields):
+        signals.Signal.dump(self, out, prefix, fields, DIRECTIONS)
+        out[prefix + 'levels'] = np.array([self.high, self.low,
+                                           self.perfection, self._perfect])
+        self.flip.dump(out, prefix + 'flip.', fields)
+
+    @classmethod
+    def load(cls, data, prefix, fields):
+        high, low, perfection, perfect = data[prefix + 'levels'].tolist()
+        signal = cls(signals.load_direction(data, prefix, DIRECTIONS),
+                     high, low, signals.load_bars(data, prefix, fields),
+                     perfection,
+                     flip.Signal.load(data, prefix + 'flip.', fields))
+        signal._perfect = bool(perfect)
+        return signal
+
+    def check_perfection(self, event):
+        if self.direction == BUY:
+            self._perfect = event['low'] <= self.perfection
+            return self._perfect
+        self._perfect = event['high'] >= self.perfection
+        return self._perfect
+
+    @property
+    def is_perfect(self):
+        if self._perfect:
+            return True
+
+        if self._last is None:
+            self._last = [self.check_perfection(b) for b in self.bars[-2:]]
+
+        # NOTE(jkoelker) Checking the last bars leaves the last one's
+        #                result behind, same as checking them again would
+        if self._last:
+            self._perfect = self._last[-1]
+        return any(self._last)
+
+
+def stream(bars, period=9, lookback=4, field='close', flip_period=None,
+           flip_field=None):
+    """Lazily yield `(sid, signal)` for every setup in `bars`."""
+    if flip_period is None:
+        flip_period = lookback
+
+    if flip_field is None:
+        flip_field = field
+
+    return utils.stream(bars, functools.partial(SetupState, period,
+                                                lookback, field,
+                                                flip_period, flip_field))
@@ -0,0 +1,76 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import numpy as np
+
+
+VERSION = 1
+
+
+def dump(states, fileobj):
+    """Write the states of many sids to `fileobj` as one npz archive.
+
+    `states` yields `(sid, state)` pairs. Every state writes its arrays
+    into a flat dict keyed by dotted names, the arrays under each name are
+    concatenated across the sids with the length each sid contributed
+    kept next to them, so the archive holds a fixed number of arrays no
+    matter how many sids there are.
+    """
+    sids = []
+    arrays = {}
+    lengths = {}
+
+    for position, (sid, state) in enumerate(states):
+        if state is None:
+            raise ValueError("Snapshots need incremental windows")
+
+        out = {}
+        state.dump(out)
+        sids.append(sid)
+
+        for key, value in out.items():
+            arrays.setdefault(key, []).append(value)
+            lengths.setdefault(key, []).append((position, len(value)))
+
+    archive = {'version': np.array([VERSION]), 'sids': np.array(sids)}
+    for key, values in arrays.items():
+        length = np.zeros(len(sids), dtype=np.int64)
+        for position, count in lengths[key]:
+            length[position] = count
+
+        archive['data/' + key] = np.concatenate(values)
+        archive['length/' + key] = length
+
+    np.savez(fileobj, **archive)
+
+
+def load(fileobj):
+    """Yield `(sid, data)` for every sid in an archive written by `dump`."""
+    archive = np.load(fileobj)
+    version = archive['version'][0]
+    if version != VERSION:
+        raise ValueError("Unsupported snapshot version %s" % version)
+
+    keys = [name[len('data/'):] for name in archive.files
+            if name.startswith('data/')]
+    arrays = dict((key, archive['data/' + key]) for key in keys)
+    offsets = dict((key, np.append(0, np.cumsum(archive['length/' + key])))
+                   for key in keys)
+
+    for position, sid in enumerate(archive['sids'].tolist()):
+        yield sid, dict((key, arrays[key][offsets[key][position]:
+                                          offsets[key][position + 1]])
+                        for key in keys)
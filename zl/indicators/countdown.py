@@ -14,97 +14,43 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
-import collections
-import itertools
 import numbers
-import operator
 
-import numpy as np
 from zipline.transforms import utils as transforms
 from zl.indicators import utils
+from zl.indicators.core.countdown import (  # noqa
+    BUY, SELL, DIRECTIONS, COUNTDOWN_DTYPE, CountdownState, Signal,
+    StandaloneState, countdown, countdown_array, stream)
 
 
-BUY = 'Buy'
-SELL = 'Sell'
-
-
-def countdown(direction, events, period, lookback, field,
-              setup_signal=None):
-    events = list(events)
-    event_iter = itertools.izip(events[lookback:], events[:-lookback])
-    signals = []
-    compare_field = 'low'
-    compare_op = operator.le
-
-    if direction == SELL:
-        compare_field = 'high'
-        compare_op = operator.ge
-
-    for position, (event, prior) in enumerate(event_iter):
-        if compare_op(event[field], prior[compare_field]):
-            signals.append(position)
-
-    if len(signals) >= period:
-        bars = [bar for bar in events[lookback:]]
-
-        # TODO(jkoelker) Figure out if bar "8" should be determined by
-        #                the period length
-        qualifier = bars[signals[7]]
-        ending = bars[signals[-1]]
-
-        if compare_op(ending[compare_field], qualifier[field]):
-            lowes = [bar['low'] for bar in bars]
-            highs = [bar['high'] for bar in bars]
-
-            high = np.max(highs)
-            low = np.max(lowes)
-            return Signal(direction, high, low, bars, signals,
-                          setup_signal)
-
-
-class Signal(dict):
-    def __init__(self, direction, high, low, bars, signals, setup_signal):
-        self['direction'] = direction
-        self['high'] = high
-        self['low'] = low
-        self['bars'] = bars
-        self['signals'] = signals
-        self['setup'] = setup_signal
-
-    @utils.cached_property
-    def risk_level(self):
-        for bar in self['bars']:
-            if self['direction'] == BUY:
-                if bar['low'] == self['low']:
-                    return self['low'] - (bar['high'] - bar['low'])
-
-            elif self['direction'] == SELL:
-                if bar['high'] == self['high']:
-                    return self['high'] + (bar['high'] - bar['low'])
-
-        assert False, "Signal extreme not found in bars!"
-
-
-class Countdown(object):
+class Countdown(utils.SidTransform):
     __metaclass__ = transforms.TransformMeta
 
-    def __init__(self, period=13, lookback=2, field='close'):
+    name = 'countdown'
+
+    def __init__(self, period=13, lookback=2, field='close',
+                 incremental=False, max_length=None, max_sids=None,
+                 max_idle=None, stripes=None, table=None):
         self.period = period
         self.lookback = lookback
         self.field = field
-        self.sid_windows = collections.defaultdict(self.create_window)
+        self.incremental = incremental
+        self.max_length = max_length
 
-    def create_window(self):
-        return CountdownWindow(self.period, self.lookback, self.field)
+        if max_length is not None and not incremental:
+            raise ValueError("max_length needs an incremental window")
 
-    def update(self, event):
-        window = self.sid_windows[event.sid]
-        window.update(event)
-        return window()
+        utils.SidTransform.__init__(self, max_sids, max_idle, stripes, table)
+
+    def create_window(self):
+        return CountdownWindow(self.period, self.lookback, self.field,
+                               incremental=self.incremental,
+                               max_length=self.max_length)
 
 
-class CountdownWindow(transforms.EventWindow):
-    def __init__(self, period, lookback, field, setup_signal=None):
+class CountdownWindow(utils.StateWindow, transforms.EventWindow):
+    def __init__(self, period, lookback, field, setup_signal=None,
+                 incremental=False, max_length=None):
         window_length = period + lookback
         transforms.EventWindow.__init__(self, window_length=window_length)
 
@@ -112,7 +58,25 @@ class CountdownWindow(transforms.EventWindow):
         self.lookback = lookback
         self.field = field
         self.setup_signal = setup_signal
+        self.max_length = max_length
         self.signal = None
+        self.state = None
+
+        if max_length is not None and not incremental:
+            raise ValueError("max_length needs an incremental window")
+
+        # NOTE(jkoelker) In incremental mode the CountdownStates carry
+        #                everything they need, the ticks deque is unused
+        if incremental and setup_signal is not None:
+            self.state = CountdownState(setup_signal['direction'], period,
+                                        lookback, field, setup_signal,
+                                        max_length=max_length)
+            return
+
+        if incremental:
+            self.state = StandaloneState(period, lookback, field,
+                                         max_length=max_length)
+            return
 
         # NOTE(jkoelker) Prime the window with the last event + lookback
         #                from the setup_signal
@@ -120,6 +84,21 @@ class CountdownWindow(transforms.EventWindow):
             for bar in self.setup_signal['bars'][-(lookback + 1):]:
                 self.update(bar)
 
+    def update(self, event):
+        if self.state is None:
+            return transforms.EventWindow.update(self, event)
+
+        for field in (self.field, 'high', 'low'):
+            assert field in event
+            assert isinstance(event[field], numbers.Number)
+
+        self.signal = self.state.update(event)
+
+    def __len__(self):
+        if self.state is None:
+            return transforms.EventWindow.__len__(self)
+        return self.state.length
+
     # TODO(jkoelker) There is probably a bug in the window expansion. Need
     #                to think aboot this more
     def handle_add(self, event):
@@ -143,6 +122,9 @@ class CountdownWindow(transforms.EventWindow):
         self.window_length = self.period + self.lookback
 
     def __call__(self):
+        if self.state is not None:
+            return self.signal
+
         # NOTE(jkoelker) If tracking a Setup Signal, the signal is
         #                determined in the handle_add phase
         if self.signal:
@@ -0,0 +1,234 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Thread backed live feed front end for the incremental states."""
+
+import Queue
+import threading
+
+from zl.indicators import utils
+
+
+# NOTE(jkoelker) Marks the end of the bars in the inbox and of the
+#                signals in a subscription
+_CLOSED = object()
+
+
+class Subscription(object):
+    """Bounded queue of the `(sid, signal)` pairs a Feed publishes.
+
+    A subscriber falling behind never holds up the feed, once `maxsize`
+    signals are waiting the oldest one is dropped for the newest and
+    counted in `dropped`. Iterating yields the signals until the feed
+    closes.
+    """
+    def __init__(self, maxsize=256, sids=None):
+        # NOTE(jkoelker) One slot over so closing never drops a signal
+        self.queue = Queue.Queue(maxsize + 1)
+        self.maxsize = maxsize
+        self.sids = None if sids is None else frozenset(sids)
+        self.dropped = 0
+        self.closed = False
+        self.ended = False
+        self.lock = threading.Lock()
+
+    def wants(self, sid):
+        return self.sids is None or sid in self.sids
+
+    def offer(self, item):
+        """Queue `item` without blocking, dropping the oldest if full.
+
+        Offers are serialized, so the queue can only shrink between the
+        size check and the put.
+        """
+        with self.lock:
+            if self.ended:
+                return
+
+            while (item is not _CLOSED and
+                   self.queue.qsize() >= self.maxsize):
+                try:
+                    self.queue.get_nowait()
+                    self.dropped = self.dropped + 1
+                except Queue.Empty:
+                    break
+
+            self.ended = item is _CLOSED
+            self.queue.put_nowait(item)
+
+    def get(self, timeout=None):
+        """The next `(sid, signal)`, None once the feed has closed.
+
+        Raises Queue.Empty if nothing arrives within `timeout` seconds.
+        """
+        if self.closed:
+            return None
+
+        item = self.queue.get(timeout=timeout)
+        if item is _CLOSED:
+            self.closed = True
+            return None
+        return item
+
+    def __iter__(self):
+        while True:
+            item = self.get()
+            if item is None:
+                return
+            yield item
+
+
+class Feed(object):
+    """Live front end routing bars from a feed to a state per sid.
+
+    Bars go into a bounded inbox, as a mapping with a `sid` key or a
+    `(sid, bar)` pair like `stream` takes, and a worker thread runs each
+    through the state of its sid, created with `factory`. A full inbox
+    blocks `put`, holding back the feed rather than buffering without
+    bound, while the signals go out to every Subscription without ever
+    waiting on one.
+
+    With `workers` the sids are sharded over that many worker threads,
+    each with its own inbox and the states of the sids hashing to it. A
+    sid's bars are always run by the same thread in the order they were
+    put, so the signals of each sid match a single worker's.
+
+    `max_sids` and `max_idle` bound the states the same way they bound
+    the windows of the transforms, per shard, so which states are
+    evicted only depends on the order of the bars within a shard.
+    """
+    def __init__(self, factory, maxsize=1024, max_sids=None,
+                 max_idle=None, workers=1):
+        self.shards = [utils.SidWindows(factory, max_sids, max_idle)
+                       for _i in xrange(workers)]
+        self.inboxes = [Queue.Queue(maxsize) for _i in xrange(workers)]
+        self.subscriptions = []
+        self.lock = threading.Lock()
+        self.counts = [0] * workers
+        self.emitted = 0
+        self.error = None
+        self.workers = []
+        self.running = 0
+
+    @property
+    def received(self):
+        return sum(self.counts)
+
+    def shard(self, sid):
+        """The position of the worker running the bars of `sid`."""
+        return hash(sid) % len(self.inboxes)
+
+    def subscribe(self, maxsize=256, sids=None):
+        """New Subscription to the signals of `sids`, all when None."""
+        subscription = Subscription(maxsize, sids)
+        with self.lock:
+            self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.remove(subscription)
+        subscription.offer(_CLOSED)
+
+    def start(self):
+        assert not self.workers, "Feed already started"
+        self.running = len(self.inboxes)
+        for position in xrange(len(self.inboxes)):
+            worker = threading.Thread(target=self._work, args=(position,),
+                                      name='zl.indicators.feed-%s' %
+                                      position)
+            worker.daemon = True
+            self.workers.append(worker)
+            worker.start()
+        return self
+
+    def put(self, bar, timeout=None):
+        """Queue a bar, raising Queue.Full after `timeout` seconds."""
+        if self.error is not None:
+            raise self.error
+        sid, _bar = utils.route(bar)
+        self.inboxes[self.shard(sid)].put(bar, timeout=timeout)
+
+    def consume(self, bars):
+        """Queue every bar of an iterator, typically the live feed."""
+        for bar in bars:
+            self.put(bar)
+
+    def close(self, timeout=None):
+        """Finish the queued bars and close every subscription.
+
+        A feed never started drops its queued bars. Re-raises whatever
+        stopped a worker.
+        """
+        for inbox, worker in zip(self.inboxes, self.workers):
+            inbox.put(_CLOSED)
+            worker.join(timeout)
+
+        # NOTE(jkoelker) The last worker out already closed them when the
+        #                feed was started, a worker still running past
+        #                `timeout` closes them once it finishes
+        if not any(worker.is_alive() for worker in self.workers):
+            with self.lock:
+                subscriptions = list(self.subscriptions)
+            for subscription in subscriptions:
+                subscription.offer(_CLOSED)
+
+        if self.error is not None:
+            raise self.error
+
+    def _publish(self, sid, signal):
+        with self.lock:
+            self.emitted = self.emitted + 1
+            subscriptions = list(self.subscriptions)
+
+        for subscription in subscriptions:
+            if subscription.wants(sid):
+                subscription.offer((sid, signal))
+
+    def _work(self, position):
+        inbox = self.inboxes[position]
+        states = self.shards[position]
+
+        try:
+            while True:
+                bar = inbox.get()
+                if bar is _CLOSED:
+                    return
+
+                sid, bar = utils.route(bar)
+                self.counts[position] = self.counts[position] + 1
+                signal = states.touch(sid, bar.get('dt')).update(bar)
+                if signal is not None:
+                    self._publish(sid, signal)
+
+        except Exception as e:
+            self.error = e
+
+            # NOTE(jkoelker) Keep draining so a producer blocked on a
+            #                full inbox notices the error on its next put
+            while inbox.get() is not _CLOSED:
+                pass
+
+        finally:
+            # NOTE(jkoelker) The last worker out closes the subscriptions
+            with self.lock:
+                self.running = self.running - 1
+                subscriptions = []
+                if not self.running:
+                    subscriptions = list(self.subscriptions)
+
+            for subscription in subscriptions:
+                subscription.offer(_CLOSED)
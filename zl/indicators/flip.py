@@ -14,58 +14,55 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
-import collections
 import numbers
 
 from zipline.transforms import utils as transforms
+from zl.indicators import utils
+from zl.indicators.core.flip import (  # noqa
+    BEAR, BULL, DIRECTIONS, FLIP_DTYPE, FlipState, Signal, flip, flip_array,
+    stream)
 
 
-BULL = 'Bull'
-BEAR = 'Bear'
-
-
-def flip(events, field):
-    events = list(events)
-    Yp = events[-1][field]
-    Xp = events[-2][field]
-    X = events[0][field]
-    Y = events[1][field]
+class Flip(utils.SidTransform):
+    __metaclass__ = transforms.TransformMeta
 
-    if (Xp > X) and (Yp < Y):
-        return Signal(BEAR, events)
-    if (Xp < X) and (Yp > Y):
-        return Signal(BULL, events)
+    name = 'flip'
 
+    def __init__(self, period=4, field='close', incremental=False,
+                 max_sids=None, max_idle=None, stripes=None, table=None):
+        self.period = period
+        self.field = field
+        self.incremental = incremental
+        utils.SidTransform.__init__(self, max_sids, max_idle, stripes, table)
 
-class Signal(dict):
-    def __init__(self, direction, bars):
-        self['direction'] = direction
-        self['bars'] = bars
+    def create_window(self):
+        return FlipWindow(self.period, self.field,
+                          incremental=self.incremental)
 
 
-class Flip(object):
-    __metaclass__ = transforms.TransformMeta
+class FlipWindow(utils.StateWindow, transforms.EventWindow):
+    def __init__(self, period, field, incremental=False):
+        transforms.EventWindow.__init__(self, window_length=period + 2)
 
-    def __init__(self, period=4, field='close'):
         self.period = period
         self.field = field
-        self.sid_windows = collections.defaultdict(self.create_window)
+        self.signal = None
+        self.state = None
 
-    def create_window(self):
-        return FlipWindow(self.period, self.field)
+        if incremental:
+            self.state = FlipState(period, field)
 
     def update(self, event):
-        window = self.sid_windows[event.sid]
-        window.update(event)
-        return window()
+        if self.state is None:
+            return transforms.EventWindow.update(self, event)
 
+        self.handle_add(event)
+        self.signal = self.state.update(event)
 
-class FlipWindow(transforms.EventWindow):
-    def __init__(self, period, field):
-        transforms.EventWindow.__init__(self, window_length=period + 2)
-
-        self.period = period
-        self.field = field
+    def __len__(self):
+        if self.state is None:
+            return transforms.EventWindow.__len__(self)
+        return self.state.length
 
     def handle_add(self, event):
         assert self.field in event, "%s not in event" % self.field
@@ -75,6 +72,9 @@ class FlipWindow(transforms.EventWindow):
         pass
 
     def __call__(self):
+        if self.state is not None:
+            return self.signal
+
         if len(self.ticks) < self.window_length:
             return
 
@@ -14,16 +14,22 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
-import pylab
+import itertools
+import multiprocessing
+import os
+import sys
 
-from matplotlib import dates
-from matplotlib import finance
-from matplotlib import transforms
+import numpy as np
 
 
+# NOTE(jkoelker) matplotlib is imported by the functions using it, pylab
+#                alone takes longer to import than everything else and
+#                picks a backend the moment it is imported
+
 # TODO(jkoelker) Skip weekends and non-trading days in plots
 
 def offset(ax, x, y):
+    from matplotlib import transforms
     return transforms.offset_copy(ax.transData, x=x, y=y, units='dots')
 
 
@@ -38,6 +44,8 @@ def label_bar(ax, label, bar, above=False):
 
 
 def setup(ax, signal):
+    from matplotlib import finance
+
     bars = signal['flip']['bars'] + signal['bars']
     bars = [[b['dt'].to_pydatetime(), b['open'],
              b['close'], b['high'], b['low']] for b in bars]
@@ -57,6 +65,8 @@ def setup(ax, signal):
 
 
 def countdown(ax, signal):
+    from matplotlib import finance
+
     bars = [[b['dt'].to_pydatetime(), b['open'],
              b['close'], b['high'], b['low']] for b in signal['bars']]
 
@@ -69,6 +79,9 @@ def countdown(ax, signal):
 
 
 def start_plot(date_strfmt='%b-%d'):
+    import pylab
+    from matplotlib import dates
+
     alldays = dates.DayLocator()
     day_formatter = dates.DateFormatter(date_strfmt)
 
@@ -83,6 +96,8 @@ def start_plot(date_strfmt='%b-%d'):
 
 
 def show(ax):
+    import pylab
+
     ax.xaxis_date()
     ax.autoscale_view()
     pylab.setp(pylab.gca().get_xticklabels(), rotation=45,
@@ -104,3 +119,189 @@ def plot_countdown(signal, date_strfmt='%b-%d'):
 
     countdown(ax, signal)
     show(ax)
+
+
+# NOTE(jkoelker) Batch rendering, headless on Agg without pylab. The
+#                parent turns every signal into arrays once, workers
+#                each draw onto a single reused figure
+
+FIELDS = ('open', 'high', 'low', 'close')
+TICK = 0.2
+
+# NOTE(jkoelker) Laying out tick labels is most of the drawing time, a
+#                label a day is only kept for short charts
+MAX_TICKS = 15
+
+_renderer = None
+
+
+def _layer(bars, marks):
+    from matplotlib import dates
+
+    columns = dict((field, np.array([bar[field] for bar in bars],
+                                    dtype=float))
+                   for field in FIELDS)
+    columns['dt'] = np.asarray(dates.date2num([bar['dt'] for bar in bars]))
+    return columns, marks
+
+
+def _setup_layer(signal):
+    bars = signal['flip']['bars'] + signal['bars']
+    flip_end = len(signal['flip']['bars']) - 1
+    marks = [(0, 'X', True), (1, 'Y', True),
+             (flip_end - 1, "X'", True), (flip_end, "Y'", True)]
+    marks.extend((index, str(count), False) for count, index
+                 in enumerate(xrange(flip_end, len(bars)), 1))
+    return _layer(bars, marks)
+
+
+def chart(signal):
+    """The layers `Renderer.render` draws for a setup or countdown.
+
+    Each layer is a dict of bar arrays and the `(bar, label, above)`
+    marks drawn on it, plain data that pickles cheaply.
+    """
+    if 'signals' not in signal:
+        return [_setup_layer(signal)]
+
+    layers = []
+    if signal['setup']:
+        layers.append(_setup_layer(signal['setup']))
+
+    marks = [(position, str(count), False)
+             for count, position in enumerate(signal['signals'])]
+    layers.append(_layer(signal['bars'], marks))
+    return layers
+
+
+class Renderer(object):
+    """Draws charts onto one Agg figure, reused from chart to chart."""
+    def __init__(self, date_strfmt='%b-%d', figsize=(10, 5.625), dpi=80):
+        from matplotlib import dates
+        from matplotlib import figure
+        from matplotlib import transforms
+        from matplotlib.backends import backend_agg
+
+        self.dpi = dpi
+        self.figure = figure.Figure(figsize=figsize, dpi=dpi)
+        backend_agg.FigureCanvasAgg(self.figure)
+
+        ax = self.figure.add_subplot(111)
+        ax.margins(0.05, 0.05)
+        ax.xaxis.set_major_formatter(dates.DateFormatter(date_strfmt))
+        ax.xaxis_date()
+        self.ax = ax
+
+        self.above = transforms.offset_copy(ax.transData, x=0, y=5,
+                                            units='dots')
+        self.below = transforms.offset_copy(ax.transData, x=0, y=-12.5,
+                                            units='dots')
+
+    def _clear(self):
+        ax = self.ax
+        for artist in list(ax.collections) + list(ax.texts):
+            artist.remove()
+        ax.relim()
+
+    def _draw(self, columns, marks):
+        from matplotlib import collections
+
+        x = columns['dt']
+        opens = columns['open']
+        closes = columns['close']
+        highs = columns['high']
+        lowes = columns['low']
+
+        # NOTE(jkoelker) Same bars as finance.plot_day_summary, but one
+        #                collection instead of three lines a bar
+        segments = np.empty((len(x), 6, 2))
+        segments[:, :, 0] = np.column_stack([x, x, x - TICK, x, x, x + TICK])
+        segments[:, :, 1] = np.column_stack([lowes, highs, opens, opens,
+                                             closes, closes])
+        colors = np.repeat(np.where(closes >= opens, 'k', 'r'), 3)
+        self.ax.add_collection(collections.LineCollection(
+            segments.reshape(-1, 2, 2), colors=colors.tolist()))
+
+        for index, label, above in marks:
+            if above:
+                self.ax.text(x[index], highs[index], label,
+                             transform=self.above)
+            else:
+                self.ax.text(x[index], lowes[index], label,
+                             transform=self.below)
+
+    def render(self, layers, path, format=None):
+        from matplotlib import dates
+
+        self._clear()
+        for columns, marks in layers:
+            self._draw(columns, marks)
+
+        first = min(columns['dt'][0] for columns, _marks in layers)
+        last = max(columns['dt'][-1] for columns, _marks in layers)
+        interval = max(int(np.ceil((last - first) / MAX_TICKS)), 1)
+        self.ax.xaxis.set_major_locator(dates.DayLocator(interval=interval))
+
+        self.ax.autoscale_view()
+        self.figure.autofmt_xdate(bottom=0.2, rotation=45, ha='right')
+        self.figure.savefig(path, format=format, dpi=self.dpi)
+        return path
+
+
+def _worker():
+    """Start a pool worker without anything matplotlib the parent opened.
+
+    Forked workers inherit the parent's Renderer and cached FT2Fonts,
+    whose file handles share their offsets with the parent and every
+    other worker, reading glyphs through them races.
+    """
+    global _renderer
+
+    _renderer = None
+    font_manager = sys.modules.get('matplotlib.font_manager')
+    if font_manager is not None:
+        font_manager._get_font.cache_clear()
+
+
+def _render(job):
+    global _renderer
+
+    layers, path, format, options = job
+    if _renderer is None:
+        _renderer = Renderer(**options)
+    return _renderer.render(layers, path, format)
+
+
+def render_all(signals, directory, format='png', names=None,
+               processes=None, chunksize=None, **options):
+    """Render setups and countdowns to image files in `directory`.
+
+    The files are named after `names`, by default the position of each
+    signal, with the `format` extension. The charts are drawn across
+    `processes` worker processes, `options` go to each worker's
+    Renderer. Returns the paths written.
+    """
+    signals = list(signals)
+    if names is None:
+        names = xrange(len(signals))
+
+    jobs = [(chart(signal), os.path.join(directory,
+                                         '%s.%s' % (name, format)),
+             format, options)
+            for name, signal in itertools.izip(names, signals)]
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    if chunksize is None:
+        chunksize = max(len(jobs) // (4 * processes), 1)
+
+    if processes == 1:
+        return [_render(job) for job in jobs]
+
+    pool = multiprocessing.Pool(processes, _worker)
+    try:
+        return pool.map(_render, jobs, chunksize)
+    finally:
+        pool.close()
+        pool.join()
@@ -0,0 +1,215 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import collections
+import heapq
+import itertools
+import weakref
+
+import numpy as np
+
+
+class BarRing(object):
+    """Array backed ring buffer of the bars for a single sid.
+
+    Bars are addressed by their offset, the number of bars appended
+    before them, so several readers can share one ring and look back
+    from wherever they are. The compared fields are kept in float arrays
+    and the events themselves in an object array for building signals.
+
+    The ring only grows when a reader has pinned an offset that is about
+    to be overwritten, and shrinks back to the longest look back any
+    reader reserved once no pin needs the room. Signals referencing bars
+    by offset are tracked and handed a copy of their bars right before
+    the ring overwrites them.
+
+    Only signals dropped while their bars are still in the ring avoid the
+    copy. A signal held for longer ends up with a list of its bars, and
+    so does the setup and flip signal nested in it, same as the dict
+    signals they replace.
+    """
+    def __init__(self, fields, capacity=1):
+        self.fields = tuple(sorted(set(fields)))
+        self.capacity = capacity
+        self.reserved = capacity
+        self.count = 0
+        self.values = dict((field, np.zeros(capacity))
+                           for field in self.fields)
+        self.events = np.empty(capacity, dtype=object)
+        self.pins = collections.defaultdict(int)
+        self.tracked = []
+        self._serial = itertools.count()
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    @property
+    def oldest(self):
+        return max(self.count - self.capacity, 0)
+
+    def reserve(self, length):
+        """Keep at least `length` bars from now on."""
+        self.reserved = max(self.reserved, length)
+        self.grow(length)
+
+    def grow(self, length):
+        """Make room for `length` bars until the next shrink."""
+        if length > self.capacity:
+            self._resize(length)
+
+    def pin(self, offset):
+        assert offset >= self.oldest, "Offset %s already dropped" % offset
+        self.pins[offset] = self.pins[offset] + 1
+
+    def unpin(self, offset):
+        self.pins[offset] = self.pins[offset] - 1
+        if self.pins[offset] <= 0:
+            del self.pins[offset]
+
+    def track(self, signal):
+        heapq.heappush(self.tracked, (signal.start, next(self._serial),
+                                      weakref.ref(signal)))
+
+    def _detach(self, dropped):
+        tracked = self.tracked
+        while tracked and tracked[0][0] <= dropped:
+            signal = heapq.heappop(tracked)[2]()
+            if signal is not None and signal.ring is self:
+                signal.detach()
+
+    def _resize(self, capacity):
+        start = max(self.count - min(capacity, self.capacity), 0)
+        if self.tracked and self.tracked[0][0] < start:
+            self._detach(start - 1)
+
+        offsets = np.arange(start, self.count)
+        old = offsets % self.capacity
+        new = offsets % capacity
+
+        values = {}
+        for field in self.fields:
+            values[field] = np.zeros(capacity)
+            values[field][new] = self.values[field][old]
+
+        events = np.empty(capacity, dtype=object)
+        events[new] = self.events[old]
+
+        self.values = values
+        self.events = events
+        self.capacity = capacity
+
+    def append(self, event):
+        offset = self.count
+
+        needed = self.reserved
+        if self.pins:
+            needed = max(needed, offset + 1 - min(self.pins))
+
+        if needed > self.capacity:
+            self._resize(self.capacity * 2)
+        elif needed == self.reserved < self.capacity:
+            self._resize(needed)
+
+        dropped = offset - self.capacity
+        if self.tracked and self.tracked[0][0] <= dropped:
+            self._detach(dropped)
+
+        slot = offset % self.capacity
+        self.events[slot] = event
+        for field in self.fields:
+            self.values[field][slot] = event[field]
+
+        self.count = offset + 1
+
+    def extend(self, columns):
+        """Append whole arrays of bars at once.
+
+        `columns` maps each field to its values. Only the bars that fit
+        in the ring are turned into events, as dicts of every column.
+        """
+        columns = dict((field, np.asarray(values))
+                       for field, values in columns.items())
+        length = len(columns[self.fields[0]])
+        count = self.count + length
+
+        if self.pins and count - min(self.pins) > self.capacity:
+            self._resize(count - min(self.pins))
+
+        dropped = count - 1 - self.capacity
+        if self.tracked and self.tracked[0][0] <= dropped:
+            self._detach(dropped)
+
+        kept = min(length, self.capacity)
+        slots = np.arange(count - kept, count) % self.capacity
+        for field in self.fields:
+            self.values[field][slots] = columns[field][length - kept:]
+
+        names = list(columns)
+        rows = itertools.izip(*[columns[name][length - kept:].tolist()
+                                for name in names])
+        for slot, row in itertools.izip(slots, rows):
+            self.events[slot] = dict(itertools.izip(names, row))
+
+        self.count = count
+
+    def value(self, field, offset):
+        return self.values[field][offset % self.capacity]
+
+    def event(self, offset):
+        return self.events[offset % self.capacity]
+
+    def array(self, field, start, end):
+        assert start >= self.oldest, "Offset %s already dropped" % start
+        return self.values[field][np.arange(start, end) % self.capacity]
+
+    def slice(self, start, end):
+        assert start >= self.oldest, "Offset %s already dropped" % start
+        return self.events[np.arange(start, end) % self.capacity].tolist()
+
+    def dump(self, out, prefix=''):
+        start = self.oldest
+        values = [self.array(field, start, self.count)
+                  for field in self.fields]
+        out[prefix + 'count'] = np.array([self.count, self.capacity])
+        out[prefix + 'values'] = np.column_stack(values)
+        out[prefix + 'pins'] = np.array(sorted(self.pins.items()),
+                                        dtype=np.int64).reshape(-1, 2)
+
+    def load(self, data, prefix=''):
+        """Restore a ring written by `dump`.
+
+        Only the compared fields are kept, so the bars from before the
+        snapshot come back as dicts of those fields.
+        """
+        count, capacity = data[prefix + 'count'].tolist()
+        values = data[prefix + 'values'].reshape(-1, len(self.fields))
+        offsets = np.arange(count - len(values), count)
+        slots = offsets % capacity
+
+        self.count = count
+        self.capacity = capacity
+        self.values = dict((field, np.zeros(capacity))
+                           for field in self.fields)
+        for column, field in enumerate(self.fields):
+            self.values[field][slots] = values[:, column]
+
+        self.events = np.empty(capacity, dtype=object)
+        for slot, row in itertools.izip(slots, values.tolist()):
+            self.events[slot] = dict(itertools.izip(self.fields, row))
+
+        self.pins = collections.defaultdict(int)
+        self.pins.update(data[prefix + 'pins'].reshape(-1, 2).tolist())
+        self.tracked = []
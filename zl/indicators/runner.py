@@ -0,0 +1,148 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import itertools
+import multiprocessing
+
+import numpy as np
+
+from zl.indicators.core import countdown
+from zl.indicators.core import sequential
+from zl.indicators import universe
+
+
+def replay(state, sid, fields, columns, start=0):
+    """SIGNAL_DTYPE rows of the countdowns `state` emits over `columns`.
+
+    The bars are numbered from `start` on, the number of bars the state
+    has already seen.
+    """
+    records = []
+
+    for index, values in enumerate(zip(*columns), start):
+        signal = state.update(dict(zip(fields, values)))
+        if signal is not None:
+            records.append((sid, universe.KINDS[universe.COUNTDOWN],
+                            countdown.DIRECTIONS[signal.direction],
+                            index, signal.start, signal.high, signal.low,
+                            signal.setup.perfection))
+
+    return np.array(records, dtype=universe.SIGNAL_DTYPE)
+
+
+def _sequential(params, sid, fields, columns):
+    state = sequential.SequentialState(*params)
+    return sid, replay(state, sid, fields, columns)
+
+
+def _shard(args):
+    params, fields, sids = args
+    return [_sequential(params, sid, fields, columns)
+            for sid, columns in sids]
+
+
+def sequential_args(flip_period, flip_field, setup_period,
+                    setup_lookback, setup_field, setup_reverse_cancel,
+                    countdown_period, countdown_lookback, countdown_field,
+                    countdown_max_length):
+    """SequentialState arguments and the fields it reads."""
+    if setup_field is None:
+        setup_field = flip_field
+
+    if countdown_field is None:
+        countdown_field = setup_field
+
+    params = (flip_period, flip_field, setup_period, setup_lookback,
+              setup_field, setup_reverse_cancel, countdown_period,
+              countdown_lookback, countdown_field, countdown_max_length)
+    fields = sorted(set([flip_field, setup_field, countdown_field,
+                         'high', 'low']))
+    return params, fields
+
+
+def run(history, flip_period=4, flip_field='close',
+        setup_period=9, setup_lookback=4, setup_field=None,
+        setup_reverse_cancel=True, countdown_period=13,
+        countdown_lookback=2, countdown_field=None,
+        countdown_max_length=None, processes=None, chunksize=None):
+    """Run Sequential over the history of many sids in a process pool.
+
+    `history` maps each sid to a DataFrame of bars indexed by time, a
+    Panel works as well. The sids are sharded across `processes` worker
+    processes, each sid running through a SequentialState, and the
+    countdown signals come back as a DataFrame of SIGNAL_DTYPE rows indexed
+    by the time of the bar completing them, ordered by time and sid.
+    """
+    params, fields = sequential_args(flip_period, flip_field,
+                                     setup_period, setup_lookback,
+                                     setup_field, setup_reverse_cancel,
+                                     countdown_period, countdown_lookback,
+                                     countdown_field, countdown_max_length)
+
+    # NOTE(jkoelker) Only ship the columns the stages read to the workers,
+    #                as plain arrays rather than frames
+    indexes = {}
+    sids = []
+    for sid, bars in history.iteritems():
+        indexes[sid] = bars.index
+        sids.append((sid, [bars[field].values for field in fields]))
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    if chunksize is None:
+        chunksize = max(len(sids) // (4 * processes), 1)
+
+    shards = [(params, fields, sids[i:i + chunksize])
+              for i in xrange(0, len(sids), chunksize)]
+
+    if processes == 1:
+        results = [_shard(shard) for shard in shards]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_shard, shards)
+        finally:
+            pool.close()
+            pool.join()
+
+    return frame(itertools.chain.from_iterable(results), indexes)
+
+
+def frame(results, indexes):
+    """DataFrame of the `(sid, signals)` in `results` indexed by time.
+
+    `indexes` maps each sid to the times of its bars.
+    """
+    records = []
+    times = []
+    for sid, found in results:
+        records.append(found)
+        times.append(np.asarray(indexes[sid])[found['index']])
+
+    if records:
+        records = np.concatenate(records)
+        times = np.concatenate(times)
+    else:
+        records = np.zeros(0, dtype=universe.SIGNAL_DTYPE)
+        times = np.zeros(0)
+
+    # NOTE(jkoelker) pandas takes ten times longer to import than NumPy,
+    #                only load it once there is a frame to build
+    import pandas as pd
+
+    order = np.lexsort((records['sid'], times))
+    return pd.DataFrame(records[order], index=times[order])
@@ -14,26 +14,28 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
-import collections
 import functools
 
+from zipline.transforms import utils as transforms
 from zl.indicators import countdown
 from zl.indicators import setup
-from zipline.transforms import utils as transforms
-
+from zl.indicators import utils
+from zl.indicators.core.sequential import (  # noqa
+    BUY, SELL, SequentialState, stream)
 
-BUY = 'Buy'
-SELL = 'Sell'
 
-
-class Sequential(object):
+class Sequential(utils.SidTransform):
     __metaclass__ = transforms.TransformMeta
 
+    name = 'sequential'
+
     def __init__(self, flip_period=4, flip_field='close',
                  setup_period=9, setup_lookback=4,
                  setup_field=None, setup_reverse_cancel=True,
                  countdown_period=13, countdown_lookback=2,
-                 countdown_field=None):
+                 countdown_field=None, incremental=False,
+                 countdown_max_length=None, max_sids=None,
+                 max_idle=None, stripes=None, table=None):
 
         if setup_field is None:
             setup_field = flip_field
@@ -52,8 +54,15 @@ class Sequential(object):
         self.countdown_period = countdown_period
         self.countdown_lookback = countdown_lookback
         self.countdown_field = countdown_field
+        self.countdown_max_length = countdown_max_length
 
-        self.sid_windows = collections.defaultdict(self.create_window)
+        self.incremental = incremental
+
+        if countdown_max_length is not None and not incremental:
+            raise ValueError("countdown_max_length needs an incremental "
+                             "window")
+
+        utils.SidTransform.__init__(self, max_sids, max_idle, stripes, table)
 
     def create_window(self):
         args = (self.flip_period, self.flip_field,
@@ -61,21 +70,21 @@ class Sequential(object):
                 self.setup_field, self.setup_reverse_cancel,
                 self.countdown_period, self.countdown_lookback,
                 self.countdown_field)
-        return SequentialWindow(*args)
+        return SequentialWindow(
+            *args, incremental=self.incremental,
+            countdown_max_length=self.countdown_max_length)
 
-    def update(self, event):
-        window = self.sid_windows[event.sid]
-        window.update(event)
-        return window()
 
-
-class SequentialWindow(object):
+class SequentialWindow(utils.StateWindow):
     def __init__(self, flip_period, flip_field,
                  setup_period, setup_lookback,
                  setup_field, setup_reverse_cancel,
                  countdown_period, countdown_lookback,
-                 countdown_field):
+                 countdown_field, incremental=False,
+                 countdown_max_length=None):
         self.windows = []
+        self.signal = None
+        self.state = None
 
         self.setup_reverse_cancel = setup_reverse_cancel
 
@@ -83,6 +92,25 @@ class SequentialWindow(object):
         self.countdown_lookback = countdown_lookback
         self.countdown_field = countdown_field
 
+        self.countdown = None
+        self.setup_signal = None
+
+        if countdown_max_length is not None and not incremental:
+            raise ValueError("countdown_max_length needs an incremental "
+                             "window")
+
+        # NOTE(jkoelker) In incremental mode the SequentialState replaces
+        #                the setup and countdown windows entirely
+        if incremental:
+            self.state = SequentialState(flip_period, flip_field,
+                                         setup_period, setup_lookback,
+                                         setup_field, setup_reverse_cancel,
+                                         countdown_period,
+                                         countdown_lookback,
+                                         countdown_field,
+                                         countdown_max_length)
+            return
+
         self.setup = setup.SetupWindow(setup_period,
                                        setup_lookback,
                                        setup_field,
@@ -90,19 +118,24 @@ class SequentialWindow(object):
                                        flip_field)
         self.windows.append(self.setup)
 
-        self.countdown = None
-        self.setup_signal = None
-        self.start_countdown = functools.partial(countdown.CountdownWindow,
-                                                 countdown_period,
-                                                 countdown_lookback,
-                                                 countdown_field)
+        self.start_countdown = functools.partial(
+            countdown.CountdownWindow, countdown_period, countdown_lookback,
+            countdown_field)
 
     def update(self, event):
+        if self.state is not None:
+            self.signal = self.state.update(event)
+            return
+
+        # NOTE(jkoelker) The countdown window checks the setup's perfection
+        #                against every bar it is handed
         for window in self.windows:
             window.update(event)
 
-        if self.setup_signal:
-            self.setup_signal.check_perfection(event)
+    def __len__(self):
+        if self.state is not None:
+            return self.state.length
+        return max(len(window) for window in self.windows)
 
     def _handle_setup(self, signal):
         if not self.setup_signal and not self.countdown:
@@ -111,6 +144,9 @@ class SequentialWindow(object):
             self.windows.append(self.countdown)
 
     def __call__(self):
+        if self.state is not None:
+            return self.signal
+
         setup_signal = self.setup()
         if setup_signal is not None:
             self._handle_setup(setup_signal)
@@ -14,98 +14,24 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
-import collections
-import itertools
 import numbers
-import operator
 
-import numpy as np
 from zipline.transforms import utils as transforms
 from zl.indicators import flip
 from zl.indicators import utils
+from zl.indicators.core.setup import (  # noqa
+    BUY, SELL, DIRECTIONS, SETUP_DTYPE, SetupState, Signal, setup,
+    setup_array, stream)
 
 
-BUY = 'Buy'
-SELL = 'Sell'
-
-
-def setup(events, field, period, lookback, flip_signal):
-    events = list(events)
-    values = [e[field] for e in events]
-
-    direction = None
-    flip_dir = flip_signal['direction']
-
-    if flip_dir == flip.BEAR and all(itertools.imap(operator.lt,
-                                                    values[lookback:],
-                                                    values[:period])):
-        direction = BUY
-
-    elif flip_dir == flip.BULL and all(itertools.imap(operator.gt,
-                                                      values[lookback:],
-                                                      values[:period])):
-        direction = SELL
-
-    if not direction:
-        return
-
-    bars = events[lookback:]
-    lowes = [bar['low'] for bar in bars]
-    highs = [bar['high'] for bar in bars]
-
-    high = np.max(highs)
-    low = np.max(lowes)
-
-    if direction == BUY:
-        perfection = np.min(lowes[-4:-2])
-    else:
-        perfection = np.max(highs[-4:-2])
-
-    return Signal(direction, high, low, bars, perfection, flip_signal)
-
-
-class Signal(dict):
-    def __init__(self, direction, high, low, bars, perfection,
-                 flip_signal):
-        self['direction'] = direction
-        self['high'] = high
-        self['low'] = low
-        self['bars'] = bars
-        self['flip'] = flip_signal
-        self['perfection'] = perfection
-        self._perfect = False
-
-    def check_perfection(self, event):
-        if self['direction'] == BUY:
-            self._perfect = event['low'] <= self['perfection']
-            return self._perfect
-        self._perfect = event['high'] >= self['perfection']
-        return self._perfect
-
-    @property
-    def is_perfect(self):
-        return self._perfect or any([self.check_perfection(b)
-                                     for b in self['bars'][-2:]])
-
-    @utils.cached_property
-    def risk_level(self):
-        for bar in self['bars']:
-            if self['direction'] == BUY:
-                if bar['low'] == self['low']:
-                    return self['low'] - (bar['high'] - bar['low'])
-
-            elif self['direction'] == SELL:
-                if bar['high'] == self['high']:
-                    return self['high'] + (bar['high'] - bar['low'])
-
-        assert False, "Signal extreme not found in bars!"
-
-
-class Setup(object):
+class Setup(utils.SidTransform):
     __metaclass__ = transforms.TransformMeta
 
+    name = 'setup'
+
     def __init__(self, period=9, lookback=4, field='close',
-                 flip_period=None, flip_field=None):
+                 flip_period=None, flip_field=None, incremental=False,
+                 max_sids=None, max_idle=None, stripes=None, table=None):
         if flip_period is None:
             flip_period = lookback
 
@@ -117,20 +43,18 @@ class Setup(object):
         self.field = field
         self.flip_period = flip_period
         self.flip_field = flip_field
-        self.sid_windows = collections.defaultdict(self.create_window)
+        self.incremental = incremental
+        utils.SidTransform.__init__(self, max_sids, max_idle, stripes, table)
 
     def create_window(self):
         return SetupWindow(self.period, self.lookback, self.field,
-                           self.flip_period, self.flip_field)
-
-    def update(self, event):
-        window = self.sid_windows[event.sid]
-        window.update(event)
-        return window()
+                           self.flip_period, self.flip_field,
+                           incremental=self.incremental)
 
 
-class SetupWindow(transforms.EventWindow):
-    def __init__(self, period, lookback, field, flip_period, flip_field):
+class SetupWindow(utils.StateWindow, transforms.EventWindow):
+    def __init__(self, period, lookback, field, flip_period, flip_field,
+                 incremental=False):
         window_length = period + lookback - 1
         transforms.EventWindow.__init__(self, window_length=window_length)
 
@@ -142,6 +66,13 @@ class SetupWindow(transforms.EventWindow):
         self.flip_signal = None
         self.flip = None
         self._counter = 0
+        self.signal = None
+        self.state = None
+
+        if incremental:
+            self.state = SetupState(period, lookback, field,
+                                    flip_period, flip_field)
+
         self._reset_flip()
 
     def _reset_flip(self):
@@ -150,19 +81,34 @@ class SetupWindow(transforms.EventWindow):
         self.flip = flip.FlipWindow(self.flip_period, self.flip_field)
 
     def update(self, *args, **kwargs):
+        if self.state is not None:
+            return self._update_state(*args, **kwargs)
+
         if self.flip is not None:
             self.flip.update(*args, **kwargs)
         transforms.EventWindow.update(self, *args, **kwargs)
 
+    def __len__(self):
+        if self.state is None:
+            return transforms.EventWindow.__len__(self)
+        return self.state.length
+
     def handle_add(self, event):
         for field in (self.field, 'high', 'low'):
             assert field in event
             assert isinstance(event[field], numbers.Number)
 
+    def _update_state(self, event):
+        self.handle_add(event)
+        self.signal = self.state.update(event)
+
     def handle_remove(self, event):
         pass
 
     def __call__(self):
+        if self.state is not None:
+            return self.signal
+
         flip_signal = self.flip()
         self._counter = self._counter + 1
 
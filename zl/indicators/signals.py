@@ -0,0 +1,163 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import itertools
+
+import numpy as np
+
+
+BUY = 'Buy'
+SELL = 'Sell'
+
+
+def present(data, prefix):
+    """Whether a signal was dumped under `prefix`."""
+    return len(data.get(prefix + 'direction', ())) > 0
+
+
+def from_code(codes, code):
+    for direction, value in codes.items():
+        if value == code:
+            return direction
+    raise ValueError("Unknown direction code %s" % code)
+
+
+def load_direction(data, prefix, codes):
+    return from_code(codes, data[prefix + 'direction'][0])
+
+
+def rows(columns, start, end):
+    """Bars `start` to `end` of a mapping of field arrays as dicts."""
+    names = list(columns)
+    values = [np.asarray(columns[name])[start:end].tolist()
+              for name in names]
+    return [dict(itertools.izip(names, row))
+            for row in itertools.izip(*values)]
+
+
+def load_bars(data, prefix, fields):
+    bars = data[prefix + 'bars'].reshape(-1, len(fields)).tolist()
+    return [dict(itertools.izip(fields, bar)) for bar in bars]
+
+
+class Signal(object):
+    """Compact signal that behaves like the dict signals it replaces.
+
+    The bars are either a list handed in or the `start` to `end` offsets
+    into a BarRing. Ring backed bars are only built when `['bars']` is
+    accessed, the ring copies them into the signal before it overwrites
+    them so the signal stays valid for as long as it is referenced.
+
+    Subclasses list their dict keys in KEYS and store the values in
+    slots of the same name.
+    """
+    __slots__ = ('direction', 'ring', 'start', 'end', '_bars', '__weakref__')
+
+    KEYS = ('direction', 'bars')
+
+    def __init__(self, direction, bars=None, ring=None, start=None,
+                 end=None):
+        self.direction = direction
+        self.ring = ring
+        self.start = start
+        self.end = end
+        self._bars = bars
+
+        if ring is not None:
+            ring.track(self)
+
+    @property
+    def bars(self):
+        if self._bars is not None:
+            return self._bars
+        return self.ring.slice(self.start, self.end)
+
+    def detach(self):
+        if self._bars is None:
+            self._bars = self.ring.slice(self.start, self.end)
+        self.ring = None
+
+    def column(self, field):
+        if self._bars is None:
+            return self.ring.array(field, self.start, self.end)
+        return np.array([bar[field] for bar in self._bars])
+
+    def dump(self, out, prefix, fields, codes):
+        """Write the direction and the bars' `fields` into `out`.
+
+        Loaded signals own their bars rather than pointing into a ring.
+        """
+        out[prefix + 'direction'] = np.array([codes[self.direction]])
+        out[prefix + 'bars'] = np.column_stack([self.column(field)
+                                                for field in fields])
+
+    def _risk_level(self, high, low):
+        if self.direction == BUY:
+            lowes = self.column('low')
+            found = np.flatnonzero(lowes == low)
+            if len(found):
+                bar_range = self.column('high')[found[0]] - lowes[found[0]]
+                return low - bar_range
+
+        elif self.direction == SELL:
+            highs = self.column('high')
+            found = np.flatnonzero(highs == high)
+            if len(found):
+                bar_range = highs[found[0]] - self.column('low')[found[0]]
+                return high + bar_range
+
+        assert False, "Signal extreme not found in bars!"
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.KEYS
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def get(self, key, default=None):
+        if key not in self.KEYS:
+            return default
+        return getattr(self, key)
+
+    def keys(self):
+        return list(self.KEYS)
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.KEYS]
+
+    def __eq__(self, other):
+        if not hasattr(other, 'items'):
+            return NotImplemented
+        return dict(self.items()) == dict(other.items())
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(dict(self.items()))
@@ -0,0 +1,137 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+
+import numpy as np
+
+from zl.indicators import universe
+
+
+FIELDS = ('open', 'high', 'low', 'close')
+SIDS = 'sids'
+
+# NOTE(jkoelker) Scan rows are the Universe signals plus the store row
+#                of the bar they were signaled on
+SCAN_DTYPE = np.dtype(universe.SIGNAL_DTYPE.descr + [('row', np.int64)])
+
+
+class BarStore(object):
+    """Bars for many sids kept on disk as memory mapped arrays.
+
+    Each field lives in its own `.npy` file holding a (bar x sid) array
+    of floats, with NaN where a sid did not trade, next to the sids the
+    columns belong to. Nothing is read until a slice of it is.
+    """
+    def __init__(self, path, mode='r'):
+        self.path = path
+        self.mode = mode
+        self.sids = np.load(self._file(SIDS))
+        self.columns = {}
+
+        for name in sorted(os.listdir(path)):
+            field, ext = os.path.splitext(name)
+            if ext == '.npy' and field != SIDS:
+                self.columns[field] = np.load(self._file(field),
+                                              mmap_mode=mode)
+
+        self.fields = sorted(self.columns)
+        self.positions = dict((sid, position) for position, sid
+                              in enumerate(self.sids.tolist()))
+
+    def _file(self, name):
+        return os.path.join(self.path, name + '.npy')
+
+    @classmethod
+    def create(cls, path, sids, length, fields=FIELDS):
+        """Create an empty store for `length` bars of `sids`."""
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        np.save(os.path.join(path, SIDS + '.npy'),
+                np.asarray(sids, dtype=np.int64))
+
+        for field in fields:
+            column = np.lib.format.open_memmap(
+                os.path.join(path, field + '.npy'), mode='w+',
+                dtype=np.float64, shape=(length, len(sids)))
+            column[:] = np.nan
+            column.flush()
+            del column
+
+        return cls(path, mode='r+')
+
+    def __len__(self):
+        return len(self.columns[self.fields[0]])
+
+    def write(self, sid, columns, start=0):
+        """Write the bars of `sid` from row `start` on."""
+        position = self.positions[sid]
+        for field in self.fields:
+            values = np.asarray(columns[field], dtype=float)
+            self.columns[field][start:start + len(values), position] = values
+
+    def flush(self):
+        for column in self.columns.values():
+            column.flush()
+
+    def chunks(self, size, fields=None):
+        """Yield `(start, columns)` for every `size` rows, read into RAM."""
+        if fields is None:
+            fields = self.fields
+
+        for start in xrange(0, len(self), size):
+            yield start, dict((field,
+                               np.array(self.columns[field][start:
+                                                            start + size]))
+                              for field in fields)
+
+
+def scan(store, chunk=4096, **params):
+    """Step a Universe over every bar in `store`, `chunk` rows at a time.
+
+    Yields a SCAN_DTYPE array of the signals found in each chunk. Only
+    the chunk being scanned and the Universe state are held in memory,
+    the state carries over from one chunk to the next.
+    """
+    engine = universe.Universe(**params)
+    sids = np.asarray(store.sids, dtype=np.int64)
+
+    for start, columns in store.chunks(chunk, engine.fields):
+        found = []
+
+        for row in xrange(len(columns[engine.fields[0]])):
+            trading = np.ones(len(sids), dtype=bool)
+            for field in engine.fields:
+                trading &= ~np.isnan(columns[field][row])
+
+            if not trading.any():
+                continue
+
+            signals = engine.step(sids[trading],
+                                  dict((field, columns[field][row, trading])
+                                       for field in engine.fields))
+            if len(signals):
+                rows = np.zeros(len(signals), dtype=SCAN_DTYPE)
+                for name in universe.SIGNAL_DTYPE.names:
+                    rows[name] = signals[name]
+                rows['row'] = start + row
+                found.append(rows)
+
+        if found:
+            yield np.concatenate(found)
+        else:
+            yield np.zeros(0, dtype=SCAN_DTYPE)
@@ -0,0 +1,268 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Evaluate many Sequential configurations over the same bars at once."""
+
+import collections
+import itertools
+
+import numpy as np
+
+from zl.indicators.core import countdown
+from zl.indicators.core import flip
+from zl.indicators import utils
+from zl.indicators.core import setup
+
+
+DEFAULTS = {'flip_period': 4,
+            'setup_period': 9,
+            'setup_lookback': 4,
+            'setup_reverse_cancel': True,
+            'countdown_period': 13,
+            'countdown_lookback': 2,
+            'countdown_max_length': None}
+
+# NOTE(jkoelker) The bars a countdown ran on, `stop` included
+SPAN_DTYPE = np.dtype([('start', np.int64), ('stop', np.int64),
+                       ('direction', np.int8)])
+
+Result = collections.namedtuple('Result', ['params', 'setups',
+                                           'countdowns', 'spans'])
+
+
+def grid(**axes):
+    """Every combination of the values listed for each parameter."""
+    names = sorted(axes)
+    return [dict(itertools.izip(names, values))
+            for values in itertools.product(*[axes[name] for name in names])]
+
+
+class Sweep(object):
+    """Sequential over one history for any number of parameter sets.
+
+    The bars are converted once and everything derived from them is
+    cached by the parameters it depends on, so configurations sharing a
+    flip period share the flips, a setup lookback the runs of closes
+    below and above, a setup period the setups, and a countdown lookback
+    the bars qualifying for a countdown as a running count. A countdown
+    started on the same bar with the same parameters is only run once,
+    whichever configuration asks for it.
+
+    With `begins` the bars hold several histories laid end to end, as
+    for `flip_array`, each run over on its own.
+    """
+    def __init__(self, columns, field='close', begins=None):
+        self.close = np.asarray(columns[field], dtype=float)
+        self.high = np.asarray(columns['high'], dtype=float)
+        self.low = np.asarray(columns['low'], dtype=float)
+        self.length = len(self.close)
+        self.begins = begins
+        self.ends = None
+        self._flips = {}
+        self._runs = {}
+        self._setups = {}
+        self._resets = {}
+        self._qualified = {}
+        self._countdowns = {}
+
+        if begins is not None:
+            self.ends = utils.ends(begins)
+
+    def boundary(self, bar):
+        """One past the last bar of the history `bar` is in."""
+        if self.ends is None:
+            return self.length
+        return int(self.ends[bar])
+
+    def flips(self, period):
+        if period not in self._flips:
+            self._flips[period] = flip.flip_array(self.close, period,
+                                                  self.begins)
+        return self._flips[period]
+
+    def setups(self, flip_period, period, lookback):
+        key = (flip_period, period, lookback)
+        if key in self._setups:
+            return self._setups[key]
+
+        if lookback not in self._runs:
+            self._runs[lookback] = setup.runs(self.close, lookback,
+                                              self.begins)
+
+        _flips, resets, rows = setup.scan(self.close, self.close, period,
+                                          lookback, flip_period,
+                                          self.flips(flip_period),
+                                          self._runs[lookback], self.begins)
+        found = setup.scan_array(rows, self.high, self.low, period, lookback)
+        self._setups[key] = found
+        self._resets[key] = resets
+        return found
+
+    def counters(self, flip_period, period, lookback):
+        """The running setup count of every bar, as `setup.counters`."""
+        self.setups(flip_period, period, lookback)
+        return setup.counters(self.length, self.flips(flip_period),
+                              self._resets[(flip_period, period, lookback)],
+                              flip_period, self.begins)
+
+    def qualify(self, direction, lookback):
+        """Bars closing past the bar `lookback` back and their count.
+
+        `counts[i]` is the number of qualifying bars before bar `i`.
+        """
+        key = (direction, lookback)
+        if key in self._qualified:
+            return self._qualified[key]
+
+        qualified = np.zeros(self.length, dtype=bool)
+        if direction == countdown.DIRECTIONS[countdown.BUY]:
+            qualified[lookback:] = (self.close[lookback:] <=
+                                    self.low[:-lookback])
+        else:
+            qualified[lookback:] = (self.close[lookback:] >=
+                                    self.high[:-lookback])
+
+        if self.begins is not None:
+            qualified[np.arange(self.length) - lookback < self.begins] = False
+
+        counts = np.zeros(self.length + 1, dtype=np.int64)
+        np.cumsum(qualified, out=counts[1:])
+        self._qualified[key] = (qualified, counts)
+        return self._qualified[key]
+
+    def countdown(self, start, direction, period, lookback,
+                  max_length=None, chunk=64):
+        """The COUNTDOWN_DTYPE row of a countdown starting on `start`.
+
+        Same as `countdown_array` for a single start, with the index at
+        -1 when the countdown never completes.
+        """
+        key = (start, direction, period, lookback, max_length)
+        if key in self._countdowns:
+            return self._countdowns[key]
+
+        qualified, counts = self.qualify(direction, lookback)
+        row = np.zeros((), dtype=countdown.COUNTDOWN_DTYPE)
+        row[()] = (-1, direction, np.nan, np.nan, start, -1)
+        self._countdowns[key] = row
+
+        stop = self.boundary(start)
+        if max_length is not None:
+            stop = min(start + max_length, stop)
+
+        # NOTE(jkoelker) The running count finds the eighth qualifying
+        #                bar and the first bar the countdown may complete
+        #                on without walking the bars in between
+        before = counts[start]
+        qualifier = np.searchsorted(counts, before + 8) - 1
+        begin = np.searchsorted(counts, before + max(period, 8)) - 1
+        if begin >= stop:
+            return row
+
+        if direction == countdown.DIRECTIONS[countdown.BUY]:
+            hit = self.low <= self.close[qualifier]
+        else:
+            hit = self.high >= self.close[qualifier]
+
+        size = chunk
+        while begin < stop:
+            end = min(begin + size, stop)
+            found = np.flatnonzero(qualified[begin:end] & hit[begin:end])
+            if len(found):
+                index = begin + found[0]
+                row[()] = (index, direction,
+                           np.max(self.high[start:index + 1]),
+                           np.max(self.low[start:index + 1]),
+                           start, qualifier)
+                return row
+            begin = end
+            size = size * 2
+
+        return row
+
+    def run(self, **params):
+        """The setups and emitted countdowns of one configuration.
+
+        Walks the setups the way a SequentialState does, only running the
+        countdowns a setup actually starts. The `spans` are the bars every
+        countdown started ran on, whether it completed, expired, was
+        cancelled or is still running.
+        """
+        values = dict(DEFAULTS, **params)
+        unknown = set(values) - set(DEFAULTS)
+        if unknown:
+            raise TypeError("Unknown parameters %s" % ', '.join(unknown))
+
+        setups = self.setups(values['flip_period'], values['setup_period'],
+                             values['setup_lookback'])
+        max_length = values['countdown_max_length']
+        cancel = values['setup_reverse_cancel']
+
+        emitted = []
+        spans = []
+        pending = None
+        direction = None
+        end = -1
+
+        for row in setups.tolist():
+            index, row_direction = row[0], row[1]
+            if direction is not None and index <= end:
+                if not (cancel and row_direction != direction):
+                    continue
+                pending = None
+                spans[-1][1] = index - 1
+
+            if pending is not None:
+                emitted.append(pending)
+
+            found = self.countdown(index, row_direction,
+                                   values['countdown_period'],
+                                   values['countdown_lookback'],
+                                   max_length)
+            direction = row_direction
+            end = found['index']
+            pending = None
+
+            last = self.boundary(index) - 1
+            if end >= 0:
+                pending = found
+            elif max_length is None:
+                end = last
+            else:
+                end = min(index + max_length - 1, last)
+            spans.append([index, end, row_direction])
+
+        if pending is not None:
+            emitted.append(pending)
+
+        countdowns = np.zeros(len(emitted), dtype=countdown.COUNTDOWN_DTYPE)
+        if emitted:
+            countdowns[:] = np.hstack(emitted)
+        return Result(params, setups, countdowns,
+                      np.array([tuple(span) for span in spans],
+                               dtype=SPAN_DTYPE))
+
+
+def sweep(columns, configs, field='close'):
+    """Run Sequential over `columns` once per parameter set in `configs`.
+
+    `columns` maps the fields to arrays of bars, a DataFrame works as
+    well, and each config holds Sequential keyword arguments, missing
+    ones taking the Sequential defaults. Returns a Result of the setups
+    and emitted countdowns per config, in order.
+    """
+    engine = Sweep(columns, field)
+    return [engine.run(**params) for params in configs]
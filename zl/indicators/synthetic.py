@@ -0,0 +1,152 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""Seeded synthetic bars for load tests and benchmarks.
+
+Bars are dicts of (bar x sid) arrays, built with NumPy in one go so
+millions of rows take seconds. Flips, setups and countdowns can be
+planted at known bars; on a quiet walk (`volatility=0`) the planted
+patterns are the only signals, on a noisy one other signals may
+interfere with them.
+"""
+
+import numpy as np
+
+from zl.indicators import signals
+
+
+BUY = signals.BUY
+SELL = signals.SELL
+
+FIELDS = ('open', 'high', 'low', 'close', 'volume')
+PRICES = ('open', 'high', 'low', 'close')
+
+FLIP = 'flip'
+SETUP = 'setup'
+PERFECT_SETUP = 'perfect_setup'
+COUNTDOWN = 'countdown'
+
+# NOTE(jkoelker) Bars from the flip to the bar each pattern signals on,
+#                for the default periods (flip 4, setup 9/4, countdown
+#                13/2)
+LENGTHS = {FLIP: 0, SETUP: 8, PERFECT_SETUP: 8, COUNTDOWN: 20}
+RAMP = 5
+
+
+def walk(length, sids=1, seed=20, start=100.0, volatility=0.01,
+         drift=0.0, spread=0.005):
+    """Geometric random walk bars for `sids` sids.
+
+    `volatility` and `drift` are per bar log returns and `spread` the
+    typical distance from the open/close to the high/low, as a fraction
+    of the price.
+    """
+    random = np.random.RandomState(seed)
+    shape = (length, sids)
+
+    returns = random.normal(drift, volatility, shape)
+    close = start * np.exp(np.cumsum(returns, axis=0))
+
+    opens = np.empty(shape)
+    opens[0] = start
+    opens[1:] = close[:-1] * np.exp(random.normal(0, volatility / 4,
+                                                  (length - 1, sids)))
+
+    wicks = spread * random.uniform(0.1, 1, (2,) + shape)
+    return {'open': opens,
+            'high': np.maximum(opens, close) * (1 + wicks[0]),
+            'low': np.minimum(opens, close) * (1 - wicks[1]),
+            'close': close,
+            'volume': np.round(random.lognormal(8, 1, shape))}
+
+
+def _shape(pattern):
+    """Close, low and high offsets in steps for a BUY pattern.
+
+    The closes rise for RAMP bars, drop below the close four bars back
+    for a bear flip and then fall a step a bar, deep enough for every
+    bar to count towards a buy setup and then a buy countdown.
+    """
+    length = LENGTHS[pattern]
+    ramp = np.arange(RAMP, dtype=float)
+    fall = RAMP - 4.5 - np.arange(length + 1, dtype=float)
+    close = np.append(ramp, fall)
+
+    low = close - 0.5
+    high = close + 0.5
+
+    # NOTE(jkoelker) Keep the last two setup bars above the lows of the
+    #                two before them so the setup is not perfected
+    if pattern == SETUP:
+        flip = RAMP
+        low[flip + 5:flip + 7] = close[flip + 5:flip + 7] - 3
+        low[flip + 7:flip + 9] = close[flip + 7:flip + 9] - 0.25
+
+    return close, low, high
+
+
+def plant(bars, pattern, positions, direction=BUY, sid=0, step=0.01):
+    """Overwrite the bars of `sid` so `pattern` signals on `positions`.
+
+    `positions` is a bar or an ascending sequence of bars far enough
+    apart for the patterns not to overlap. `sid` is a column index, or a
+    slice to plant in several sids at once, and `step` the move per bar
+    as a fraction of the price. A BUY flip is a bear flip, the flip a
+    buy setup starts from. The bars between the patterns are rescaled
+    to carry on from where the pattern before them ends.
+    """
+    close, low, high = _shape(pattern)
+    if direction == SELL:
+        close, low, high = -close, -high, -low
+
+    ends = np.atleast_1d(positions) + 1
+    begins = ends - len(close)
+    length = len(bars['close'])
+    if (begins[0] < 0 or ends[-1] > length or
+            np.any(begins[1:] < ends[:-1])):
+        raise ValueError("Patterns do not fit at %s" % positions)
+
+    prices = dict((field, bars[field][:, sid]) for field in PRICES)
+
+    # NOTE(jkoelker) Every bar after a pattern moves by the ratio of the
+    #                pattern's last close to the close it replaced, so
+    #                the running product of those ratios rescales the
+    #                whole walk in one pass
+    ratios = np.ones(prices['close'].shape)
+    inside = ends < length
+    ratios[ends[inside]] = (prices['close'][begins] * (1 + step * close[-1]) /
+                            prices['close'][ends - 1])[inside]
+    factor = np.cumprod(ratios, axis=0)
+
+    rows = begins[:, np.newaxis] + np.arange(len(close))
+    base = prices['close'][begins] * factor[begins]
+    for field, offsets in (('close', close), ('open', close),
+                           ('low', low), ('high', high)):
+        prices[field] *= factor
+        values = np.multiply.outer(base, 1 + step * offsets)
+        prices[field][rows] = np.rollaxis(values, -1, 1)
+
+
+def frames(bars, start='2000-01-03', freq='B'):
+    """One DataFrame of bars per sid column, indexed by time."""
+    import pandas as pd
+
+    length, sids = bars['close'].shape
+    index = pd.date_range(start, periods=length, freq=freq)
+    return dict((sid, pd.DataFrame(dict((field, values[:, sid])
+                                        for field, values in bars.items()),
+                                   index=index))
+                for sid in xrange(sids))
@@ -0,0 +1,164 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import threading
+
+import numpy as np
+
+from zl.indicators.core import countdown
+from zl.indicators.core import flip
+from zl.indicators.core import setup
+from zl.indicators import universe
+
+
+# NOTE(jkoelker) `dt` is kept as nanoseconds since the epoch in UTC rather
+#                than datetime64, NumPy refuses to export datetime64
+#                through the buffer protocol. `start` and `end` are the
+#                bar offsets of the signal's bars, `end` one past the bar
+#                that completed it, and -1 when the signal does not know
+#                them.
+TABLE_DTYPE = np.dtype([('sid', np.int64), ('dt', np.int64),
+                        ('kind', np.int8), ('direction', np.int8),
+                        ('start', np.int64), ('end', np.int64),
+                        ('high', np.float64), ('low', np.float64),
+                        ('perfection', np.float64),
+                        ('risk_level', np.float64)])
+
+NAT = np.datetime64('NaT').astype(np.int64)
+
+KINDS = ((flip.Signal, universe.FLIP, flip.DIRECTIONS),
+         (setup.Signal, universe.SETUP, setup.DIRECTIONS),
+         (countdown.Signal, universe.COUNTDOWN, countdown.DIRECTIONS))
+
+
+def nanos(dt):
+    """Nanoseconds since the epoch of `dt`, NAT for None."""
+    if dt is None:
+        return NAT
+
+    # NOTE(jkoelker) pandas Timestamps, what zipline hands out, already
+    #                know their nanoseconds
+    value = getattr(dt, 'value', None)
+    if value is not None:
+        return value
+
+    if dt.tzinfo is not None:
+        dt = dt.replace(tzinfo=None) - dt.utcoffset()
+    return np.datetime64(dt, 'ns').astype(np.int64)
+
+
+def _kind(signal):
+    for cls, kind, codes in KINDS:
+        if isinstance(signal, cls):
+            return universe.KINDS[kind], codes
+    raise TypeError("Unknown signal %r" % type(signal))
+
+
+def _offset(value):
+    if value is None:
+        return -1
+    return value
+
+
+def _level(value):
+    if value is None:
+        return np.nan
+    return value
+
+
+class SignalTable(object):
+    """Signals of any kind as the rows of a growable TABLE_DTYPE array.
+
+    The transforms and the Universe append to a table they are handed
+    rather than leaving the signals to be walked one by one. `array` is
+    a view of the rows so far, it can be handed on as is, wrapped in a
+    memoryview or written out with `save`. Rows are appended under a
+    lock so a table can be shared by striped transforms.
+    """
+    def __init__(self, capacity=1024):
+        self.rows = np.zeros(capacity, dtype=TABLE_DTYPE)
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def array(self):
+        """The rows appended so far, a view until the table next grows."""
+        return self.rows[:self.size]
+
+    def _reserve(self, length):
+        count = self.size + length
+        if count <= len(self.rows):
+            return
+
+        rows = np.zeros(max(count, 2 * len(self.rows)), dtype=TABLE_DTYPE)
+        rows[:self.size] = self.rows[:self.size]
+        self.rows = rows
+
+    def append(self, sid, dt, signal):
+        """Append the flip, setup or countdown `signal` of `sid`."""
+        kind, codes = _kind(signal)
+
+        perfection = getattr(signal, 'perfection', None)
+        setup_signal = getattr(signal, 'setup', None)
+        if setup_signal is not None:
+            perfection = setup_signal.perfection
+
+        row = (sid, nanos(dt), kind, codes[signal.direction],
+               _offset(signal.start), _offset(signal.end),
+               _level(getattr(signal, 'high', None)),
+               _level(getattr(signal, 'low', None)), _level(perfection),
+               _level(getattr(signal, 'risk_level', None)))
+
+        with self.lock:
+            self._reserve(1)
+            self.rows[self.size] = row
+            self.size = self.size + 1
+
+    def extend(self, signals, dt=None):
+        """Append SIGNAL_DTYPE rows, as the Universe and runner return.
+
+        `dt` is one time for every row or an array of them, the Universe
+        does not work out risk levels so they are left NaN.
+        """
+        if not len(signals):
+            return
+
+        if not hasattr(dt, '__len__'):
+            times = nanos(dt)
+        else:
+            times = np.asarray(dt, dtype='M8[ns]').astype(np.int64)
+
+        with self.lock:
+            self._reserve(len(signals))
+            rows = self.rows[self.size:self.size + len(signals)]
+            for name in ('sid', 'kind', 'direction', 'start', 'high',
+                         'low', 'perfection'):
+                rows[name] = signals[name]
+            rows['dt'] = times
+            rows['end'] = signals['index'] + 1
+            rows['risk_level'] = np.nan
+            self.size = self.size + len(signals)
+
+    def clear(self):
+        with self.lock:
+            self.size = 0
+
+    def save(self, path):
+        """Write the rows to the `.npy` file at `path`."""
+        np.save(path, self.array)
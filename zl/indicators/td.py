@@ -0,0 +1,251 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+"""TD Sequential columns for DataFrames of bars as the `df.td` accessor."""
+
+import numpy as np
+import pandas as pd
+
+from zl.indicators import sweep
+from zl.indicators.core import countdown
+from zl.indicators.core import flip
+from zl.indicators.core import setup
+
+
+SID = 'sid'
+
+
+def _risk_levels(direction, high, low, extreme, starts, ends):
+    """Risk level of each signal on the bars `starts` to `ends`.
+
+    Same as the signals' `risk_level`, the range of the first bar at the
+    signal's `extreme` taken past it.
+    """
+    levels = np.empty(len(starts))
+    for row, (start, end) in enumerate(zip(starts, ends)):
+        if direction[row] == setup.DIRECTIONS[setup.BUY]:
+            bar = start + np.argmax(low[start:end])
+            levels[row] = extreme['low'][row] - (high[bar] - low[bar])
+        else:
+            bar = start + np.argmax(high[start:end])
+            levels[row] = extreme['high'][row] + (high[bar] - low[bar])
+    return levels
+
+
+def flip_columns(columns, period=4, field='close', begins=None):
+    """Direction code of the flip signaled on each bar, 0 for none."""
+    found = flip.flip_array(columns[field], period, begins)
+    codes = np.zeros(len(columns[field]), dtype=np.int8)
+    codes[found['index']] = found['direction']
+    return {'flip': codes}
+
+
+def setup_columns(columns, found, period, counts):
+    """Per bar columns of the SETUP_DTYPE rows in `found`.
+
+    `setup_count` is the running setup's count on every bar, the
+    `setup.counters` handed in as `counts`, so the bar completing a setup
+    is `period` and a setup still running or given up on is counted too.
+    `setup` is the direction code on the bar completing a setup, where
+    the perfection level, whether the last two bars reached it and the
+    risk level are set too.
+    """
+    high = np.asarray(columns['high'], dtype=float)
+    low = np.asarray(columns['low'], dtype=float)
+    length = len(high)
+
+    ends = found['index']
+    direction = found['direction']
+    bars = period - 1
+
+    codes = np.zeros(length, dtype=np.int8)
+    codes[ends] = direction
+
+    perfection = np.empty(length)
+    perfection.fill(np.nan)
+    perfection[ends] = found['perfection']
+
+    buy = (direction == setup.DIRECTIONS[setup.BUY])[:, np.newaxis]
+    levels = found['perfection'][:, np.newaxis]
+    last = np.column_stack([ends - 1, ends])
+    reached = np.where(buy, low[last] <= levels, high[last] >= levels)
+    perfect = np.zeros(length, dtype=bool)
+    perfect[ends] = reached.any(axis=1)
+
+    risk = np.empty(length)
+    risk.fill(np.nan)
+    risk[ends] = _risk_levels(direction, high, low, found, ends - bars + 1,
+                              ends + 1)
+
+    return {'setup_count': counts,
+            'setup': codes,
+            'setup_perfection': perfection,
+            'setup_perfect': perfect,
+            'setup_risk_level': risk}
+
+
+def countdown_columns(columns, found, qualified, spans):
+    """Per bar columns of the COUNTDOWN_DTYPE rows in `found`.
+
+    `countdown_count` is the number of qualifying bars so far on every bar
+    of the `spans` countdowns ran on, completed or not, `countdown` the
+    direction code on the bar completing one, where the risk level is set
+    too. `qualified` maps the direction codes to the running counts of
+    qualifying bars.
+    """
+    high = np.asarray(columns['high'], dtype=float)
+    low = np.asarray(columns['low'], dtype=float)
+    length = len(high)
+
+    starts = found['start']
+    ends = found['index']
+
+    counts = np.zeros(length, dtype=np.int64)
+    if len(spans):
+        bars = np.arange(length)
+        span = np.maximum(np.searchsorted(spans['start'], bars,
+                                          side='right') - 1, 0)
+        start = spans['start'][span]
+        inside = (start <= bars) & (bars <= spans['stop'][span])
+
+        buy = spans['direction'][span] == countdown.DIRECTIONS[countdown.BUY]
+        buys = qualified[countdown.DIRECTIONS[countdown.BUY]]
+        sells = qualified[countdown.DIRECTIONS[countdown.SELL]]
+        running = np.where(buy, buys[bars + 1] - buys[start],
+                           sells[bars + 1] - sells[start])
+        counts[inside] = running[inside]
+
+    codes = np.zeros(length, dtype=np.int8)
+    codes[ends] = found['direction']
+
+    risk = np.empty(length)
+    risk.fill(np.nan)
+    risk[ends] = _risk_levels(found['direction'], high, low, found, starts,
+                              ends + 1)
+
+    return {'countdown_count': counts,
+            'countdown': codes,
+            'countdown_risk_level': risk}
+
+
+class TD(object):
+    """TD Sequential columns of a DataFrame of bars, as `df.td`.
+
+    Every method returns a DataFrame of columns aligned with the bars,
+    computed with the array functions rather than bar by bar. A frame
+    with a MultiIndex holds many sids, its bars are taken per value of
+    the `sid` level, or the last level when none is named so, in the
+    order they appear. The sids are laid end to end and run through the
+    array functions together, kept apart by the first bar of each.
+    """
+    def __init__(self, frame):
+        self.frame = frame
+
+    def _apply(self, func):
+        frame = self.frame
+        index = frame.index
+
+        if not isinstance(index, pd.MultiIndex):
+            columns = dict((field, frame[field].values) for field in frame)
+            return pd.DataFrame(func(columns, None), index=index)
+
+        level = SID if SID in index.names else index.nlevels - 1
+        _sids, codes = np.unique(index.get_level_values(level),
+                                 return_inverse=True)
+
+        order = np.argsort(codes, kind='mergesort')
+        codes = codes[order]
+        firsts = np.flatnonzero(np.append(True, codes[1:] != codes[:-1]))
+        begins = np.repeat(firsts, np.diff(np.append(firsts, len(order))))
+        values = dict((field, frame[field].values[order]) for field in frame)
+
+        results = {}
+        for name, column in func(values, begins).items():
+            results[name] = np.empty_like(column)
+            results[name][order] = column
+
+        return pd.DataFrame(results, index=index)
+
+    def flip(self, period=4, field='close'):
+        """The `flip` direction code of every bar."""
+        return self._apply(lambda columns, begins: flip_columns(
+            columns, period, field, begins))
+
+    def setup(self, period=9, lookback=4, field='close', flip_period=None,
+              flip_field=None):
+        """The `setup_columns` of every bar."""
+        if flip_period is None:
+            flip_period = lookback
+
+        if flip_field is None:
+            flip_field = field
+
+        def columns_(columns, begins):
+            close = np.asarray(columns[field], dtype=float)
+            flips, resets, rows = setup.scan(
+                close, np.asarray(columns[flip_field], dtype=float), period,
+                lookback, flip_period, begins=begins)
+            found = setup.scan_array(rows,
+                                     np.asarray(columns['high'], dtype=float),
+                                     np.asarray(columns['low'], dtype=float),
+                                     period, lookback)
+            counts = setup.counters(len(close), flips, resets, flip_period,
+                                    begins)
+            return setup_columns(columns, found, period, counts)
+
+        return self._apply(columns_)
+
+    def sequential(self, field='close', **params):
+        """The `setup_columns` and `countdown_columns` of every bar.
+
+        Takes the Sequential parameters `sweep.Sweep.run` does, with
+        every setup in the setup columns, not only those starting a
+        countdown.
+        """
+        values = dict(sweep.DEFAULTS, **params)
+        lookback = values['countdown_lookback']
+
+        def columns_(columns, begins):
+            engine = sweep.Sweep(columns, field, begins)
+            result = engine.run(**params)
+            qualified = dict((code, engine.qualify(code, lookback)[1])
+                             for code in countdown.DIRECTIONS.values())
+            counts = engine.counters(values['flip_period'],
+                                     values['setup_period'],
+                                     values['setup_lookback'])
+
+            found = setup_columns(columns, result.setups,
+                                  values['setup_period'], counts)
+            found.update(countdown_columns(columns, result.countdowns,
+                                           qualified, result.spans))
+            return found
+
+        return self._apply(columns_)
+
+
+def register(name='td'):
+    """Make `TD` available on every DataFrame as `df.<name>`."""
+    extensions = getattr(getattr(pd, 'api', None), 'extensions', None)
+    if extensions is not None:
+        extensions.register_dataframe_accessor(name)(TD)
+        return
+
+    # NOTE(jkoelker) Older pandas has no accessor registry, a property
+    #                does the same minus the caching
+    setattr(pd.DataFrame, name, property(TD))
+
+
+register()
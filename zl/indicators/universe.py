@@ -0,0 +1,417 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2013 Jason Koelker
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import numpy as np
+
+
+FLIP = 'Flip'
+SETUP = 'Setup'
+COUNTDOWN = 'Countdown'
+
+KINDS = {FLIP: 0, SETUP: 1, COUNTDOWN: 2}
+
+# NOTE(jkoelker) Directions use the codes from the array functions, -1
+#                for Bear/Buy and 1 for Bull/Sell
+SIGNAL_DTYPE = np.dtype([('sid', np.int64), ('kind', np.int8),
+                         ('direction', np.int8), ('index', np.int64),
+                         ('start', np.int64), ('high', np.float64),
+                         ('low', np.float64), ('perfection', np.float64)])
+
+
+class Universe(object):
+    """Flip, Setup and Sequential state for every sid in 2-D arrays.
+
+    Each sid owns a row and each field a (sid x slot) ring buffer long
+    enough for the furthest look back any of the stages needs. `step`
+    advances every sid trading on a bar in one vectorized pass and
+    returns the signals as a SIGNAL_DTYPE array. `index` and `start` count
+    bars per sid, the same signals the per sid transforms return on that
+    bar.
+    """
+    STATE = ('sids', 'count', 'flip_count', 'flip_direction', 'counter',
+             'below', 'above', 'active', 'countdown_direction',
+             'countdown_count', 'countdown_start', 'countdown_high',
+             'countdown_low', 'qualifier', 'perfection')
+
+    def __init__(self, flip_period=4, flip_field='close',
+                 setup_period=9, setup_lookback=4, setup_field=None,
+                 setup_reverse_cancel=True, countdown_period=13,
+                 countdown_lookback=2, countdown_field=None,
+                 countdown_max_length=None,
+                 kinds=(FLIP, SETUP, COUNTDOWN), capacity=64, table=None):
+
+        if setup_field is None:
+            setup_field = flip_field
+
+        if countdown_field is None:
+            countdown_field = setup_field
+
+        self.flip_period = flip_period
+        self.flip_field = flip_field
+
+        self.setup_period = setup_period
+        self.setup_lookback = setup_lookback
+        self.setup_field = setup_field
+        self.setup_reverse_cancel = setup_reverse_cancel
+
+        self.countdown_period = countdown_period
+        self.countdown_lookback = countdown_lookback
+        self.countdown_field = countdown_field
+        self.countdown_max_length = countdown_max_length
+
+        self.kinds = set(kinds)
+        self.table = table
+        self.fields = sorted(set([flip_field, setup_field, countdown_field,
+                                  'high', 'low']))
+        self.length = max(flip_period + 2,
+                          setup_period + setup_lookback - 1,
+                          countdown_lookback + 1)
+
+        self.rows = {}
+        self.sids = np.zeros(0, dtype=np.int64)
+        self.ring = dict((field, np.zeros((0, self.length)))
+                         for field in self.fields)
+
+        self.count = np.zeros(0, dtype=np.int64)
+
+        self.flip_count = np.zeros(0, dtype=np.int64)
+        self.flip_direction = np.zeros(0, dtype=np.int8)
+        self.counter = np.zeros(0, dtype=np.int64)
+        self.below = np.zeros(0, dtype=np.int64)
+        self.above = np.zeros(0, dtype=np.int64)
+
+        self.active = np.zeros(0, dtype=bool)
+        self.countdown_direction = np.zeros(0, dtype=np.int8)
+        self.countdown_count = np.zeros(0, dtype=np.int64)
+        self.countdown_start = np.zeros(0, dtype=np.int64)
+        self.countdown_high = np.zeros(0)
+        self.countdown_low = np.zeros(0)
+        self.qualifier = np.zeros(0)
+        self.perfection = np.zeros(0)
+
+        self._last_sids = None
+        self._last_rows = None
+        self._grow(capacity)
+        self.size = 0
+
+    def _grow(self, capacity):
+        def grow(array):
+            shape = (capacity,) + array.shape[1:]
+            grown = np.zeros(shape, dtype=array.dtype)
+            grown[:len(array)] = array
+            return grown
+
+        for name in self.STATE:
+            setattr(self, name, grow(getattr(self, name)))
+
+        for field in self.fields:
+            self.ring[field] = grow(self.ring[field])
+
+    def _add(self, sid):
+        if self.size == len(self.count):
+            self._grow(max(2 * self.size, 1))
+
+        row = self.size
+        self.size = self.size + 1
+        self.rows[sid] = row
+        self.sids[row] = sid
+        return row
+
+    def evict(self, sid):
+        """Drop the state of `sid`, moving the last row into its place."""
+        row = self.rows.pop(sid)
+        last = self.size - 1
+
+        arrays = [getattr(self, name) for name in self.STATE]
+        arrays.extend(self.ring[field] for field in self.fields)
+
+        if row != last:
+            moved = self.sids[last]
+            for array in arrays:
+                array[row] = array[last]
+            self.rows[moved] = row
+
+        for array in arrays:
+            array[last] = 0
+
+        self.size = last
+        self._last_sids = None
+        self._last_rows = None
+
+    def _rows(self, sids):
+        last = self._last_sids
+        if (last is not None and len(last) == len(sids) and
+                np.array_equal(last, sids)):
+            return self._last_rows
+
+        rows = np.empty(len(sids), dtype=np.int64)
+        for position, sid in enumerate(sids):
+            row = self.rows.get(sid)
+            if row is None:
+                row = self._add(sid)
+            rows[position] = row
+
+        self._last_sids = sids.copy()
+        self._last_rows = rows
+        return rows
+
+    def _back(self, field, rows, count, back):
+        return self.ring[field][rows, (count - 1 - back) % self.length]
+
+    def _signals(self, kind, rows, index, direction, start,
+                 high=np.nan, low=np.nan, perfection=np.nan):
+        signals = np.zeros(len(rows), dtype=SIGNAL_DTYPE)
+        signals['sid'] = self.sids[rows]
+        signals['kind'] = KINDS[kind]
+        signals['direction'] = direction
+        signals['index'] = index
+        signals['start'] = start
+        signals['high'] = high
+        signals['low'] = low
+        signals['perfection'] = perfection
+        return signals
+
+    def step(self, sids, bars, dt=None):
+        """Advance each of `sids` by one bar.
+
+        `bars` maps each field to an array aligned with `sids`, a sid may
+        only appear once per step. The signals are also appended to the
+        SignalTable given as `table`, at time `dt`.
+        """
+        sids = np.asarray(sids, dtype=np.int64)
+        rows = self._rows(sids)
+        values = dict((field, np.asarray(bars[field], dtype=float))
+                      for field in self.fields)
+
+        count = self.count[rows] + 1
+        self.count[rows] = count
+
+        slot = (count - 1) % self.length
+        for field in self.fields:
+            self.ring[field][rows, slot] = values[field]
+
+        signals = []
+
+        flips = self._flip(rows, count, values, signals)
+        setups, perfection = self._setup(rows, count, values, flips,
+                                         signals)
+        self._countdown(rows, count, values, setups, perfection, signals)
+
+        if not signals:
+            return np.zeros(0, dtype=SIGNAL_DTYPE)
+
+        signals = np.concatenate(signals)
+        if self.table is not None:
+            self.table.extend(signals, dt)
+        return signals
+
+    def _flip(self, rows, count, values, signals):
+        period = self.flip_period
+        field = self.flip_field
+
+        X = self._back(field, rows, count, period + 1)
+        Y = self._back(field, rows, count, period)
+        Xp = self._back(field, rows, count, 1)
+        Yp = values[field]
+
+        direction = np.zeros(len(rows), dtype=np.int8)
+        direction[(Xp > X) & (Yp < Y)] = -1
+        direction[(Xp < X) & (Yp > Y)] = 1
+        direction[count < period + 2] = 0
+
+        if FLIP in self.kinds:
+            found = np.flatnonzero(direction)
+            signals.append(self._signals(FLIP, rows[found],
+                                         count[found] - 1,
+                                         direction[found],
+                                         count[found] - period - 2))
+
+        # NOTE(jkoelker) The setup starts its flip window over after each
+        #                completed setup, flips before it fills again are
+        #                not seen by the setup
+        flip_count = self.flip_count[rows] + 1
+        self.flip_count[rows] = flip_count
+        return np.where(flip_count >= period + 2, direction, 0)
+
+    def _setup(self, rows, count, values, flips, signals):
+        period = self.setup_period
+        lookback = self.setup_lookback
+        field = self.setup_field
+
+        value = values[field]
+        prior = self._back(field, rows, count, lookback)
+        seen = count > lookback
+
+        below = np.where(seen & (value < prior), self.below[rows] + 1, 0)
+        above = np.where(seen & (value > prior), self.above[rows] + 1, 0)
+        self.below[rows] = below
+        self.above[rows] = above
+
+        counter = self.counter[rows] + 1
+        direction = self.flip_direction[rows]
+
+        flipped = flips != 0
+        counter[flipped] = 1
+        direction[flipped] = flips[flipped]
+
+        complete = ((count >= period + lookback - 1) & (direction != 0) &
+                    (counter == period))
+
+        setups = np.zeros(len(rows), dtype=np.int8)
+        setups[complete & (direction == -1) & (below >= period - 1)] = -1
+        setups[complete & (direction == 1) & (above >= period - 1)] = 1
+
+        counter[complete] = 0
+        direction[complete] = 0
+        self.flip_count[rows[complete]] = 0
+        self.counter[rows] = counter
+        self.flip_direction[rows] = direction
+
+        perfection = np.empty(len(rows))
+        perfection.fill(np.nan)
+
+        found = np.flatnonzero(setups)
+        if not len(found):
+            return setups, perfection
+
+        # NOTE(jkoelker) The setup bars are the last period - 1 bars, the
+        #                perfection level is taken from bars[-4:-2]
+        bars = period - 1
+        backs = np.arange(bars - 1, -1, -1)
+        perfect_backs = backs[-4:-2]
+
+        found_rows = rows[found][:, None]
+        found_count = count[found][:, None]
+        slots = (found_count - 1 - backs) % self.length
+        highs = self.ring['high'][found_rows, slots]
+        lowes = self.ring['low'][found_rows, slots]
+
+        perfect_slots = (found_count - 1 - perfect_backs) % self.length
+        perfection[found] = np.where(
+            setups[found] == -1,
+            np.min(self.ring['low'][found_rows, perfect_slots], axis=1),
+            np.max(self.ring['high'][found_rows, perfect_slots], axis=1))
+
+        if SETUP in self.kinds:
+            signals.append(self._signals(SETUP, rows[found],
+                                         count[found] - 1, setups[found],
+                                         count[found] - bars,
+                                         np.max(highs, axis=1),
+                                         np.max(lowes, axis=1),
+                                         perfection[found]))
+
+        return setups, perfection
+
+    def _countdown(self, rows, count, values, setups, perfection,
+                   signals):
+        period = max(self.countdown_period, 8)
+        lookback = self.countdown_lookback
+        field = self.countdown_field
+
+        active = self.active[rows]
+
+        # NOTE(jkoelker) An opposite setup cancels the running countdown
+        #                and starts its own
+        if self.setup_reverse_cancel:
+            reverse = (active & (setups != 0) &
+                       (setups != self.countdown_direction[rows]))
+            active = active & ~reverse
+            self.active[rows[reverse]] = False
+
+        # NOTE(jkoelker) Advance the running countdowns first, a setup
+        #                completing on the same bar is ignored
+        found = np.flatnonzero(active)
+        if len(found):
+            self._advance(rows[found], count[found], values[field][found],
+                          values['high'][found], values['low'][found],
+                          period, signals)
+
+        found = np.flatnonzero((setups != 0) & ~active)
+        if not len(found):
+            return
+
+        started = rows[found]
+        direction = setups[found]
+        value = values[field][found]
+        high = values['high'][found]
+        low = values['low'][found]
+
+        prior_low = self._back('low', started, count[found], lookback)
+        prior_high = self._back('high', started, count[found], lookback)
+        qualified = np.where(direction == -1, value <= prior_low,
+                             value >= prior_high)
+
+        self.active[started] = True
+        self.countdown_direction[started] = direction
+        self.countdown_count[started] = qualified
+        self.countdown_start[started] = count[found] - 1
+        self.countdown_high[started] = high
+        self.countdown_low[started] = low
+        self.qualifier[started] = np.nan
+        self.perfection[started] = perfection[found]
+        self._expire(started, count[found])
+
+    def _expire(self, rows, count):
+        if self.countdown_max_length is None:
+            return
+
+        length = count - self.countdown_start[rows]
+        self.active[rows[length >= self.countdown_max_length]] = False
+
+    def _advance(self, rows, count, value, high, low, period, signals):
+        lookback = self.countdown_lookback
+        direction = self.countdown_direction[rows]
+
+        prior_low = self._back('low', rows, count, lookback)
+        prior_high = self._back('high', rows, count, lookback)
+        qualified = np.where(direction == -1, value <= prior_low,
+                             value >= prior_high)
+
+        # NOTE(jkoelker) Same as the countdown function, the low is the
+        #                max of the lows
+        countdown_high = np.maximum(self.countdown_high[rows], high)
+        countdown_low = np.maximum(self.countdown_low[rows], low)
+        self.countdown_high[rows] = countdown_high
+        self.countdown_low[rows] = countdown_low
+
+        counts = self.countdown_count[rows] + qualified
+        self.countdown_count[rows] = counts
+
+        qualifiers = qualified & (counts == 8)
+        self.qualifier[rows[qualifiers]] = value[qualifiers]
+
+        qualifier = self.qualifier[rows]
+        with np.errstate(invalid='ignore'):
+            complete = (qualified & (counts >= period) &
+                        np.where(direction == -1, low <= qualifier,
+                                 high >= qualifier))
+
+        self._expire(rows[~complete], count[~complete])
+
+        found = np.flatnonzero(complete)
+        if not len(found):
+            return
+
+        self.active[rows[found]] = False
+
+        if COUNTDOWN in self.kinds:
+            signals.append(self._signals(COUNTDOWN, rows[found],
+                                         count[found] - 1,
+                                         direction[found],
+                                         self.countdown_start[rows[found]],
+                                         countdown_high[found],
+                                         countdown_low[found],
+                                         self.perfection[rows[found]]))
@@ -14,10 +14,46 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
+import collections
+import threading
+
+import numpy as np
+
+from zl.indicators.core import metrics as metrics_
+from zl.indicators.core import snapshot
+
 
 SENTINEL = object()
 
 
+class _Unlocked(object):
+    """Stands in for a lock where no locking is needed."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+UNLOCKED = _Unlocked()
+
+
+def runs(mask):
+    """Length of the run of True values ending at each position."""
+    mask = np.asarray(mask, dtype=bool)
+    index = np.arange(len(mask))
+    last = np.maximum.accumulate(np.where(mask, -1, index))
+    return index - last
+
+
+def ends(begins):
+    """One past the last bar of the history each bar of `begins` is in."""
+    begins = np.asarray(begins)
+    firsts = np.unique(begins)
+    bounds = np.append(firsts, len(begins))
+    return bounds[np.searchsorted(firsts, begins, side='right')]
+
+
 class cached_property(object):
     def __init__(self, f):
         self.f = f
@@ -33,3 +69,232 @@ class cached_property(object):
             value = self.f(obj)
             obj.__dict__[self.__name__] = value
         return value
+
+
+class SidWindows(object):
+    """Per sid windows with optional eviction of idle sids.
+
+    Without `max_sids` or `max_idle` this is a plain dict of windows
+    created on first use. With either set the sids are kept in least
+    recently used order, `touch` moves a sid to the back and then drops
+    sids from the front while there are more than `max_sids` of them or
+    their last event is more than `max_idle` older than the newest one.
+    Windows created by looking a sid up, as priming and restoring do,
+    count against `max_sids` straight away and are taken as seen at the
+    first event after them.
+
+    With `stripes` the windows can be updated from several threads. The
+    sids hash onto that many locks, `locked` hands out the one guarding a
+    sid, and the bookkeeping shared by every sid sits behind one more
+    lock held only while a window is looked up, created or evicted.
+
+    Stripes keep the updates of a sid apart but do not order them, each
+    sid has to be fed from a single thread. Eviction follows the order
+    the threads happen to touch the sids in, so with `max_sids` or
+    `max_idle` the windows evicted, and the signals after, can differ
+    from a single threaded run. `feed.Feed` with `workers` shards the
+    sids over threads and keeps both per sid ordering and eviction
+    deterministic.
+    """
+    def __init__(self, factory, max_sids=None, max_idle=None,
+                 stripes=None):
+        self.factory = factory
+        self.max_sids = max_sids
+        self.max_idle = max_idle
+        self.bounded = max_sids is not None or max_idle is not None
+        self.last_seen = {}
+        self.stripes = None
+        self.lock = UNLOCKED
+
+        if stripes:
+            self.stripes = [threading.Lock() for _i in xrange(stripes)]
+            self.lock = threading.Lock()
+
+        if self.bounded:
+            self.windows = collections.OrderedDict()
+        else:
+            self.windows = {}
+
+    def __len__(self):
+        return len(self.windows)
+
+    def __contains__(self, sid):
+        return sid in self.windows
+
+    def __iter__(self):
+        return iter(self.windows)
+
+    def __getitem__(self, sid):
+        window = self.windows.get(sid)
+        if window is None:
+            with self.lock:
+                window = self.windows.get(sid)
+                if window is None:
+                    window = self._create(sid)
+                    self._evict_idle(None)
+        return window
+
+    def items(self):
+        with self.lock:
+            return list(self.windows.items())
+
+    def locked(self, sid):
+        """The lock to hold while updating the window of `sid`."""
+        if self.stripes is None:
+            return UNLOCKED
+        return self.stripes[hash(sid) % len(self.stripes)]
+
+    def touch(self, sid, dt=None):
+        if not self.bounded:
+            return self[sid]
+
+        with self.lock:
+            window = self.windows.pop(sid, None)
+            if window is None:
+                window = self._create(sid)
+            else:
+                self.windows[sid] = window
+
+            if dt is not None:
+                self.last_seen[sid] = dt
+
+            self._evict_idle(dt)
+            return window
+
+    def _create(self, sid):
+        window = self.windows[sid] = self.factory()
+        return window
+
+    def _evict_idle(self, dt):
+        windows = self.windows
+
+        if self.max_sids is not None:
+            while len(windows) > self.max_sids:
+                self._evict(next(iter(windows)))
+
+        if self.max_idle is None or dt is None:
+            return
+
+        cutoff = dt - self.max_idle
+        while windows:
+            sid = next(iter(windows))
+            seen = self.last_seen.get(sid)
+            if seen is None:
+                self.last_seen[sid] = dt
+                windows[sid] = windows.pop(sid)
+                continue
+            if seen >= cutoff:
+                break
+            self._evict(sid)
+
+    def evict(self, sid):
+        with self.lock:
+            return self._evict(sid)
+
+    def _evict(self, sid):
+        self.last_seen.pop(sid, None)
+        return self.windows.pop(sid, None)
+
+
+class SidTransform(object):
+    """What the transforms keeping a window per sid have in common.
+
+    Subclasses build a window in `create_window`, name themselves in
+    `name` for the metrics and set `incremental`, everything else goes
+    through `sid_windows`.
+    """
+    name = None
+
+    def __init__(self, max_sids=None, max_idle=None, stripes=None,
+                 table=None):
+        self.sid_windows = SidWindows(self.create_window,
+                                      max_sids, max_idle, stripes)
+        self.metrics = None
+        self.table = table
+
+    def create_window(self):
+        raise NotImplementedError()
+
+    def evict(self, sid):
+        return self.sid_windows.evict(sid)
+
+    def dump_state(self, fileobj):
+        if not self.incremental:
+            raise ValueError("Snapshots need incremental windows")
+
+        snapshot.dump(((sid, window.state)
+                       for sid, window in self.sid_windows.items()), fileobj)
+
+    def load_state(self, fileobj):
+        if not self.incremental:
+            raise ValueError("Snapshots need incremental windows")
+
+        for sid, data in snapshot.load(fileobj):
+            self.sid_windows[sid].state.load(data)
+
+    def prime(self, sid, columns):
+        self.sid_windows[sid].prime(columns)
+
+    def prime_from_frame(self, sid, frame):
+        self.sid_windows[sid].prime_from_frame(frame)
+
+    def enable_metrics(self, sink=None, interval=None):
+        self.disable_metrics()
+        self.metrics = metrics_.Metrics(self.name, self.sid_windows, sink,
+                                        interval)
+        return self.metrics
+
+    def disable_metrics(self):
+        if self.metrics is not None:
+            self.metrics.close()
+        self.metrics = None
+
+    def update(self, event):
+        with self.sid_windows.locked(event.sid):
+            window = self.sid_windows.touch(event.sid, event.dt)
+            if self.metrics is not None:
+                signal = self.metrics.update(window, event)
+            else:
+                window.update(event)
+                signal = window()
+
+            if signal is not None and self.table is not None:
+                self.table.append(event.sid, event.dt, signal)
+            return signal
+
+
+class StateWindow(object):
+    """Priming of the windows that wrap an incremental `state`."""
+    def prime(self, columns):
+        if self.state is None:
+            raise ValueError("Priming needs an incremental window")
+        self.state.prime(columns)
+
+    def prime_from_frame(self, frame):
+        self.prime(dict((field, frame[field].values) for field in frame))
+
+
+def route(bar):
+    """Split a bar as `stream` takes them into `(sid, bar)`."""
+    if isinstance(bar, tuple):
+        return bar
+    return bar.get('sid'), bar
+
+
+def stream(bars, factory):
+    """Feed `bars` through a state per sid, yielding `(sid, signal)`.
+
+    Each bar is either a mapping, whose `sid` key (if any) picks the
+    state, or a `(sid, bar)` pair. A state is created with `factory` the
+    first time its sid is seen.
+    """
+    states = {}
+    for bar in bars:
+        sid, bar = route(bar)
+        state = states.get(sid)
+        if state is None:
+            state = states[sid] = factory()
+
+        signal = state.update(bar)
+        if signal is not None:
+            yield sid, signal